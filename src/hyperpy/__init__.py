@@ -5,6 +5,7 @@ from hyperpy import preprocessing, spectral, utils
 from hyperpy.visu import BoxROIFigure, PCAFigure
 from hyperpy.preprocessing import (
     spectral_process,
+    resample,
     Log,
     Positive,
     StandardNormalVariate,
@@ -12,8 +13,9 @@ from hyperpy.preprocessing import (
     SavitzkyGolay,
     MultiplicativeScatterCorrection,
     Normalization,
-    DomainSelection
+    DomainSelection,
+    Resampling
 )
 from hyperpy.models import kmeans_cube_plot, kmeans
-from hyperpy.spectral import SpectralMat, SpectralCube, RectangleMask
+from hyperpy.spectral import SpectralMat, SpectralCube, MaskedSpectralCube, RectangleMask
 from hyperpy.utils import DataSampler
\ No newline at end of file
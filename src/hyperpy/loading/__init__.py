@@ -1 +1,7 @@
 from .utils import read_hyspex, read_specim, read_mat_file
+
+from .catalog import AcquisitionCatalog, Acquisition
+from .store import write_cube_store, open_cube_store
+from .cache import ReflectanceCache
+from .batch import iter_load
+from .live import LiveReader
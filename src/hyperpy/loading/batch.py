@@ -0,0 +1,53 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# Number of acquisitions read at the same time by default
+DEFAULT_IO_JOBS = 4
+
+
+def iter_load(
+    loader: Callable[..., Any],
+    file_names: Iterable[str],
+    n_jobs: int = DEFAULT_IO_JOBS,
+    prefetch: Optional[int] = None,
+    **kwargs
+) -> Iterator[Any]:
+    """
+    load acquisitions on a thread pool and yield them in order
+
+    The next acquisitions are read and calibrated while the current one is processed by the caller.
+    At most prefetch acquisitions are loaded ahead, which bounds the memory in flight.
+
+    loader: callable, e.g. read_specim or SpectralCube.from_specim, called as loader(file_name, **kwargs).
+    file_names: iterable of str, paths to the .raw files, consumed lazily.
+    n_jobs: int, number of loading threads. Default: DEFAULT_IO_JOBS.
+    prefetch: int, number of acquisitions loaded ahead. If None, n_jobs. Default: None.
+    kwargs: passed to the loader.
+
+    iterator of the loader results.
+    """
+    prefetch = n_jobs if prefetch is None else prefetch
+    if n_jobs < 1 or prefetch < 1:
+        raise ValueError(f"n_jobs and prefetch should be positive, got {n_jobs} and {prefetch}")
+    file_names = iter(file_names)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=n_jobs)
+    try:
+        for file_name in file_names:
+            pending.append(executor.submit(loader, file_name, **kwargs))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            result = pending.popleft().result()
+            # Keep the pipeline full before handing the result over
+            for file_name in file_names:
+                pending.append(executor.submit(loader, file_name, **kwargs))
+                break
+            yield result
+    finally:
+        # Stopping the iteration early drops the acquisitions not started yet
+        # (shutdown(cancel_futures=True) needs Python 3.9)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from hyperpy.loading.envi_header import find_hdr_file
+
+# Size of the blocks hashed at the start, the middle and the end of each file
+FINGERPRINT_BLOCK_SIZE = 1 << 16
+# Default size limit of a cache directory
+DEFAULT_CACHE_BYTES = 8 << 30
+CACHE_EXTENSION = ".npy"
+# Cubes being calibrated, moved to CACHE_EXTENSION once written
+TEMPORARY_EXTENSION = ".tmp"
+
+
+class ReflectanceCache:
+    """
+    On-disk cache of calibrated reflectance cubes, e.g. read_specim(file_name, cache=ReflectanceCache(cache_dir)).
+    The cubes are stored as .npy files named after a fingerprint of the raw, reference and header files
+    (size, modification time and hash of sampled blocks) and of the calibration parameters.
+    A hit returns a read-only memory-mapped cube. The least recently used cubes are evicted above max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        :param cache_dir: directory of the cached cubes, created if needed.
+        :param max_bytes: size limit of the cache directory.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, file_names: Sequence[str], **parameters) -> str:
+        """
+        Build the cache key of a calibration.
+        :param file_names: raw and reference files, their headers are fingerprinted as well.
+        :param parameters: JSON serializable calibration parameters.
+        :return: hexadecimal key.
+        """
+        fingerprints = []
+        for file_name in file_names:
+            fingerprints.append(file_fingerprint(file_name))
+            hdr_file_name = find_hdr_file(file_name)
+            if hdr_file_name is not None:
+                fingerprints.append(file_fingerprint(hdr_file_name))
+        content = json.dumps([fingerprints, parameters], sort_keys=True, default=str)
+        return hashlib.blake2b(content.encode(), digest_size=20).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def load(self, key: str) -> Optional[np.memmap]:
+        """
+        Get a cached cube and mark it as recently used.
+        :param key: cache key.
+        :return: read-only memory-mapped cube, None if not cached.
+        """
+        path = self.path(key)
+        try:
+            cube = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return cube
+
+    def create(self, key: str, shape: tuple, dtype: np.dtype) -> np.memmap:
+        """
+        Create a temporary cube to calibrate in, to be passed to store once written.
+        :param key: cache key.
+        :param shape: cube shape.
+        :param dtype: cube data type.
+        :return: writable memory-mapped cube.
+        """
+        temporary_path = os.path.join(
+            self.cache_dir, f"{key}.{os.getpid()}.{threading.get_ident()}{TEMPORARY_EXTENSION}"
+        )
+        return np.lib.format.open_memmap(temporary_path, mode="w+", dtype=dtype, shape=shape)
+
+    def store(self, key: str, cube: np.memmap) -> np.memmap:
+        """
+        Move a cube created with create in the cache and evict the least recently used cubes.
+        :param key: cache key.
+        :param cube: cube returned by create.
+        :return: read-only memory-mapped cube.
+        """
+        cube.flush()
+        # Atomic, concurrent readers never see a partially written cube
+        os.replace(cube.filename, self.path(key))
+        self.evict(keep=key)
+        return self.load(key)
+
+    def compute(
+        self, key: str, shape: tuple, dtype: np.dtype, calibrate: Callable[[np.memmap], None]
+    ) -> np.memmap:
+        """
+        Calibrate a cube in a temporary cube and store it, the temporary file being removed if anything fails.
+        :param key: cache key.
+        :param shape: cube shape.
+        :param dtype: cube data type.
+        :param calibrate: function writing the cube in the writable memory-mapped cube it is given.
+        :return: read-only memory-mapped cube.
+        """
+        cube = self.create(key, shape, dtype)
+        temporary_path = cube.filename
+        try:
+            calibrate(cube)
+            return self.store(key, cube)
+        except BaseException:
+            # Release our map of the file before removing it
+            cube = None
+            try:
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove the least recently used cubes until the cache fits in max_bytes.
+        :param keep: key never evicted.
+        :return:
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Remove all the cached cubes, and the temporary cubes left by interrupted calibrations.
+        :return:
+        """
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith((CACHE_EXTENSION, TEMPORARY_EXTENSION)):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    @property
+    def size(self) -> int:
+        """
+        Size of the cached cubes in bytes.
+        """
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(CACHE_EXTENSION)
+        )
+
+
+def file_fingerprint(file_name: str, block_size: int = FINGERPRINT_BLOCK_SIZE) -> tuple:
+    """
+    Fingerprint a file without reading it entirely: size, modification time and hash of its first, middle and last blocks.
+    :param file_name: path to the file.
+    :param block_size: size of the hashed blocks.
+    :return: (absolute path, size, modification time, hash)
+    """
+    stat = os.stat(file_name)
+    digest = hashlib.blake2b(digest_size=16)
+    offsets = {
+        0,
+        max(0, stat.st_size // 2 - block_size // 2),
+        max(0, stat.st_size - block_size),
+    }
+    with open(file_name, "rb") as f:
+        for offset in sorted(offsets):
+            f.seek(offset)
+            digest.update(f.read(block_size))
+    return os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns, digest.hexdigest()
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from hyperpy.loading.envi_header import find_hdr_file, read_envi_header
+from hyperpy.loading.utils import add_prefix_filename
+
+REFERENCE_PREFIXES = ("WHITEREF_", "DARKREF_")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS acquisitions (
+    path TEXT PRIMARY KEY,
+    hdr_path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    white_ref_path TEXT,
+    dark_ref_path TEXT,
+    samples INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    bands INTEGER NOT NULL,
+    dtype TEXT NOT NULL,
+    interleave TEXT NOT NULL,
+    wavelength TEXT,
+    acquisition_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS acquisitions_bands ON acquisitions (bands);
+CREATE INDEX IF NOT EXISTS acquisitions_time ON acquisitions (acquisition_time);
+"""
+
+COLUMNS = (
+    "path",
+    "hdr_path",
+    "mtime_ns",
+    "white_ref_path",
+    "dark_ref_path",
+    "samples",
+    "lines",
+    "bands",
+    "dtype",
+    "interleave",
+    "wavelength",
+    "acquisition_time",
+)
+
+
+@dataclass
+class Acquisition:
+    """
+    Metadata of an indexed acquisition, read from the catalog without opening its header.
+    """
+
+    path: str
+    white_ref_path: Optional[str]
+    dark_ref_path: Optional[str]
+    shape: Tuple[int, int, int]
+    dtype: np.dtype
+    interleave: str
+    wavelength: Optional[np.array]
+    acquisition_time: datetime
+
+
+class AcquisitionCatalog:
+    """
+    Index of the acquisitions (X.raw/X.hdr with WHITEREF_X/DARKREF_X references) of directory trees,
+    stored in a local SQLite database and updated incrementally on the files modification time.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        :param index_path: path to the SQLite index file, created if needed.
+        """
+        self.index_path = index_path
+        # (path, error) of the acquisitions whose header could not be read by the last scan
+        self.failures: List[Tuple[str, str]] = []
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Close the index.
+        :return:
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def scan(self, root: str, n_jobs: int = 8) -> int:
+        """
+        Index the acquisitions of a directory tree.
+        Only the new acquisitions and the ones modified since the last scan have their header read,
+        and the acquisitions removed from the tree are removed from the index.
+        An acquisition whose header cannot be read (e.g. truncated) is skipped and listed in self.failures.
+        :param root: root directory to scan.
+        :param n_jobs: number of threads reading the headers.
+        :return: number of acquisitions (re)indexed.
+        """
+        root = os.path.abspath(root)
+        with self.lock:
+            indexed = dict(
+                self.connection.execute(
+                    "SELECT path, mtime_ns FROM acquisitions WHERE substr(path, 1, length(?)) = ?",
+                    (os.path.join(root, ""),) * 2,
+                ).fetchall()
+            )
+        data_files = find_data_files(root, n_jobs)
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            rows = list(executor.map(lambda path: index_row(path, indexed.get(path)), data_files))
+        self.failures = [(path, error) for path, (_, _, error) in zip(data_files, rows) if error is not None]
+        updated = [row for row, _, _ in rows if row is not None]
+        references = [references for row, references, _ in rows if row is None and references is not None]
+        with_header = {references[2] for _, references, _ in rows if references is not None}
+        removed = [(path,) for path in set(indexed) - with_header]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO acquisitions ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                updated,
+            )
+            self.connection.executemany(
+                "UPDATE acquisitions SET white_ref_path = ?, dark_ref_path = ? WHERE path = ?",
+                references,
+            )
+            self.connection.executemany("DELETE FROM acquisitions WHERE path = ?", removed)
+        return len(updated)
+
+    def query(
+        self,
+        min_bands: Optional[int] = None,
+        max_bands: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        with_references: bool = False,
+        root: Optional[str] = None,
+    ) -> List[Acquisition]:
+        """
+        Select acquisitions from the index, e.g. catalog.query(min_bands=224, since=monday).
+        :param min_bands: minimal number of bands.
+        :param max_bands: maximal number of bands.
+        :param since: earliest acquisition time.
+        :param until: latest acquisition time (excluded).
+        :param with_references: only the acquisitions with both white and dark references.
+        :param root: only the acquisitions under this directory.
+        :return: list of Acquisition sorted by acquisition time.
+        """
+        conditions = []
+        parameters = []
+        if min_bands is not None:
+            conditions.append("bands >= ?")
+            parameters.append(min_bands)
+        if max_bands is not None:
+            conditions.append("bands <= ?")
+            parameters.append(max_bands)
+        if since is not None:
+            conditions.append("acquisition_time >= ?")
+            parameters.append(to_timestamp(since))
+        if until is not None:
+            conditions.append("acquisition_time < ?")
+            parameters.append(to_timestamp(until))
+        if with_references:
+            conditions.append("white_ref_path IS NOT NULL AND dark_ref_path IS NOT NULL")
+        if root is not None:
+            conditions.append("substr(path, 1, length(?)) = ?")
+            parameters.extend((os.path.join(os.path.abspath(root), ""),) * 2)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM acquisitions {where} ORDER BY acquisition_time",
+                parameters,
+            ).fetchall()
+        return [to_acquisition(row) for row in rows]
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM acquisitions").fetchone()[0]
+
+
+def find_data_files(root: str, n_jobs: int = 8) -> List[str]:
+    """
+    Find the .raw data files (references excluded) of a directory tree, the sub-directories being listed in parallel.
+    :param root: root directory.
+    :param n_jobs: number of threads listing the directories.
+    :return: sorted list of absolute paths.
+    """
+    data_files = []
+    directories = [root]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        while directories:
+            listed = list(executor.map(list_directory, directories))
+            directories = [directory for sub_directories, _ in listed for directory in sub_directories]
+            data_files.extend(file_name for _, file_names in listed for file_name in file_names)
+    return sorted(data_files)
+
+
+def list_directory(directory: str) -> Tuple[List[str], List[str]]:
+    """
+    List the sub-directories and the .raw data files of a directory.
+    """
+    sub_directories, data_files = [], []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return sub_directories, data_files
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            sub_directories.append(entry.path)
+        elif entry.name.lower().endswith(".raw") and not entry.name.startswith(REFERENCE_PREFIXES):
+            data_files.append(entry.path)
+    return sub_directories, data_files
+
+
+def index_row(
+    path: str, indexed_mtime_ns: Optional[int]
+) -> Tuple[Optional[tuple], Optional[tuple], Optional[str]]:
+    """
+    Build the index row of an acquisition.
+    The errors are caught so that one broken acquisition does not abort the scan of a whole tree.
+    :param path: path to the .raw file.
+    :param indexed_mtime_ns: modification time stored in the index, None if not indexed.
+    :return: full row (None if the acquisition did not change), (white, dark, path) references
+        (None without header or on error) and error message (None on success).
+    """
+    try:
+        hdr_path = find_hdr_file(path) if os.path.isfile(path) else None
+        if hdr_path is None:
+            return None, None, None
+        mtime_ns = max(os.stat(path).st_mtime_ns, os.stat(hdr_path).st_mtime_ns)
+        white_ref_path = existing_reference(path, "WHITEREF_")
+        dark_ref_path = existing_reference(path, "DARKREF_")
+        references = (white_ref_path, dark_ref_path, path)
+        if indexed_mtime_ns == mtime_ns:
+            return None, references, None
+        header = read_envi_header(hdr_path)
+        wavelength = None if header.wavelength is None else json.dumps(header.wavelength.tolist())
+        row = (
+            path,
+            hdr_path,
+            mtime_ns,
+            white_ref_path,
+            dark_ref_path,
+            header.samples,
+            header.lines,
+            header.bands,
+            header.dtype.str,
+            header.interleave,
+            wavelength,
+            acquisition_timestamp(header.fields, path),
+        )
+    except Exception as error:
+        return None, None, f"{type(error).__name__}: {error}"
+    return row, references, None
+
+
+def existing_reference(path: str, prefix: str) -> Optional[str]:
+    """
+    Get the reference file of an acquisition if it exists.
+    """
+    reference_path = add_prefix_filename(path, prefix)
+    return reference_path if os.path.isfile(reference_path) else None
+
+
+def acquisition_timestamp(header_fields: dict, path: str) -> float:
+    """
+    Get the acquisition time from the header: ENVI "acquisition time" or Specim "acquisition date" and "start time".
+    Fall back to the modification time of the data file.
+    :return: POSIX timestamp.
+    """
+    if "acquisition time" in header_fields:
+        try:
+            value = header_fields["acquisition time"].strip().replace("Z", "+00:00")
+            return to_timestamp(datetime.fromisoformat(value))
+        except ValueError:
+            pass
+    date = re.search(r"(\d{2})-(\d{2})-(\d{4})", header_fields.get("acquisition date", ""))
+    if date is not None:
+        time = re.search(r"(\d{2}):(\d{2}):(\d{2})", header_fields.get("start time", ""))
+        day, month, year = (int(value) for value in date.groups())
+        hour, minute, second = (int(value) for value in time.groups()) if time else (0, 0, 0)
+        try:
+            return datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    return os.stat(path).st_mtime
+
+
+def to_timestamp(date: datetime) -> float:
+    """
+    Convert a datetime to a POSIX timestamp, naive datetimes being UTC.
+    """
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def to_acquisition(row: tuple) -> Acquisition:
+    """
+    Convert an index row to an Acquisition.
+    """
+    values = dict(zip(COLUMNS, row))
+    wavelength = values["wavelength"]
+    return Acquisition(
+        path=values["path"],
+        white_ref_path=values["white_ref_path"],
+        dark_ref_path=values["dark_ref_path"],
+        shape=(values["samples"], values["lines"], values["bands"]),
+        dtype=np.dtype(values["dtype"]),
+        interleave=values["interleave"],
+        wavelength=None if wavelength is None else np.array(json.loads(wavelength)),
+        acquisition_time=datetime.fromtimestamp(values["acquisition_time"], tz=timezone.utc),
+    )
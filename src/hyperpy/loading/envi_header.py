@@ -20,6 +20,11 @@ import collections
 import os
 import re
 import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
 import numpy
 
 ENVI_TO_NUMPY_DTYPE = {
@@ -36,6 +41,11 @@ ENVI_TO_NUMPY_DTYPE = {
     "15": numpy.uint64,
 }
 
+ENVI_INTERLEAVES = ("bsq", "bil", "bip")
+
+# Number of parsed headers kept in memory by read_envi_header
+HEADER_CACHE_SIZE = 4096
+
 
 def find_hdr_file(raw_file_name: str) -> str:
     """
@@ -87,15 +97,16 @@ def read_hdr_file(hdrfilename, keep_case=False):
 
     # Read line, split it on equals, strip whitespace from resulting strings
     # and add key/value pair to output
+    # (plain string methods are used instead of regular expressions for speed)
     for currentline in hdrfile:
         # ENVI headers accept blocks bracketed by curly braces - check for these
         if not inblock:
             # Check for a comment
-            if re.search("^;", currentline) is not None:
+            if currentline.startswith(";"):
                 comments += currentline
             # Split line on first equals sign
-            elif re.search("=", currentline) is not None:
-                linesplit = re.split("=", currentline, 1)
+            elif "=" in currentline:
+                linesplit = currentline.split("=", 1)
                 key = linesplit[0].strip()
                 # Convert all values to lower case unless requested to keep.
                 if not keep_case:
@@ -104,24 +115,24 @@ def read_hdr_file(hdrfilename, keep_case=False):
 
                 # If value starts with an open brace, it's the start of a block
                 # - strip the brace off and read the rest of the block
-                if re.match("{", value) is not None:
+                if value.startswith("{"):
                     inblock = True
-                    value = re.sub("^{", "", value, 1)
+                    value = value[1:]
 
                     # If value ends with a close brace it's the end
                     # of the block as well - strip the brace off
-                    if re.search("}$", value):
+                    if value.endswith("}"):
                         inblock = False
-                        value = re.sub("}$", "", value, 1)
+                        value = value[:-1]
                 value = value.strip()
                 output[key] = value
         else:
             # If we're in a block, just read the line, strip whitespace
             # (and any closing brace ending the block) and add the whole thing
             value = currentline.strip()
-            if re.search("}$", value):
+            if value.endswith("}"):
                 inblock = False
-                value = re.sub("}$", "", value, 1)
+                value = value[:-1]
                 value = value.strip()
             output[key] = output[key] + value
 
@@ -132,6 +143,118 @@ def read_hdr_file(hdrfilename, keep_case=False):
     return output
 
 
+@dataclass(frozen=True, eq=False)
+class EnviHeader:
+    """
+    Typed content of an ENVI header file, parsed once and shared by the loading functions.
+    """
+
+    file_name: str
+    samples: int
+    lines: int
+    bands: int
+    header_offset: int
+    dtype: numpy.dtype
+    interleave: str
+    wavelength: Optional[numpy.ndarray]
+    # Read-only view of all the header fields, the header being shared through the cache
+    fields: Mapping[str, str] = field(repr=False)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """
+        Shape of the cube as (samples, lines, bands)
+        """
+        return self.samples, self.lines, self.bands
+
+    @staticmethod
+    def from_dict(file_name: str, header_dict: dict) -> "EnviHeader":
+        """
+        Build an EnviHeader from the dictionary returned by read_hdr_file.
+        Missing "data type", "interleave" and "byte order" default to bil uint16 little endian.
+        """
+        interleave = header_dict.get("interleave", "bil").strip().lower()
+        if interleave not in ENVI_INTERLEAVES:
+            raise ValueError(
+                f"{interleave} is an invalid interleave. Should be among {list(ENVI_INTERLEAVES)}"
+            )
+        wavelength = header_dict.get("wavelength")
+        if wavelength is not None:
+            wavelength = parse_numeric_list(wavelength)
+            wavelength.flags.writeable = False
+        return EnviHeader(
+            file_name=file_name,
+            samples=int(header_dict["samples"]),
+            lines=int(header_dict["lines"]),
+            bands=int(header_dict["bands"]),
+            header_offset=int(header_dict.get("header offset", 0)),
+            dtype=get_envi_dtype(header_dict),
+            interleave=interleave,
+            wavelength=wavelength,
+            fields=MappingProxyType(dict(header_dict)),
+        )
+
+
+def get_envi_dtype(header_dict: dict) -> numpy.dtype:
+    """
+    Return the numpy data type, with the file byte order, described by an ENVI header.
+    Default to uint16 if "data type" is missing.
+    """
+    data_type = str(header_dict.get("data type", "12")).strip()
+    if data_type not in ENVI_TO_NUMPY_DTYPE:
+        raise ValueError(
+            f"{data_type} is an invalid data type. Should be among {list(ENVI_TO_NUMPY_DTYPE)}"
+        )
+    byte_order = ">" if str(header_dict.get("byte order", "0")).strip() == "1" else "<"
+    return numpy.dtype(ENVI_TO_NUMPY_DTYPE[data_type]).newbyteorder(byte_order)
+
+
+def get_envi_data_type(dtype: numpy.dtype) -> Tuple[str, str]:
+    """
+    Return the ENVI "data type" and "byte order" header values of a numpy data type.
+    """
+    dtype = numpy.dtype(dtype)
+    for data_type, envi_dtype in ENVI_TO_NUMPY_DTYPE.items():
+        if numpy.dtype(envi_dtype) == dtype.newbyteorder("="):
+            break
+    else:
+        raise ValueError(
+            f"{dtype} cannot be written in an ENVI file. Should be among "
+            f"{[numpy.dtype(envi_dtype).name for envi_dtype in ENVI_TO_NUMPY_DTYPE.values()]}"
+        )
+    big_endian = dtype.byteorder == ">" or (dtype.byteorder == "=" and sys.byteorder == "big")
+    return data_type, "1" if big_endian else "0"
+
+
+def parse_numeric_list(value: str) -> numpy.ndarray:
+    """
+    Convert a comma separated list of numbers from a header block to a float array.
+    The items are converted by numpy at once, the surrounding spaces and new lines being ignored.
+    """
+    value = value.strip(" ,\t\r\n")
+    if not value:
+        return numpy.empty(0, dtype=numpy.float64)
+    return numpy.array(value.split(","), dtype=numpy.float64)
+
+
+def read_envi_header(hdrfilename: str) -> EnviHeader:
+    """
+    Read an ENVI header file to an EnviHeader.
+
+    The parsed header is cached by path and modification time, so reading the
+    same header again only costs a stat call. Rewritten files are parsed again.
+    """
+    stat = os.stat(hdrfilename)
+    return _read_envi_header_cached(
+        os.path.abspath(hdrfilename), stat.st_mtime_ns, stat.st_size
+    )
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _read_envi_header_cached(hdrfilename: str, mtime_ns: int, size: int) -> EnviHeader:
+    return EnviHeader.from_dict(hdrfilename, read_hdr_file(hdrfilename))
+
+
 def write_envi_header(filename, header_dict):
     """
     Writes a dictionary to an ENVI header file
@@ -0,0 +1,188 @@
+import os
+import time
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from hyperpy.loading.envi_header import find_hdr_file, read_envi_header
+from hyperpy.loading.utils import (
+    DEFAULT_DTYPE,
+    INTERLEAVE_AXES,
+    add_prefix_filename,
+    read_raw,
+    reference_average,
+    stream_reflectance,
+)
+
+# Interleaves storing complete lines one after the other, the only ones that can grow line by line
+LINE_INTERLEAVES = ("bil", "bip")
+# Number of lines allocated when the growing cube is created
+INITIAL_CAPACITY = 256
+
+
+class LiveReader:
+    """
+    Incremental reader of an ENVI .raw file growing while a pushbroom acquisition is running.
+    Each poll decodes and calibrates only the complete lines written since the previous one,
+    using the white and dark averages computed once.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        white_ref_file_name: Optional[str] = None,
+        dark_ref_file_name: Optional[str] = None,
+        white_average: Optional[np.array] = None,
+        dark_average: Optional[np.array] = None,
+        dtype: np.dtype = DEFAULT_DTYPE,
+    ):
+        """
+        :param file_name: path to the growing .raw file, its header should already be written.
+        :param white_ref_file_name: path to the white reference, "WHITEREF_" + file name if None.
+        :param dark_ref_file_name: path to the dark reference, "DARKREF_" + file name if None and it exists.
+        :param white_average: white reference averaged over the lines, of shape (samples, bands).
+            Used instead of the white reference file, e.g. for a hyspex acquisition.
+        :param dark_average: dark reference averaged over the lines, of shape (samples, bands).
+        :param dtype: data type of the reflectance.
+        """
+        self.file_name = file_name
+        self.header = read_envi_header(find_hdr_file(file_name))
+        if self.header.interleave not in LINE_INTERLEAVES:
+            raise ValueError(
+                f"{self.header.interleave} files cannot be read line by line. "
+                f"Should be among {list(LINE_INTERLEAVES)}"
+            )
+        self.dtype = dtype
+        if white_average is None:
+            if white_ref_file_name is None:
+                white_ref_file_name = add_prefix_filename(file_name, "WHITEREF_")
+            white_average = reference_average(read_raw(white_ref_file_name, lazy=True))
+        if dark_average is None:
+            if dark_ref_file_name is None:
+                dark_ref_file_name = add_prefix_filename(file_name, "DARKREF_")
+            if os.path.isfile(dark_ref_file_name):
+                dark_average = reference_average(read_raw(dark_ref_file_name, lazy=True))
+        self.white_average = white_average
+        self.dark_average = dark_average
+        self.axes = INTERLEAVE_AXES[self.header.interleave]
+        self.line_bytes = self.header.samples * self.header.bands * self.header.dtype.itemsize
+        self.lines = 0
+        self.buffer = np.empty(
+            (self.header.samples, INITIAL_CAPACITY, self.header.bands), dtype=dtype
+        )
+        self.wavelength = self.header.wavelength
+        if self.wavelength is None:
+            self.wavelength = np.arange(1, self.header.bands + 1)
+
+    def available_lines(self) -> int:
+        """
+        Number of complete lines written in the file.
+        """
+        size = os.path.getsize(self.file_name)
+        return max(0, size - self.header.header_offset) // self.line_bytes
+
+    def poll(self) -> Optional[np.array]:
+        """
+        Read and calibrate the lines written since the previous poll.
+        :return: reflectance of the new lines of shape (samples, new lines, bands), None if no new line.
+        """
+        available = self.available_lines()
+        if available <= self.lines:
+            return None
+        start, stop = self.lines, available
+        shape = (self.header.samples, stop - start, self.header.bands)
+        with open(self.file_name, "rb") as f:
+            f.seek(self.header.header_offset + start * self.line_bytes)
+            raw = np.fromfile(f, dtype=self.header.dtype, count=int(np.prod(shape)))
+        # Reorder the new lines to (samples, lines, bands) without copy
+        raw = raw.reshape(tuple(shape[axis] for axis in self.axes))
+        raw = np.transpose(raw, np.argsort(self.axes))
+        self._reserve(stop)
+        block = self.buffer[:, start:stop, :]
+        stream_reflectance(
+            raw,
+            self.white_average,
+            self.dark_average,
+            out=block,
+            chunk_size=stop - start,
+        )
+        self.lines = stop
+        return block
+
+    def _reserve(self, lines: int):
+        """
+        Grow the buffer to hold lines, doubling its capacity to amortize the copies.
+        """
+        capacity = self.buffer.shape[1]
+        if lines <= capacity:
+            return
+        while capacity < lines:
+            capacity *= 2
+        buffer = np.empty(
+            (self.buffer.shape[0], capacity, self.buffer.shape[2]), dtype=self.dtype
+        )
+        buffer[:, : self.lines, :] = self.buffer[:, : self.lines, :]
+        self.buffer = buffer
+
+    @property
+    def data(self) -> np.array:
+        """
+        Reflectance of the lines read so far, of shape (samples, lines, bands).
+        """
+        return self.buffer[:, : self.lines, :]
+
+    @property
+    def cube(self):
+        """
+        Growing SpectralCube of the lines read so far.
+        """
+        from hyperpy.spectral import SpectralCube
+
+        return SpectralCube(
+            data=self.data, domain=self.wavelength, metadata={"source": self.file_name}
+        )
+
+    def iter_blocks(
+        self,
+        min_lines: int = 1,
+        poll_interval: float = 0.1,
+        idle_timeout: Optional[float] = 5.0,
+        max_lines: Optional[int] = None,
+    ) -> Iterator:
+        """
+        Follow the acquisition and yield each new block of lines as a SpectralCube,
+        e.g. to classify the lines with a k-means model while the belt is moving.
+        :param min_lines: minimal number of lines of a block, except for the last one.
+        :param poll_interval: time between two polls in seconds.
+        :param idle_timeout: stop when the file did not grow for this time in seconds. If None, never stop on idle.
+        :param max_lines: stop when this number of lines has been read. If None, no limit.
+        :return: iterator of SpectralCube.
+        """
+        from hyperpy.spectral import SpectralCube
+
+        block_start = self.lines
+        last_growth = time.monotonic()
+        while True:
+            if self.poll() is not None:
+                last_growth = time.monotonic()
+            finished = (max_lines is not None and self.lines >= max_lines) or (
+                idle_timeout is not None and time.monotonic() - last_growth > idle_timeout
+            )
+            if self.lines - block_start >= min_lines or (finished and self.lines > block_start):
+                block = self.buffer[:, block_start : self.lines, :]
+                yield SpectralCube(data=block, domain=self.wavelength)
+                block_start = self.lines
+            if finished:
+                return
+            time.sleep(poll_interval)
+
+    def run(self, callback: Callable, **kwargs):
+        """
+        Call callback(block) for each new block of lines until the acquisition stops.
+        :param callback: function called with each block as a SpectralCube.
+        :param kwargs: passed to iter_blocks.
+        :return: growing SpectralCube of all the lines read.
+        """
+        for block in self.iter_blocks(**kwargs):
+            callback(block)
+        return self.cube
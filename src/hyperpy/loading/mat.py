@@ -0,0 +1,90 @@
+from typing import Optional
+
+import numpy as np
+
+from hyperpy.loading.store import check_h5py, h5py
+
+# Offset of the HDF5 signature in a MATLAB v7.3 file, after its 512 bytes user block
+MAT_V73_SIGNATURE_OFFSET = 512
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+# Groups written by MATLAB for the cell arrays and objects, not variables
+MAT_V73_INTERNAL_KEYS = ("#refs#", "#subsystem#")
+
+
+def is_mat_v73(file_name: str) -> bool:
+    """
+    check if a .mat file is a MATLAB v7.3 file, i.e. an HDF5 file
+
+    file_name: str, path to the .mat file. False if it cannot be opened, the error being left to the reader.
+    """
+    try:
+        with open(file_name, "rb") as f:
+            f.seek(MAT_V73_SIGNATURE_OFFSET)
+            return f.read(len(HDF5_SIGNATURE)) == HDF5_SIGNATURE
+    except OSError:
+        return False
+
+
+class MatDataset:
+    """
+    Lazy view of a MATLAB v7.3 variable in MATLAB axes order.
+    MATLAB stores arrays column-major, so the HDF5 dataset has the reversed shape:
+    the index is reversed to read only the selected chunks, then the (small) result is transposed.
+    """
+
+    def __init__(self, dataset: "h5py.Dataset"):
+        self.dataset = dataset
+        self.file = dataset.file
+        self.shape = dataset.shape[::-1]
+        self.ndim = len(self.shape)
+        self.dtype = dataset.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, index) -> np.array:
+        if not isinstance(index, tuple):
+            index = (index,)
+        if any(item is Ellipsis for item in index):
+            position = next(i for i, item in enumerate(index) if item is Ellipsis)
+            fill = (slice(None),) * (self.ndim - len(index) + 1)
+            index = index[:position] + fill + index[position + 1 :]
+        index = index + (slice(None),) * (self.ndim - len(index))
+        return np.transpose(self.dataset[index[::-1]])
+
+    def __array__(self, dtype=None) -> np.array:
+        array = np.transpose(self.dataset[()])
+        return array if dtype is None else array.astype(dtype)
+
+    def close(self):
+        """
+        close the file of the variable, it cannot be read afterwards
+        """
+        self.file.close()
+
+
+def open_mat_v73(file_name: str, variable_name: Optional[str] = None) -> MatDataset:
+    """
+    open a variable of a MATLAB v7.3 file without reading it
+
+    file_name: str, path to the .mat file.
+    variable_name: str, name of the variable. If None, the first variable of the file.
+
+    MatDataset, lazy view of the variable. The file stays open until MatDataset.close is called.
+    """
+    check_h5py()
+    mat_file = h5py.File(file_name, "r")
+    if variable_name is None:
+        variable_names = [
+            key
+            for key, item in mat_file.items()
+            if key not in MAT_V73_INTERNAL_KEYS and isinstance(item, h5py.Dataset)
+        ]
+        if not variable_names:
+            mat_file.close()
+            raise ValueError(f"{file_name} does not contain any array")
+        variable_name = variable_names[0]
+    elif variable_name not in mat_file:
+        mat_file.close()
+        raise KeyError(f"{variable_name} is not a variable of {file_name}")
+    return MatDataset(mat_file[variable_name])
@@ -0,0 +1,125 @@
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:  # pragma: no cover
+    h5py = None
+
+STORE_FORMAT = "hyperpy-cube"
+STORE_VERSION = 1
+DATA_KEY = "data"
+DOMAIN_KEY = "domain"
+DEFAULT_CHUNKS = (64, 64, 32)
+DEFAULT_COMPRESSION = "lzf"
+
+
+def check_h5py():
+    """
+    raise an ImportError if the optional h5py dependency is missing.
+    """
+    if h5py is None:
+        raise ImportError(
+            "h5py is required to read and write HDF5 files, install it with pip install hyperpy[hdf5]"
+        )
+
+
+def get_chunks(shape: Tuple[int, int, int], chunks: Optional[Tuple[int, int, int]] = None) -> Tuple[int, int, int]:
+    """
+    get the (samples, lines, bands) chunk shape, clipped to the cube shape.
+
+    shape: tuple, shape of the cube.
+    chunks: tuple, requested chunk shape, DEFAULT_CHUNKS if None.
+    """
+    chunks = DEFAULT_CHUNKS if chunks is None else chunks
+    if len(chunks) != 3:
+        raise ValueError(f"chunks should have 3 dimensions, got {chunks}")
+    return tuple(max(1, min(int(chunk), size)) for chunk, size in zip(chunks, shape))
+
+
+def write_cube_store(
+    file_name: str,
+    data: np.array,
+    domain: np.array,
+    chunks: Optional[Tuple[int, int, int]] = None,
+    compression: Optional[str] = DEFAULT_COMPRESSION,
+    compression_opts=None,
+    metadata: Optional[dict] = None,
+):
+    """
+    write a (samples, lines, bands) cube in a chunked and compressed HDF5 file.
+    The cube is written by slabs of chunk rows so a memory-mapped or stored cube is never fully loaded.
+
+    file_name: str, path to the store file, overwritten if it exists.
+    data: array like, cube data.
+    domain: numpy array, cube domain.
+    chunks: tuple, (samples, lines, bands) chunk shape, DEFAULT_CHUNKS if None.
+    compression: str, HDF5 filter: "lzf" (fast, default), "gzip" or None.
+    compression_opts: compression options, e.g. the gzip level.
+    metadata: dict, JSON serializable provenance stored with the cube.
+    """
+    check_h5py()
+    from hyperpy import __version__
+
+    shape = tuple(data.shape)
+    if len(shape) != 3:
+        raise ValueError(f"data should have 3 dimensions, got {len(shape)}")
+    chunks = get_chunks(shape, chunks)
+    domain = np.asarray(domain)
+    if domain.dtype.kind in "UO":
+        domain = domain.astype(object)
+        domain_dtype = h5py.string_dtype()
+    else:
+        domain_dtype = domain.dtype
+    with h5py.File(file_name, "w") as store:
+        store.attrs["format"] = STORE_FORMAT
+        store.attrs["version"] = STORE_VERSION
+        store.attrs["hyperpy_version"] = __version__
+        store.attrs["created"] = datetime.now(timezone.utc).isoformat()
+        store.attrs["metadata"] = json.dumps(metadata or {})
+        dataset = store.create_dataset(
+            DATA_KEY,
+            shape=shape,
+            dtype=data.dtype,
+            chunks=chunks,
+            compression=compression,
+            compression_opts=compression_opts,
+            shuffle=compression is not None,
+        )
+        for start in range(0, shape[0], chunks[0]):
+            stop = min(start + chunks[0], shape[0])
+            dataset[start:stop] = np.asarray(data[start:stop])
+        store.create_dataset(DOMAIN_KEY, data=domain, dtype=domain_dtype)
+
+
+def open_cube_store(file_name: str) -> Tuple["h5py.Dataset", np.array, dict]:
+    """
+    open a cube store.
+    The data is returned as a h5py dataset: slicing it only reads and decompresses the chunks it touches.
+    The file stays open until data.file.close() is called (SpectralCube.close for SpectralCube.open).
+
+    file_name: str, path to the store file.
+    return: (data dataset, domain array, metadata dict with the provenance).
+    """
+    check_h5py()
+    store = h5py.File(file_name, "r")
+    try:
+        if store.attrs.get("format") != STORE_FORMAT:
+            raise ValueError(f"{file_name} is not a hyperpy cube store")
+        domain = store[DOMAIN_KEY]
+        if h5py.check_string_dtype(domain.dtype) is not None:
+            domain = domain.asstr()[()].astype(str)
+        else:
+            domain = domain[()]
+        metadata = {
+            "hyperpy_version": store.attrs["hyperpy_version"],
+            "created": store.attrs["created"],
+            **json.loads(store.attrs["metadata"]),
+        }
+    except BaseException:
+        store.close()
+        raise
+    return store[DATA_KEY], domain, metadata
@@ -1,19 +1,44 @@
 import ntpath
 import os
-from typing import Optional
+from typing import Optional, Sequence, Tuple, Union
 
 import numpy as np
 from scipy.io import loadmat
 
-from hyperpy.loading.envi_header import read_hdr_file, find_hdr_file
-
-
-def read_mat_file(file_name: str) -> np.array:
+from hyperpy.loading.cache import ReflectanceCache
+from hyperpy.loading.envi_header import (
+    find_hdr_file,
+    get_envi_data_type,
+    read_envi_header,
+    write_envi_header,
+)
+from hyperpy.loading.mat import is_mat_v73, open_mat_v73
+
+# On-disk axes order of each ENVI interleave, given as indexes of (samples, lines, bands)
+INTERLEAVE_AXES = {"bsq": (2, 1, 0), "bil": (1, 2, 0), "bip": (1, 0, 2)}
+# A (first, last) range of samples, lines or bands, the last one being excluded
+Range = Tuple[int, int]
+# Bands can also be selected with a list/array of indexes or a boolean mask
+BandSelection = Union[Range, Sequence[int], np.ndarray]
+# Number of lines calibrated at once by the streaming calibration
+DEFAULT_CHUNK_SIZE = 64
+# Data type of the reflectance computed by the loaders, float32 is enough for the sensors precision
+DEFAULT_DTYPE = np.float32
+
+
+def read_mat_file(file_name: str, variable_name: Optional[str] = None):
     """
     Read a matlab file and return a numpy array.
+    MATLAB v7.3 (HDF5) files are opened lazily: a MatDataset in MATLAB axes order is returned,
+    and only the chunks of the selected slices are read.
     :param file_name:
+    :param variable_name: name of the variable to read, the other ones are not loaded. If None, the first variable.
     :return:
     """
+    if is_mat_v73(file_name):
+        return open_mat_v73(file_name, variable_name)
+    if variable_name is not None:
+        return loadmat(file_name, variable_names=[variable_name])[variable_name]
     mat_dict: dict = loadmat(file_name)
     mat_key: str = [
         key
@@ -23,38 +48,200 @@ def read_mat_file(file_name: str) -> np.array:
     return mat_dict[mat_key]
 
 
-def read_raw(file_name: str, hdr_filename: Optional[str] = None):
+def open_raw(file_name: str, hdr_filename: Optional[str] = None):
     """
-    read a .raw file
+    memory-map a .raw file without reading its content
 
     file_name: str, path to the .raw file.
     hdr_filename: str, path to the corresponding .hdr file. If None, substitute the .raw extension with .hdr.
 
-    raw: numpy array containing raw data.
+    raw: read-only numpy memmap view of shape (samples, lines, bands). Pixels are only read from disk when accessed.
+    The "interleave", "data type" and "byte order" of the header are honored, bil uint16 being the default.
     """
     if hdr_filename is None:
         hdr_filename = os.path.splitext(file_name)[0] + ".hdr"
     # Read .hdr file
-    hdr_file = read_hdr_file(hdr_filename)
-    bands = int(hdr_file["bands"])
-    lines = int(hdr_file["lines"])
-    samples = int(hdr_file["samples"])
-    header_offset = int(hdr_file["header offset"])
-    # Read the .raw file
-    with open(file_name, "rb") as f:
-        f.seek(header_offset)
-        raw = np.fromfile(f, dtype=np.uint16)
-    # Reorder data
-    raw = raw.reshape(bands * lines, samples)
-    raw = raw.reshape(bands, lines, samples, order="F")
-    raw = np.transpose(raw, (2, 1, 0))
+    header = read_envi_header(hdr_filename)
+    # Map the .raw file in its on-disk order
+    axes = INTERLEAVE_AXES[header.interleave]
+    raw = np.memmap(
+        file_name,
+        dtype=header.dtype,
+        mode="r",
+        offset=header.header_offset,
+        shape=tuple(header.shape[axis] for axis in axes),
+    )
+    # Reorder data without copy
+    raw = np.transpose(raw, np.argsort(axes))
     return raw
 
 
+def create_raw(
+    file_name: str,
+    shape: Tuple[int, int, int],
+    dtype: np.dtype = DEFAULT_DTYPE,
+    interleave: str = "bil",
+    wavelength: Optional[np.array] = None,
+    hdr_filename: Optional[str] = None,
+):
+    """
+    create an ENVI .raw file and its .hdr file, and memory-map it for writing
+
+    file_name: str, path to the .raw file.
+    shape: tuple, (samples, lines, bands) shape of the cube.
+    dtype: numpy dtype, data type of the file, its byte order is written in the header. Default: DEFAULT_DTYPE (float32).
+    interleave: str, "bil", "bip" or "bsq". Default: "bil".
+    wavelength: numpy array, wavelength of the bands written in the header. If None, no wavelength. Default: None.
+    hdr_filename: str, path to the .hdr file. If None, substitute the .raw extension with .hdr.
+
+    raw: writable numpy memmap view of shape (samples, lines, bands), e.g. to pass as out to read_specim or spectral_process.
+    """
+    if interleave not in INTERLEAVE_AXES:
+        raise ValueError(
+            f"{interleave} is an invalid interleave. Should be among {list(INTERLEAVE_AXES)}"
+        )
+    if hdr_filename is None:
+        hdr_filename = os.path.splitext(file_name)[0] + ".hdr"
+    samples, lines, bands = shape
+    data_type, byte_order = get_envi_data_type(dtype)
+    header = {
+        "samples": samples,
+        "lines": lines,
+        "bands": bands,
+        "header offset": 0,
+        "file type": "ENVI Standard",
+        "data type": data_type,
+        "interleave": interleave,
+        "byte order": byte_order,
+    }
+    if wavelength is not None:
+        header["wavelength"] = ", ".join(str(value) for value in np.asarray(wavelength).tolist())
+    header["_comments"] = ""
+    write_envi_header(hdr_filename, header)
+    # Map the .raw file in its on-disk order
+    axes = INTERLEAVE_AXES[interleave]
+    raw = np.memmap(
+        file_name, dtype=dtype, mode="w+", shape=tuple(shape[axis] for axis in axes)
+    )
+    # Reorder data without copy
+    return np.transpose(raw, np.argsort(axes))
+
+
+def write_raw(
+    file_name: str,
+    data: np.array,
+    interleave: str = "bil",
+    dtype: Optional[np.dtype] = None,
+    wavelength: Optional[np.array] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    """
+    write a (samples, lines, bands) cube in an ENVI .raw file and its .hdr file, chunk of lines by chunk of lines
+
+    file_name: str, path to the .raw file.
+    data: array like of shape (samples, lines, bands). Can be memory-mapped or stored, it is never fully loaded.
+    interleave: str, "bil", "bip" or "bsq". Default: "bil".
+    dtype: numpy dtype, data type of the file. If None, the data type of data. Default: None.
+    wavelength: numpy array, wavelength of the bands written in the header. If None, no wavelength. Default: None.
+    chunk_size: int, number of lines written at once. Default: DEFAULT_CHUNK_SIZE.
+    """
+    dtype = data.dtype if dtype is None else dtype
+    raw = create_raw(file_name, data.shape, dtype, interleave, wavelength)
+    nbr_lines = data.shape[1]
+    for start in range(0, nbr_lines, chunk_size):
+        lines = slice(start, min(start + chunk_size, nbr_lines))
+        raw[:, lines, :] = data[:, lines, :]
+    raw.flush()
+
+
+def read_raw(
+    file_name: str,
+    hdr_filename: Optional[str] = None,
+    lazy: bool = False,
+    samples: Optional[Range] = None,
+    lines: Optional[Range] = None,
+    bands: Optional[BandSelection] = None,
+):
+    """
+    read a .raw file, or only a window of it
+
+    file_name: str, path to the .raw file.
+    hdr_filename: str, path to the corresponding .hdr file. If None, substitute the .raw extension with .hdr.
+    lazy: bool, if True return the memory-mapped view instead of loading the data in memory. Default: False.
+    samples: tuple, (first, last) range of samples to read. If None, all the samples. Default: None.
+    lines: tuple, (first, last) range of lines to read. If None, all the lines. Default: None.
+    bands: tuple, (first, last) range of bands to read, or list/array of band indexes or boolean mask. If None, all the bands. Default: None.
+
+    raw: numpy array containing raw data. Only the bytes of the window are read from the file.
+    """
+    mapped = open_raw(file_name, hdr_filename)
+    raw = select_window(mapped, samples, lines, bands)
+    if lazy or not np.may_share_memory(raw, mapped):
+        # Band indexes already copied the window from the file
+        return raw if lazy else np.asarray(raw)
+    # Single sequential read keeping the file memory layout
+    return np.array(raw)
+
+
+def select_window(
+    raw: np.array,
+    samples: Optional[Range] = None,
+    lines: Optional[Range] = None,
+    bands: Optional[BandSelection] = None,
+):
+    """
+    select a window of a (samples, lines, bands) array
+
+    raw: numpy array, possibly memory-mapped, of shape (samples, lines, bands).
+    samples: tuple, (first, last) range of samples. If None, all the samples. Default: None.
+    lines: tuple, (first, last) range of lines. If None, all the lines. Default: None.
+    bands: tuple, (first, last) range of bands, or list/array of band indexes or boolean mask. If None, all the bands. Default: None.
+
+    window: numpy array. A view of raw for ranges, a copy of the selected values only for band indexes.
+    """
+    # The ranges are applied first as a view, so that band indexes only copy the window
+    window = raw[range_slice(samples), range_slice(lines)]
+    return window[:, :, band_index(bands)]
+
+
+def range_slice(window_range: Optional[Range]) -> slice:
+    """
+    convert a (first, last) range to a slice
+
+    window_range: tuple, (first, last) range. If None, everything.
+
+    slice
+    """
+    if window_range is None:
+        return slice(None)
+    return slice(*window_range)
+
+
+def band_index(bands: Optional[BandSelection]):
+    """
+    convert a bands selection to an index
+
+    bands: tuple, (first, last) range of bands, or list/array of band indexes or boolean mask. If None, all the bands.
+
+    index: slice or numpy array.
+    """
+    if bands is None or isinstance(bands, tuple):
+        return range_slice(bands)
+    return np.asarray(bands)
+
+
 def read_specim(
     file_name: str,
     white_ref_file_name: Optional[str] = None,
     dark_ref_file_name: Optional[str] = None,
+    lazy: bool = False,
+    out: Optional[np.array] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: np.dtype = DEFAULT_DTYPE,
+    samples: Optional[Range] = None,
+    lines: Optional[Range] = None,
+    bands: Optional[BandSelection] = None,
+    cache: Optional[ReflectanceCache] = None,
 ):
     """
     reads hyperspectral specim file
@@ -62,57 +249,205 @@ def read_specim(
     file_name: str, path to the .raw file.
     white_ref_file_name: str, path to the corresponding white reference .raw file. If None, the file name with "WHITEREF_" before is searched.
     dark_ref_file_name: str, path to the corresponding dark reference .raw file. If None, the file name with "DARKREF_" before is searched.
-
-    raw: numpy array containing reflectance data.
+    lazy: bool, kept for compatibility, the raw measurement is always memory-mapped and calibrated chunk by chunk. Default: False.
+    out: numpy array, array of shape (samples, lines, bands) to write the reflectance in (e.g. a np.memmap). If None, an array of dtype is allocated.
+    chunk_size: int, number of lines calibrated at once. Default: DEFAULT_CHUNK_SIZE.
+    dtype: numpy dtype, data type of the reflectance when out is None. Default: DEFAULT_DTYPE (float32).
+    samples: tuple, (first, last) range of samples to read and calibrate. If None, all the samples. Default: None.
+    lines: tuple, (first, last) range of lines to read and calibrate. If None, all the lines. Default: None.
+    bands: tuple, (first, last) range of bands, or list/array of band indexes or boolean mask. If None, all the bands. Default: None.
+    cache: ReflectanceCache, if given and out is None, the reflectance is read from or written to the cache. Default: None.
+
+    raw: numpy array containing reflectance data, read-only memory-mapped when cached.
     wavelengths: numpy array containing wavelength values.
     """
     if white_ref_file_name is None:
         white_ref_file_name = add_prefix_filename(file_name, "WHITEREF_")
     if dark_ref_file_name is None:
         dark_ref_file_name = add_prefix_filename(file_name, "DARKREF_")
-
-    # Get raw measurement
-    raw = read_raw(file_name)
-    white_ref = read_raw(white_ref_file_name)
-    dark_ref = read_raw(dark_ref_file_name)
-    # Get the number of "samples" of the images
-    nbr_samples = raw.shape[1]
-    # Calculate reference average expanded
-    white_average_expanded = expand_average(white_ref, nbr_samples)
-    dark_average_expanded = expand_average(dark_ref, nbr_samples)
-    # Calculate reflectance
-    reflectance = get_reflectance(raw, white_average_expanded, dark_average_expanded)
     # Get the wavelength values
-    wavelengths = get_wavelength(file_name)
+    wavelengths = get_wavelength(file_name)[band_index(bands)]
+    if cache is not None and out is None:
+        key = cache.key(
+            (file_name, white_ref_file_name, dark_ref_file_name),
+            **calibration_parameters("specim", dtype, samples, lines, bands),
+        )
+        reflectance = cache.load(key)
+        if reflectance is not None:
+            return reflectance, wavelengths
+
+    # Get raw measurement, streamed from the file: only band indexes copy the window
+    raw = read_raw(file_name, lazy=True, samples=samples, lines=lines, bands=bands)
+    # References are only averaged, no need to load them
+    white_ref = read_raw(white_ref_file_name, lazy=True, samples=samples, bands=bands)
+    dark_ref = read_raw(dark_ref_file_name, lazy=True, samples=samples, bands=bands)
+    # Calculate reference average over the lines
+    white_average = reference_average(white_ref)
+    dark_average = reference_average(dark_ref)
+    # Calculate reflectance
+    if cache is not None and out is None:
+        reflectance = cache.compute(
+            key,
+            raw.shape,
+            dtype,
+            lambda cube: stream_reflectance(
+                raw, white_average, dark_average, out=cube, chunk_size=chunk_size
+            ),
+        )
+        return reflectance, wavelengths
+    reflectance = stream_reflectance(
+        raw, white_average, dark_average, out=out, chunk_size=chunk_size, dtype=dtype
+    )
     return reflectance, wavelengths
 
 
+def calibration_parameters(
+    reader: str,
+    dtype: np.dtype,
+    samples: Optional[Range] = None,
+    lines: Optional[Range] = None,
+    bands: Optional[BandSelection] = None,
+    **parameters,
+) -> dict:
+    """
+    gather the parameters of a calibration to build its cache key
+
+    reader: str, name of the reader.
+    dtype: numpy dtype, data type of the reflectance.
+    samples, lines, bands: window of the calibration.
+    parameters: other parameters of the reader.
+
+    parameters: dict of JSON serializable values.
+    """
+    if bands is not None and not isinstance(bands, tuple):
+        bands = np.asarray(bands).tolist()
+    return dict(
+        reader=reader,
+        dtype=np.dtype(dtype).str,
+        samples=samples,
+        lines=lines,
+        bands=bands,
+        **parameters,
+    )
+
+
+def reference_average(reference: np.array, average_dim: int = 1):
+    """
+    calculate the average of a reference measurement over its lines
+
+    reference: numpy array, reference measurement of shape (samples, lines, bands).
+    average_dim: int, dimension to calculate the average on. Default: 1.
+
+    average: numpy array of shape (samples, bands).
+    """
+    return np.mean(reference, axis=average_dim, dtype=np.float64)
+
+
+def stream_reflectance(
+    raw: np.array,
+    white_average: np.array,
+    dark_average: Optional[np.array] = None,
+    out: Optional[np.array] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: np.dtype = DEFAULT_DTYPE,
+    zero_denominator_replace: float = 1e-9,
+):
+    """
+    calculates reflectance data chunk of lines by chunk of lines
+
+    raw: numpy array, raw measurements of shape (samples, lines, bands). Can be memory-mapped.
+    white_average: numpy array, white reference averaged over the lines, of shape (samples, bands).
+    dark_average: numpy array, dark reference averaged over the lines, of shape (samples, bands). If None, dark is zero. Default: None.
+    out: numpy array, array of the raw shape to write the reflectance in (e.g. a np.memmap). If None, allocated with dtype.
+    chunk_size: int, number of lines calibrated at once. Default: DEFAULT_CHUNK_SIZE.
+    dtype: numpy dtype, data type of the allocated output. Default: DEFAULT_DTYPE (float32).
+    zero_denominator_replace: float, replace zero at the denominator. Default: 1e-9.
+
+    reflectance: numpy array containing reflectance data.
+    """
+    if dark_average is None:
+        dark_average = np.zeros(white_average.shape)
+    if out is None:
+        out = np.empty(raw.shape, dtype=dtype)
+    # Broadcast the references over the lines
+    dark = np.expand_dims(dark_average, 1).astype(out.dtype)
+    denominator = get_denominator(
+        white_average, dark_average, zero_denominator_replace
+    )
+    denominator = np.expand_dims(denominator, 1).astype(out.dtype)
+    nbr_lines = raw.shape[1]
+    for start in range(0, nbr_lines, chunk_size):
+        lines = slice(start, min(start + chunk_size, nbr_lines))
+        chunk = out[:, lines, :]
+        np.subtract(raw[:, lines, :], dark, out=chunk)
+        np.divide(chunk, denominator, out=chunk)
+    return out
+
+
 def get_reflectance(
     raw: np.array,
     white_ref: np.array,
     dark_ref: np.array = None,
     zero_denominator_replace: float = 1e-9,
+    out: Optional[np.array] = None,
+    dtype: np.dtype = DEFAULT_DTYPE,
 ):
     """
     calculates reflectance data from raw and reference measurements
 
     raw: numpy array, raw measurements.
-    white_ref: numpy array, white_ref measurements.
-    dark_ref: numpy array, dark_ref measurements. If None, dark_ref is zero. Default: None.
+    white_ref: numpy array, white_ref measurements. Either broadcastable to raw or averaged over the lines with shape (samples, bands).
+    dark_ref: numpy array, dark_ref measurements, same shape rules as white_ref. If None, dark_ref is zero. Default: None.
     zero_denominator_replace: float, replace zero at the denominator. Default: 1e-9.
+    out: numpy array, array of the raw shape to write the reflectance in. If None, allocated with dtype. Default: None.
+    dtype: numpy dtype, data type of the allocated reflectance. Default: DEFAULT_DTYPE (float32).
 
     raw: numpy array containing reflectance data.
     """
+    white_ref = broadcast_reference(white_ref, raw)
     if dark_ref is None:
-        dark_ref = np.zeros(raw.shape)
-    numerator = raw - dark_ref
-    denominator = white_ref - dark_ref
-    # Check for zero denominator
-    denominator[denominator == 0.0] = zero_denominator_replace
-    reflectance = np.divide(numerator, denominator)
+        dark_ref = np.zeros(white_ref.shape)
+    else:
+        dark_ref = broadcast_reference(dark_ref, raw)
+    denominator = get_denominator(white_ref, dark_ref, zero_denominator_replace)
+    if out is None:
+        out = np.empty(np.broadcast_shapes(raw.shape, denominator.shape), dtype=dtype)
+    reflectance = np.subtract(raw, dark_ref, out=out)
+    np.divide(reflectance, denominator, out=reflectance)
     return reflectance
 
 
+def broadcast_reference(reference: np.array, raw: np.array):
+    """
+    insert the lines dimension in a reference averaged over the lines
+
+    reference: numpy array, reference of shape (samples, bands) or already broadcastable to raw.
+    raw: numpy array, raw measurements of shape (samples, lines, bands).
+
+    reference: numpy array broadcastable to raw.
+    """
+    if reference.ndim == raw.ndim - 1:
+        return np.expand_dims(reference, 1)
+    return reference
+
+
+def get_denominator(
+    white_ref: np.array, dark_ref: np.array, zero_denominator_replace: float = 1e-9
+):
+    """
+    calculates the reflectance denominator on the (small) reference arrays
+
+    white_ref: numpy array, white_ref measurements.
+    dark_ref: numpy array, dark_ref measurements.
+    zero_denominator_replace: float, replace zero at the denominator. Default: 1e-9.
+
+    denominator: numpy array without zero.
+    """
+    denominator = np.subtract(white_ref, dark_ref, dtype=np.float64)
+    denominator[denominator == 0.0] = zero_denominator_replace
+    return denominator
+
+
 def add_prefix_filename(path_file: str, prefix: str):
     """
     adds a prefix to the file name and keep the same path
@@ -136,36 +471,84 @@ def expand_average(raw: np.array, expand_size: int, average_dim: int = 1):
     expand_size: int, size of expand
     average_dim: int, dimension to calculate the average on.
 
-    raw_expand: numpy array.
+    raw_expand: read-only numpy array, broadcast view of the average without copy.
     """
-    raw_average = np.mean(raw, average_dim)
-    raw_expand = np.tile(np.expand_dims(raw_average, 2), (1, 1, expand_size))
-    raw_expand = np.transpose(raw_expand, (0, 2, 1))
+    raw_average = reference_average(raw, average_dim)
+    raw_expand = np.broadcast_to(
+        np.expand_dims(raw_average, 1),
+        (raw_average.shape[0], expand_size, raw_average.shape[1]),
+    )
     return raw_expand
 
 
-def read_hyspex(file_name: str, end_white_index: int, start_white_index: int = 0):
+def read_hyspex(
+    file_name: str,
+    end_white_index: int,
+    start_white_index: int = 0,
+    lazy: bool = False,
+    out: Optional[np.array] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: np.dtype = DEFAULT_DTYPE,
+    samples: Optional[Range] = None,
+    lines: Optional[Range] = None,
+    bands: Optional[BandSelection] = None,
+    cache: Optional[ReflectanceCache] = None,
+):
     """
     reads hyperspectral specim file
 
     file_name: str, path to the .raw file.
     end_white_index: int, end index for white measurement.
     start_white_index: int, first index for white reference measurement. Default: 0.
-
-    reflectance: numpy array containing reflectance data.
+    lazy: bool, kept for compatibility, the raw measurement is always memory-mapped and calibrated chunk by chunk. Default: False.
+    out: numpy array, array of shape (samples, lines, bands) to write the reflectance in (e.g. a np.memmap). If None, an array of dtype is allocated.
+    chunk_size: int, number of lines calibrated at once. Default: DEFAULT_CHUNK_SIZE.
+    dtype: numpy dtype, data type of the reflectance when out is None. Default: DEFAULT_DTYPE (float32).
+    samples: tuple, (first, last) range of samples to read and calibrate. If None, all the samples. Default: None.
+    lines: tuple, (first, last) range of lines to read and calibrate. If None, all the lines. Default: None.
+    bands: tuple, (first, last) range of bands, or list/array of band indexes or boolean mask. If None, all the bands. Default: None.
+    cache: ReflectanceCache, if given and out is None, the reflectance is read from or written to the cache. Default: None.
+
+    reflectance: numpy array containing reflectance data, read-only memory-mapped when cached.
     wavelengths: numpy array containing wavelength values.
     """
+    # Get the wavelength values
+    wavelengths = get_wavelength(file_name)[band_index(bands)]
+    if cache is not None and out is None:
+        key = cache.key(
+            (file_name,),
+            **calibration_parameters(
+                "hyspex",
+                dtype,
+                samples,
+                lines,
+                bands,
+                white_lines=(start_white_index, end_white_index),
+            ),
+        )
+        reflectance = cache.load(key)
+        if reflectance is not None:
+            return reflectance, wavelengths
+
     # Get raw measurement
-    raw = read_raw(file_name)
-    white_ref = raw[:, start_white_index:end_white_index, :]
-    # Get the number of "samples" of the images
-    nbr_samples = raw.shape[1]
-    # Calculate reference average expanded
-    white_average_expanded = expand_average(white_ref, nbr_samples)
+    mapped = read_raw(file_name, lazy=True, samples=samples)
+    # Band indexes are applied after the lines selections, so only the selected lines are copied
+    white_ref = select_window(mapped, lines=(start_white_index, end_white_index), bands=bands)
+    raw = select_window(mapped, lines=lines, bands=bands)
+    # Calculate reference average over the lines
+    white_average = reference_average(white_ref)
     # Calculate reflectance
-    reflectance = get_reflectance(raw, white_average_expanded)
-    # Get the wavelength values
-    wavelengths = get_wavelength(file_name)
+    if cache is not None and out is None:
+        reflectance = cache.compute(
+            key,
+            raw.shape,
+            dtype,
+            lambda cube: stream_reflectance(raw, white_average, out=cube, chunk_size=chunk_size),
+        )
+        return reflectance, wavelengths
+    reflectance = stream_reflectance(
+        raw, white_average, out=out, chunk_size=chunk_size, dtype=dtype
+    )
     return reflectance, wavelengths
 
 
@@ -178,7 +561,7 @@ def get_wavelength(file_name: str):
     wavelengths: numpy array containing wavelength values.
     """
     hdr_file_name = find_hdr_file(file_name)
-    hdr_file = read_hdr_file(hdr_file_name)
-    wavelength = np.asarray(eval(hdr_file["wavelength"]))
+    header = read_envi_header(hdr_file_name)
+    wavelength = np.array(header.wavelength)
     return wavelength
 
@@ -3,7 +3,7 @@ import numpy as np
 from sklearn.cluster import KMeans
 from typing import Tuple, Union, Optional
 
-from hyperpy.spectral import Spectral, as_cube, SpectralCube, SpectralMat
+from hyperpy.spectral import Spectral, as_cube, SpectralCube, SpectralMat, MaskedSpectralCube
 from hyperpy.utils import DataSampler
 from hyperpy.utils.visualization import get_custom_cmap
 
@@ -27,10 +27,10 @@ def kmeans(spectral: Spectral, sub_sampling_size: Union[float, int, None] = None
     else:
         k_means_predictions = k_means.fit_predict(data)
 
-    if isinstance(spectral, SpectralCube):
+    if isinstance(spectral, (SpectralCube, MaskedSpectralCube)):
         k_means_classes = as_cube(k_means_predictions, spectral, np.array(['k_means_class']))
     else:
-        k_means_classes = SpectralMat(data=k_means_predictions, domain=np.array(['k_means_class']))
+        k_means_classes = SpectralMat(data=k_means_predictions[:, np.newaxis], domain=np.array(['k_means_class']))
 
     return k_means, k_means_classes
 
@@ -48,6 +48,9 @@ def kmeans_cube_plot(kmeans: KMeans, kmeans_classes: SpectralCube, colormap_name
     barycenter_domain = barycenter_domain or np.arange(kmeans.cluster_centers_.shape[1])
     unique_classes = np.unique(kmeans_classes.data)
     nbr_unique_classes = len(unique_classes)
+    if isinstance(kmeans_classes, MaskedSpectralCube):
+        # Pixels outside the mask are not drawn
+        kmeans_classes = kmeans_classes.to_cube()
     color_map, cmap, norm = get_custom_cmap(colormap_name, nbr_unique_classes)
 
     fig = plt.figure(figsize=(15, 10))
@@ -6,7 +6,9 @@ from .transformers import (
     SavitzkyGolay,
     MultiplicativeScatterCorrection,
     Normalization,
-    DomainSelection
+    DomainSelection,
+    Resampling
 )
 
-from .utils import spectral_process
+from .utils import spectral_process, resample
+from .fusion import FusedRowWise, compile_transformers, allocation_report
@@ -0,0 +1,146 @@
+import tracemalloc
+from typing import List, Tuple
+
+import numpy as np
+from sklearn.base import TransformerMixin
+from sklearn.pipeline import make_pipeline
+
+from hyperpy.preprocessing.transformers import (
+    MeanCentering,
+    StandardNormalVariate,
+    Normalization,
+)
+from hyperpy.preprocessing.utils import resize_x, get_float_dtype
+
+FUSABLE_TRANSFORMERS = (MeanCentering, StandardNormalVariate, Normalization)
+FUSABLE_NORMS = ("l1", "l2", "inf")
+
+
+class FusedRowWise(TransformerMixin):
+    """
+    Apply a sequence of MeanCentering, StandardNormalVariate and Normalization in a single output buffer.
+    Each row is transformed as Y = (X - shift) * scale where shift and scale are derived once from the row statistics.
+    Warning: the l1 and inf norms need one more pass on the rows.
+    """
+
+    def __init__(self, transformers: Tuple[TransformerMixin], dtype=None):
+        for transformer in transformers:
+            if not isinstance(transformer, FUSABLE_TRANSFORMERS):
+                raise ValueError(
+                    f"{transformer} cannot be fused. Should be among {FUSABLE_TRANSFORMERS}"
+                )
+        # Norms lower-cased once, as accepted by Normalization
+        self.norms = tuple(
+            transformer.norm.lower() if isinstance(transformer, Normalization) else None
+            for transformer in transformers
+        )
+        for norm in self.norms:
+            if norm is not None and norm not in FUSABLE_NORMS:
+                raise ValueError(f"{norm} is an invalid value for norm. Should be among {list(FUSABLE_NORMS)}")
+        self.name = "Fused row wise transformation"
+        self.short_name = " > ".join(transformer.short_name for transformer in transformers)
+        self.transformers = transformers
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X: np.array) -> np.array:
+        """
+        Apply the fused transformers row wise.
+        :param X: numpy array.
+        :return: numpy array.
+        """
+        X_val = resize_x(X)
+        X_out = np.empty(X_val.shape, dtype=get_float_dtype(X, self.dtype))
+        nbr_columns = X_val.shape[1]
+        # Row statistics of the input, computed once in float64
+        x_mean = np.mean(X_val, axis=1, dtype=np.float64)
+        # Variance from the centered rows written in the output buffer, accurate for large offsets
+        np.subtract(X_val, x_mean[:, np.newaxis].astype(X_out.dtype), out=X_out)
+        x_var = np.einsum("ij,ij->i", X_out, X_out, dtype=np.float64) / nbr_columns
+        # Current row transformation Y = (X - shift) * scale
+        shift = np.zeros(X_val.shape[0])
+        scale = np.ones(X_val.shape[0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for transformer, norm in zip(self.transformers, self.norms):
+                if isinstance(transformer, MeanCentering):
+                    shift = x_mean
+                elif isinstance(transformer, StandardNormalVariate):
+                    shift = x_mean
+                    scale = np.sign(scale) / np.sqrt(x_var)
+                elif norm == "l2":
+                    y_mean = (x_mean - shift) * scale
+                    y_var = x_var * scale ** 2
+                    scale = scale / np.sqrt(nbr_columns * (y_var + y_mean ** 2))
+                else:
+                    # Use the output as scratch buffer to get the norm
+                    self._apply(X_val, shift, scale, X_out)
+                    np.abs(X_out, out=X_out)
+                    if norm == "l1":
+                        row_norm = np.sum(X_out, axis=1, dtype=np.float64)
+                    else:
+                        row_norm = np.max(X_out, axis=1).astype(np.float64)
+                    scale = scale / row_norm
+            self._apply(X_val, shift, scale, X_out)
+        return X_out
+
+    @staticmethod
+    def _apply(X: np.array, shift: np.array, scale: np.array, out: np.array):
+        """
+        Write (X - shift) * scale row wise in out.
+        """
+        np.subtract(X, shift[:, np.newaxis].astype(out.dtype), out=out)
+        np.multiply(out, scale[:, np.newaxis].astype(out.dtype), out=out)
+
+
+def compile_transformers(transformers: Tuple[TransformerMixin]) -> List[TransformerMixin]:
+    """
+    Replace the sequences of fusable row wise transformers by FusedRowWise transformers.
+    :param transformers: sequence of transformers.
+    :return: list of transformers with the same result.
+    """
+    compiled = []
+    sequence = []
+    for transformer in list(transformers) + [None]:
+        if (
+            isinstance(transformer, FUSABLE_TRANSFORMERS)
+            and (not sequence or transformer.dtype == sequence[0].dtype)
+        ):
+            sequence.append(transformer)
+            continue
+        if sequence:
+            compiled.append(FusedRowWise(tuple(sequence), dtype=sequence[0].dtype))
+        sequence = []
+        if isinstance(transformer, FUSABLE_TRANSFORMERS):
+            sequence.append(transformer)
+        elif transformer is not None:
+            compiled.append(transformer)
+    return compiled
+
+
+def allocation_report(transformers: Tuple[TransformerMixin], X: np.array) -> dict:
+    """
+    Measure the peak of memory allocated by the transformers with and without fusion.
+    Warning: a tracemalloc session already running is kept. Before Python 3.9 its peak cannot be reset,
+    so the peaks then include the memory allocated before the call.
+    :param transformers: sequence of transformers.
+    :param X: numpy array to transform.
+    :return: dict with the "naive" and "fused" peaks in bytes.
+    """
+    report = {}
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for name, steps in [("naive", transformers), ("fused", compile_transformers(transformers))]:
+            pipeline = make_pipeline(*steps)
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            pipeline.transform(X)
+            report[name] = tracemalloc.get_traced_memory()[1] - current
+    finally:
+        if started:
+            tracemalloc.stop()
+    return report
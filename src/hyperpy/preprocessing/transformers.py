@@ -1,9 +1,11 @@
 from copy import deepcopy
 
 import numpy as np
+from scipy.ndimage import convolve1d
 from sklearn.base import TransformerMixin
 
-from hyperpy.preprocessing.utils import savitzky_golay, resize_x
+from hyperpy.preprocessing.utils import savitzky_golay, resize_x, get_float_dtype, get_resampling_matrix
+from hyperpy.spectral import SpectralCube
 
 """
 Future implementation:
@@ -29,15 +31,83 @@ class DomainSelection(TransformerMixin):
     def transform(self, X: np.array) -> np.array:
         return X[:, self.selection]
 
+    def window(self) -> dict:
+        """
+        Get the selection as bands to read from the file: SpectralCube.from_specim(path, **selection.window())
+        Only the selected bands are then read instead of the whole file.
+        :return: dict with the bands selection.
+        """
+        return {"bands": np.asarray(self.selection)}
+
+    def apply_spectral(self, spectral: SpectralCube) -> SpectralCube:
+        """
+        Select the bands of a SpectralCube without reshaping it in matrix.
+        For a memory-mapped SpectralCube (lazy loading), only the selected bands are read.
+        :param spectral: instance of SpectralCube
+        :return: SpectralCube
+        """
+        return SpectralCube(data=spectral.data[:, :, self.selection], domain=self.transformed_domain)
+
+class Resampling(TransformerMixin):
+    """
+    Resample the rows on a target wavelength grid with a sparse matrix product: Y = X @ W.
+    The weights W are precomputed for linear, cubic (Lagrange) or gaussian spectral response resampling,
+    and cached per (source grid, target grid).
+    """
+
+    def __init__(self, source_domain: np.array, target_domain: np.array, method: str = "linear",
+                 fwhm=None, fill_value: float = np.nan, dtype=None):
+        """
+        :param source_domain: increasing wavelengths of the rows.
+        :param target_domain: wavelengths of the resampled rows.
+        :param method: "linear", "cubic" or "gaussian".
+        :param fwhm: full width at half maximum of the gaussian responses, scalar or one per target band.
+            If None, the spacing of the target grid.
+        :param fill_value: value of the target bands outside the source domain.
+        :param dtype: output data type. If None, the floating data type of X is kept.
+        """
+        self.name = "Spectral resampling"
+        self.short_name = "Resampling"
+        self.method = method
+        self.fwhm = fwhm
+        self.fill_value = fill_value
+        self.dtype = dtype
+        self.original_domain = np.asarray(source_domain)
+        self.transformed_domain = np.asarray(target_domain)
+        self.weights, self.outside = get_resampling_matrix(
+            self.original_domain, self.transformed_domain, method, fwhm
+        )
+        # Weights converted to the data type of the rows, once per data type
+        self._typed_weights = {self.weights.dtype: self.weights}
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X: np.array) -> np.array:
+        X = resize_x(X)
+        if X.shape[1] != self.weights.shape[0]:
+            raise ValueError(f"X has {X.shape[1]} bands but the source domain has {self.weights.shape[0]}")
+        dtype = get_float_dtype(X, self.dtype)
+        weights = self._typed_weights.get(dtype)
+        if weights is None:
+            weights = self._typed_weights.setdefault(dtype, self.weights.astype(dtype))
+        X_resampled = np.asarray(X.astype(dtype, copy=False) @ weights)
+        X_resampled = X_resampled.astype(dtype, copy=False)
+        if np.any(self.outside):
+            X_resampled[:, self.outside] = self.fill_value
+        return X_resampled
+
+
 class Log(TransformerMixin):
     """
     Log transformation of the data.
     Y = -log(X)
     """
 
-    def __init__(self):
+    def __init__(self, dtype=None):
         self.name = "Logarithmic transformation"
         self.short_name = "Log"
+        self.dtype = dtype
 
     def fit(self, X: np.array, y=None):
         return self
@@ -48,7 +118,7 @@ class Log(TransformerMixin):
         :param X: numpy array.
         :return: numpy array.
         """
-        X_log = -np.log10(X)
+        X_log = -np.log10(X, dtype=get_float_dtype(X, self.dtype))
         return X_log
 
 
@@ -59,9 +129,12 @@ class Positive(TransformerMixin):
     Y = X else
     """
 
-    def __init__(self):
+    def __init__(self, dtype=None):
         self.name = "Positive transformation"
         self.short_name = "Pos"
+        self.dtype = dtype
+        # The minimum is taken over all the rows, the result depends on the rows transformed together
+        self.row_wise = False
 
     def fit(self, X: np.array, y=None):
         return self
@@ -72,6 +145,7 @@ class Positive(TransformerMixin):
         :param X: numpy array.
         :return: numpy array.
         """
+        X = np.asarray(X, dtype=get_float_dtype(X, self.dtype))
         if np.min(X) < 0:
             X_pos = X - np.min(X)
         else:
@@ -86,9 +160,10 @@ class StandardNormalVariate(TransformerMixin):
     Warning: the mean and std are computed row wise.
     """
 
-    def __init__(self):
+    def __init__(self, dtype=None):
         self.name = "Standard Normal Variate"
         self.short_name = "SNV"
+        self.dtype = dtype
 
     def fit(self, X: np.array, y=None):
         return self
@@ -100,7 +175,7 @@ class StandardNormalVariate(TransformerMixin):
         :return: numpy array.
         """
         X_val = deepcopy(X)
-        X_val = resize_x(X_val)
+        X_val = resize_x(X_val).astype(get_float_dtype(X, self.dtype), copy=False)
         mean = np.tile(np.mean(X_val, axis=1), (X_val.shape[1], 1)).T
         std = np.tile(np.std(X_val, axis=1), (X_val.shape[1], 1)).T
         X_snv = (X_val - mean) / std
@@ -114,9 +189,10 @@ class MeanCentering(TransformerMixin):
     Warning: the mean is computed row wise.
     """
 
-    def __init__(self):
+    def __init__(self, dtype=None):
         self.name = "Mean centering"
         self.short_name = "MR"
+        self.dtype = dtype
 
     def fit(self, X: np.array, y=None) -> np.array:
         return self
@@ -128,7 +204,7 @@ class MeanCentering(TransformerMixin):
         :return: numpy array.
         """
         X_val = deepcopy(X)
-        X_val = resize_x(X_val)
+        X_val = resize_x(X_val).astype(get_float_dtype(X, self.dtype), copy=False)
         mean = np.tile(np.mean(X_val, axis=1), (X_val.shape[1], 1)).T
         X_mean_centering = X_val - mean
         return X_mean_centering
@@ -139,12 +215,13 @@ class SavitzkyGolay(TransformerMixin):
     Use a Savitzky Golay filter row wise to derivate and/or smooth the signal in row.
     """
 
-    def __init__(self, window_size=7, polynomial_order=2, derivation_order=1):
+    def __init__(self, window_size=7, polynomial_order=2, derivation_order=1, dtype=None):
         self.name = "Savitzky Golay filter"
         self.short_name = "SG"
         self.window_size = window_size
         self.polynomial_order = polynomial_order
         self.derivation_order = derivation_order
+        self.dtype = dtype
 
     def fit(self, X, y=None):
         return self
@@ -153,8 +230,10 @@ class SavitzkyGolay(TransformerMixin):
         filter_, X_extended = savitzky_golay(
             X, self.window_size, self.polynomial_order, self.derivation_order
         )
-        X_sg = np.apply_along_axis(np.convolve, 1, X_extended, filter_, mode="valid")
-        return X_sg
+        # Convolve all the rows at once and keep the valid part
+        half_window = (len(filter_) - 1) // 2
+        X_sg = convolve1d(X_extended, filter_, axis=1, output=get_float_dtype(X, self.dtype), mode="nearest")
+        return X_sg[:, half_window: X_sg.shape[1] - half_window]
 
 
 class MultiplicativeScatterCorrection(TransformerMixin):
@@ -162,11 +241,18 @@ class MultiplicativeScatterCorrection(TransformerMixin):
     Perform a linear regression between the row of X and a reference spectrum (X_m) and correct the row using the regression coefficients.
     X_i = a_i + b_i X_m
     X_i^msc = (X_i - a_i)/b_i
+    The regression coefficients of all the rows are computed at once in closed form.
     """
 
-    def __init__(self):
+    def __init__(self, chunk_size=None, dtype=None):
+        """
+        :param chunk_size: number of rows corrected at once to bound the memory use. If None, all the rows at once.
+        :param dtype: output data type. If None, the floating data type of X is kept.
+        """
         self.name = "Multiplicative Scatter Correction"
         self.short_name = "MSC"
+        self.chunk_size = chunk_size
+        self.dtype = dtype
 
     def fit(self, X, y=None):
         """
@@ -190,10 +276,19 @@ class MultiplicativeScatterCorrection(TransformerMixin):
 
     def transform(self, X):
         X = resize_x(X)
-        X_msc = np.zeros_like(X)
-        for i in range(X.shape[0]):
-            fit = np.polyfit(self.reference, X[i, :], 1, full=True)
-            X_msc[i, :] = np.divide((X[i, :] - fit[0][1]), fit[0][0])
+        X_msc = np.empty(X.shape, dtype=get_float_dtype(X, self.dtype))
+        # Least squares X_i = a_i + b_i X_m in closed form
+        reference = np.ravel(self.reference).astype(np.float64)
+        reference_mean = np.mean(reference)
+        reference_centered = reference - reference_mean
+        reference_sum_squares = np.dot(reference_centered, reference_centered)
+        chunk_size = self.chunk_size or X.shape[0]
+        for start in range(0, X.shape[0], chunk_size):
+            rows = slice(start, start + chunk_size)
+            slope = np.dot(X[rows], reference_centered) / reference_sum_squares
+            intercept = np.mean(X[rows], axis=1, dtype=np.float64) - slope * reference_mean
+            np.subtract(X[rows], intercept[:, np.newaxis].astype(X_msc.dtype), out=X_msc[rows])
+            np.divide(X_msc[rows], slope[:, np.newaxis].astype(X_msc.dtype), out=X_msc[rows])
         return X_msc
 
 
@@ -202,7 +297,7 @@ class Normalization(TransformerMixin):
     Normalize each row with 1-norm, 2-norm or inf-norm
     """
 
-    def __init__(self, norm: str = "l1"):
+    def __init__(self, norm: str = "l1", dtype=None):
         NORMALIZATION_NORM = ["l1", "l2", "inf"]
         self.name = "Normalization"
         self.short_name = "Norm"
@@ -210,13 +305,14 @@ class Normalization(TransformerMixin):
             raise ValueError(
                 f"{norm} is an invalid value for norm. Should be among {NORMALIZATION_NORM}"
             )
-        self.norm = norm
+        self.norm = norm.lower()
+        self.dtype = dtype
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X):
-        X_val = resize_x(X)
+        X_val = resize_x(X).astype(get_float_dtype(X, self.dtype), copy=False)
         if self.norm == "l1":
             norm_matrix = np.tile(
                 np.linalg.norm(X_val, ord=1, axis=1, keepdims=True), (1, X_val.shape[1])
@@ -1,31 +1,183 @@
-from typing import Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple, Union
 
 import numpy as np
+from scipy import sparse
 from sklearn.base import TransformerMixin
 
 from hyperpy import exceptions
-from hyperpy.spectral import SpectralCube, as_cube
+from hyperpy.spectral import SpectralCube, MaskedSpectralCube, as_cube
 
 from sklearn.pipeline import make_pipeline
 
+RESAMPLING_METHODS = ("linear", "cubic", "gaussian")
+# Ratio between the full width at half maximum and the standard deviation of a gaussian
+FWHM_TO_SIGMA = 1 / (2 * np.sqrt(2 * np.log(2)))
+# The gaussian responses are truncated at GAUSSIAN_TRUNCATE standard deviations
+GAUSSIAN_TRUNCATE = 3
 
-def spectral_process(spectral_cube: SpectralCube,
-                     transformers: Tuple[TransformerMixin]) -> SpectralCube:
+
+def spectral_process(spectral_cube: Union[SpectralCube, MaskedSpectralCube],
+                     transformers: Tuple[TransformerMixin],
+                     tile_shape: Optional[Tuple[int, int]] = None,
+                     out: Optional[np.array] = None,
+                     n_jobs: int = 1,
+                     fuse: bool = False) -> SpectralCube:
     """
     Apply transformers to a spectral spectral and return a new spectral spectral.
     :param spectral_cube:
     :param transformers:
-    :return:
+    :param tile_shape: (x, y) size of the spatial tiles transformed at once to bound the memory use.
+        If None, all the pixels are transformed at once. Transformers must be row wise (fit beforehand if needed),
+        a ValueError is raised otherwise (e.g. Positive, whose minimum would be taken tile by tile).
+    :param out: numpy array of shape (x, y, transformed domain) to write the result in (e.g. a np.memmap).
+        If None, an array is allocated.
+    :param n_jobs: number of threads transforming the tiles concurrently, -1 to use all the cpus.
+        If no tile_shape is given, the pixels are split in n_jobs blocks. The output is identical to the serial one,
+        transformers that are not row wise raise a ValueError as for tile_shape.
+    :param fuse: fuse the sequences of row wise transformers (see compile_transformers) to transform in a single pass.
+    :return: SpectralCube, or MaskedSpectralCube for a MaskedSpectralCube whose valid pixels only are transformed.
     """
-    spectral_matrix = spectral_cube.get_matrix()
+    if fuse:
+        from hyperpy.preprocessing.fusion import compile_transformers
+        transformers = compile_transformers(transformers)
     pipeline = make_pipeline(*transformers)
-    transformed_matrix = pipeline.transform(spectral_matrix)
-    new_domain = spectral_cube.domain
+    new_domain = get_transformed_domain(spectral_cube.domain, transformers)
+    if n_jobs != -1 and n_jobs < 1:
+        raise ValueError(f"n_jobs should be positive or -1, got {n_jobs}")
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if tile_shape is not None or n_jobs > 1:
+        check_row_wise(transformers)
+    if isinstance(spectral_cube, MaskedSpectralCube):
+        block_size = None if tile_shape is None else tile_shape[0] * tile_shape[1]
+        transformed_matrix = process_rows(spectral_cube.data, pipeline, new_domain, block_size, out, n_jobs)
+        return MaskedSpectralCube(transformed_matrix, domain=new_domain, mask=spectral_cube.mask)
+    if tile_shape is None and out is None and n_jobs == 1:
+        spectral_matrix = spectral_cube.get_matrix()
+        transformed_matrix = pipeline.transform(spectral_matrix)
+        transformed_cube = transformed_matrix.reshape((spectral_cube.shape[:2]+(new_domain.shape[0],)))
+        return SpectralCube(transformed_cube, domain=new_domain)
+
+    if tile_shape is None:
+        tile_shape = (max(int(np.ceil(spectral_cube.shape[0] / n_jobs)), 1), max(spectral_cube.shape[1], 1))
+
+    def transform_tile(tile: Tuple[slice, slice]) -> np.array:
+        tile_data = spectral_cube.data[tile]
+        tile_matrix = np.reshape(tile_data, (-1, tile_data.shape[2]))
+        transformed_matrix = pipeline.transform(tile_matrix)
+        return transformed_matrix.reshape(tile_data.shape[:2] + new_domain.shape)
+
+    def write_tile(tile: Tuple[slice, slice]):
+        out[tile] = transform_tile(tile)
+
+    tiles = iter_tiles(spectral_cube.shape[:2], tile_shape)
+    # The first tile gives the output data type, an empty tile for an empty cube
+    first_tile = next(tiles, (slice(0, 0), slice(0, 0)))
+    transformed_tile = transform_tile(first_tile)
+    if out is None:
+        out = np.empty(spectral_cube.shape[:2] + new_domain.shape, dtype=transformed_tile.dtype)
+    out[first_tile] = transformed_tile
+    del transformed_tile
+    if n_jobs == 1:
+        for tile in tiles:
+            write_tile(tile)
+    else:
+        # Numpy releases the GIL during the computation, each thread writes its own tile
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for _ in executor.map(write_tile, tiles):
+                pass
+    return SpectralCube(out, domain=new_domain)
+
+
+def process_rows(matrix: np.array,
+                 pipeline,
+                 new_domain: np.array,
+                 block_size: Optional[int] = None,
+                 out: Optional[np.array] = None,
+                 n_jobs: int = 1) -> np.array:
+    """
+    Transform a matrix by blocks of rows.
+    :param matrix: (n, domain) numpy array.
+    :param pipeline: fitted row wise pipeline.
+    :param new_domain: domain after the pipeline.
+    :param block_size: number of rows transformed at once. If None, the rows are split in n_jobs blocks.
+    :param out: numpy array of shape (n, transformed domain) to write the result in. If None, an array is allocated.
+    :param n_jobs: number of threads transforming the blocks concurrently.
+    :return: (n, transformed domain) numpy array.
+    """
+    if block_size is None and out is None and n_jobs == 1:
+        return pipeline.transform(matrix).reshape((matrix.shape[0],) + new_domain.shape)
+    if block_size is None:
+        block_size = int(np.ceil(matrix.shape[0] / n_jobs))
+    blocks = (slice(start, start + block_size) for start in range(0, matrix.shape[0], max(block_size, 1)))
+
+    def transform_block(rows: slice) -> np.array:
+        transformed = pipeline.transform(matrix[rows])
+        return transformed.reshape((-1,) + new_domain.shape)
+
+    def write_block(rows: slice):
+        out[rows] = transform_block(rows)
+
+    # The first block gives the output data type
+    first_block = next(blocks, slice(0, 0))
+    transformed_block = transform_block(first_block)
+    if out is None:
+        out = np.empty((matrix.shape[0],) + new_domain.shape, dtype=transformed_block.dtype)
+    out[first_block] = transformed_block
+    del transformed_block
+    if n_jobs == 1:
+        for rows in blocks:
+            write_block(rows)
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for _ in executor.map(write_block, blocks):
+                pass
+    return out
+
+
+def check_row_wise(transformers: Tuple[TransformerMixin]):
+    """
+    Check that the transformers are row wise, so that transforming the rows by blocks gives the same result.
+    :param transformers:
+    :return:
+    """
+    not_row_wise = [
+        transformer.name for transformer in transformers if not getattr(transformer, 'row_wise', True)
+    ]
+    if not_row_wise:
+        raise ValueError(
+            f"{not_row_wise} are not row wise and cannot be applied by blocks of pixels, "
+            f"transform the whole cube at once"
+        )
+
+
+def get_transformed_domain(domain: np.array, transformers: Tuple[TransformerMixin]) -> np.array:
+    """
+    Get the domain after the transformers.
+    :param domain: original domain.
+    :param transformers:
+    :return: domain of the last transformer changing it, the original domain otherwise.
+    """
+    new_domain = domain
     for transformer in transformers:
         if hasattr(transformer, 'transformed_domain'):
             new_domain = transformer.transformed_domain
-    transformed_cube = transformed_matrix.reshape((spectral_cube.shape[:2]+(new_domain.shape[0],)))
-    return SpectralCube(transformed_cube, domain=new_domain)
+    return new_domain
+
+
+def iter_tiles(shape: Tuple[int, int], tile_shape: Tuple[int, int]) -> Iterator[Tuple[slice, slice]]:
+    """
+    Iterate over the spatial tiles of a cube.
+    :param shape: (x, y) spatial shape of the cube.
+    :param tile_shape: (x, y) maximal shape of a tile.
+    :return: iterator of (x, y) slices.
+    """
+    for x_start in range(0, shape[0], tile_shape[0]):
+        for y_start in range(0, shape[1], tile_shape[1]):
+            yield (slice(x_start, min(x_start + tile_shape[0], shape[0])),
+                   slice(y_start, min(y_start + tile_shape[1], shape[1])))
 
 
 def savitzky_golay(
@@ -39,30 +191,176 @@ def savitzky_golay(
     :param derivation_order: order of the derivation.
     :return: filter, data_extended
     """
-    order_range = range(polynomial_order + 1)
     half_window = (window_size - 1) // 2
-
-    # Precompute coefficients
-    b = np.mat(
-        [[k ** i for i in order_range] for k in range(-half_window, half_window + 1)]
-    )
-    filter_values = np.linalg.pinv(b).A[derivation_order]
+    filter_values = savitzky_golay_coefficients(window_size, polynomial_order, derivation_order)
 
     # pad the signal at the extremes with
     # values taken from the signal itself
     # firstvals = y[0] - np.abs(y[1:half_window + 1][::-1] - y[0])
-    firstvals = np.tile(data[:, 0], (half_window, 1)).T - np.abs(
-        data[:, 1: half_window + 1][:, ::-1] - np.tile(data[:, 0], (half_window, 1)).T
-    )
+    first = data[:, :1]
+    firstvals = first - np.abs(data[:, half_window:0:-1] - first)
     # lastvals = y[-1] + np.abs(y[-half_window - 1:-1][::-1] - y[-1])
-    lastvals = np.tile(data[:, -1], (half_window, 1)).T + np.abs(
-        data[:, -half_window - 1: -1][:, ::-1]
-        - np.tile(data[:, -1], (half_window, 1)).T
-    )
+    last = data[:, -1:]
+    lastvals = last + np.abs(data[:, -2:-half_window - 2:-1] - last)
     data_extended = np.concatenate((firstvals, data, lastvals), axis=1)
     return filter_values, data_extended
 
 
+@lru_cache(maxsize=None)
+def savitzky_golay_coefficients(window_size: int, polynomial_order: int, derivation_order: int = 0) -> np.array:
+    """
+    Compute the Savitzky Golay filter coefficients, cached per (window_size, polynomial_order, derivation_order).
+    :param window_size: size of the filter's window.
+    :param polynomial_order: order of the polynomial's filter.
+    :param derivation_order: order of the derivation.
+    :return: read-only numpy array with the filter.
+    """
+    half_window = (window_size - 1) // 2
+    b = np.vander(np.arange(-half_window, half_window + 1), polynomial_order + 1, increasing=True)
+    filter_values = np.linalg.pinv(b)[derivation_order]
+    filter_values.flags.writeable = False
+    return filter_values
+
+
+def resample(spectral_cube: Union[SpectralCube, MaskedSpectralCube],
+             target_domain: np.array,
+             method: str = "linear",
+             fwhm=None,
+             fill_value: float = np.nan,
+             dtype=None,
+             tile_shape: Optional[Tuple[int, int]] = None,
+             out: Optional[np.array] = None,
+             n_jobs: int = 1) -> SpectralCube:
+    """
+    Resample a cube on a target wavelength grid, e.g. to combine cubes of different cameras.
+    :param spectral_cube: instance of SpectralCube or MaskedSpectralCube with a numeric domain.
+    :param target_domain: wavelengths of the resampled cube.
+    :param method: "linear", "cubic" (Lagrange interpolation on 4 bands) or "gaussian" (gaussian spectral response).
+    :param fwhm: full width at half maximum of the gaussian responses, scalar or one per target band.
+        If None, the spacing of the target grid.
+    :param fill_value: value of the target bands outside the source domain.
+    :param dtype: output data type. If None, the floating data type of the cube is kept.
+    :param tile_shape: see spectral_process, to stream memory-mapped or stored cubes tile by tile.
+    :param out: see spectral_process.
+    :param n_jobs: see spectral_process.
+    :return: SpectralCube, or MaskedSpectralCube for a MaskedSpectralCube.
+    """
+    from hyperpy.preprocessing.transformers import Resampling
+
+    resampling = Resampling(spectral_cube.domain, target_domain, method=method, fwhm=fwhm,
+                            fill_value=fill_value, dtype=dtype)
+    return spectral_process(spectral_cube, [resampling], tile_shape=tile_shape, out=out, n_jobs=n_jobs)
+
+
+def get_resampling_matrix(source_domain: np.array,
+                          target_domain: np.array,
+                          method: str = "linear",
+                          fwhm=None) -> Tuple[sparse.csr_matrix, np.array]:
+    """
+    Get the sparse weights resampling the rows of a matrix from a source to a target wavelength grid:
+    X_resampled = X @ weights. The weights are cached per (source grid, target grid, method, fwhm).
+    :param source_domain: increasing wavelengths of the source.
+    :param target_domain: wavelengths of the target.
+    :param method: "linear", "cubic" or "gaussian".
+    :param fwhm: full width at half maximum of the gaussian responses, scalar or one per target band.
+        If None, the spacing of the target grid.
+    :return: read-only (source, target) sparse weights, and boolean mask of the target bands outside the source.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"{method} is an invalid method. Should be among {list(RESAMPLING_METHODS)}")
+    source_domain = np.asarray(source_domain)
+    target_domain = np.asarray(target_domain)
+    if not (np.issubdtype(source_domain.dtype, np.number) and np.issubdtype(target_domain.dtype, np.number)):
+        raise ValueError("The source and target domains must be numeric wavelengths")
+    if len(source_domain.shape) != 1 or len(target_domain.shape) != 1:
+        raise exceptions.DataDimensionError(max(len(source_domain.shape), len(target_domain.shape)), 1)
+    if fwhm is not None:
+        fwhm = tuple(np.broadcast_to(np.asarray(fwhm, dtype=np.float64), target_domain.shape).tolist())
+    return resampling_matrix(
+        tuple(source_domain.astype(np.float64).tolist()),
+        tuple(target_domain.astype(np.float64).tolist()),
+        method,
+        fwhm,
+    )
+
+
+@lru_cache(maxsize=32)
+def resampling_matrix(source_domain: Tuple[float, ...],
+                      target_domain: Tuple[float, ...],
+                      method: str = "linear",
+                      fwhm: Optional[Tuple[float, ...]] = None) -> Tuple[sparse.csr_matrix, np.array]:
+    """
+    Compute the sparse resampling weights, cached per (source_domain, target_domain, method, fwhm).
+    See get_resampling_matrix.
+    """
+    source = np.array(source_domain)
+    target = np.array(target_domain)
+    minimal_bands = 4 if method == "cubic" else 2
+    if source.shape[0] < minimal_bands:
+        raise ValueError(f"The {method} resampling needs at least {minimal_bands} source bands")
+    if np.any(np.diff(source) <= 0):
+        raise ValueError("The source domain must be strictly increasing")
+    outside = (target < source[0]) | (target > source[-1])
+    target_index = np.flatnonzero(~outside)
+    inside = target[target_index]
+
+    if method == "gaussian":
+        if fwhm is None:
+            if target.shape[0] < 2:
+                raise ValueError("The fwhm is needed to resample on a single band")
+            sigma = np.abs(np.gradient(target)) * FWHM_TO_SIGMA
+        else:
+            sigma = np.array(fwhm) * FWHM_TO_SIGMA
+        if np.any(sigma <= 0):
+            raise ValueError("The fwhm must be positive")
+        sigma = sigma[target_index]
+        # Bands within GAUSSIAN_TRUNCATE standard deviations, weighted by their width for uneven grids
+        first = np.searchsorted(source, inside - GAUSSIAN_TRUNCATE * sigma, side="left")
+        last = np.searchsorted(source, inside + GAUSSIAN_TRUNCATE * sigma, side="right")
+        # The nearest band at least, for responses narrower than the source spacing
+        nearest = np.clip(np.searchsorted(source, inside), 1, source.shape[0] - 1)
+        nearest -= (inside - source[nearest - 1]) < (source[nearest] - inside)
+        first = np.minimum(first, nearest)
+        last = np.maximum(last, nearest + 1)
+        counts = last - first
+        columns = np.repeat(np.arange(inside.shape[0]), counts)
+        rows = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        weights = np.exp(-0.5 * np.square((source[rows] - inside[columns]) / sigma[columns]))
+        weights *= np.gradient(source)[rows]
+        totals = np.bincount(columns, weights, minlength=inside.shape[0])
+        # Responses too narrow to reach any band take the nearest one
+        underflow = (totals == 0)[columns]
+        weights[underflow] = rows[underflow] == nearest[columns[underflow]]
+        totals[totals == 0] = 1
+        weights /= totals[columns]
+    else:
+        # Index of the source interval [source[i], source[i + 1]] containing the target
+        interval = np.clip(np.searchsorted(source, inside, side="right") - 1, 0, source.shape[0] - 2)
+        if method == "linear":
+            position = (inside - source[interval]) / (source[interval + 1] - source[interval])
+            rows = np.stack([interval, interval + 1], axis=1)
+            weights = np.stack([1 - position, position], axis=1)
+        else:
+            # Lagrange polynomial through the 4 nearest bands, shifted inside at the borders
+            start = np.clip(interval - 1, 0, source.shape[0] - 4)
+            rows = start[:, np.newaxis] + np.arange(4)
+            nodes = source[rows]
+            weights = np.ones(rows.shape)
+            for j in range(4):
+                for k in range(4):
+                    if j != k:
+                        weights[:, j] *= (inside - nodes[:, k]) / (nodes[:, j] - nodes[:, k])
+        columns = np.repeat(np.arange(inside.shape[0]), rows.shape[1])
+        rows, weights = rows.ravel(), weights.ravel()
+
+    matrix = sparse.csr_matrix(
+        (weights, (rows, target_index[columns])), shape=(source.shape[0], target.shape[0])
+    )
+    matrix.data.flags.writeable = False
+    outside.flags.writeable = False
+    return matrix, outside
+
+
 def resize_x(x: np.array) -> np.array:
     """
     Change the shape of X so that is has two dimensions.
@@ -76,6 +374,22 @@ def resize_x(x: np.array) -> np.array:
     else:
         raise exceptions.ArrayDimensionError(len(x.shape), (1, 2))
 
+def get_float_dtype(x: np.array, dtype=None) -> np.dtype:
+    """
+    Get the floating data type of a transformer output.
+    Transformers preserve the floating data type of their input so that float32 cubes stay float32.
+    :param x: numpy array given to the transformer.
+    :param dtype: requested data type (e.g. np.float64 for a higher precision). If None, the input one is used.
+    :return: numpy dtype, float64 for non floating input.
+    """
+    if dtype is not None:
+        return np.dtype(dtype)
+    x_dtype = np.asarray(x).dtype
+    if np.issubdtype(x_dtype, np.floating):
+        return x_dtype
+    return np.dtype(np.float64)
+
+
 def remove_error_specim_line(spectral: SpectralCube):
     """
     Remove error line for Specim images
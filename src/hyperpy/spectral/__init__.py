@@ -1,2 +1,6 @@
-from hyperpy.spectral.classes import SpectralCube, as_cube, Spectral, SpectralMat
+from hyperpy.spectral.classes import SpectralCube, as_cube, Spectral, SpectralMat, MaskedSpectralCube
 from hyperpy.spectral.cube_crop import RectangleMask, get_max_rectangle_mask
+from hyperpy.spectral.integral import IntegralCube, summed_area_table
+from hyperpy.spectral.lazy import LazySpectralCube
+from hyperpy.spectral.segmentation import segment, spectral_index, clean_mask, label_objects, nearest_band
+from hyperpy.spectral.objects import SpectralObjects, object_statistics, extract_objects
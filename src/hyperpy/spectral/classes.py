@@ -1,10 +1,14 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Tuple
 
 import numpy as np
 
 from hyperpy import exceptions
 from hyperpy import read_specim, read_hyspex, read_mat_file
+from hyperpy.loading.utils import DEFAULT_CHUNK_SIZE, DEFAULT_DTYPE, write_raw
+from hyperpy.loading.batch import DEFAULT_IO_JOBS, iter_load
+from hyperpy.loading.mat import MatDataset
+from hyperpy.loading.store import DEFAULT_COMPRESSION, write_cube_store, open_cube_store
 
 
 ## TODO:
@@ -18,6 +22,10 @@ class Spectral:
     def get_matrix(self):
         pass
 
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
 
 @dataclass
 class SpectralMat(Spectral):
@@ -40,6 +48,8 @@ class SpectralMat(Spectral):
 
 @dataclass
 class SpectralCube(Spectral):
+    metadata: Optional[dict] = field(default=None, compare=False)
+
     def __post_init__(self):
         """
         Make some check for the consistency of the data.
@@ -47,6 +57,9 @@ class SpectralCube(Spectral):
         self._check_data()
         self.width, self.height, data_domain = self.data.shape
         self.shape = self.data.shape
+        self._integral = None
+        # File opened for the cube (see SpectralCube.open and SpectralCube.from_mat_file), closed by close
+        self._file = None
 
     def _check_data(self, data: Optional[np.array] = None, domain: Optional[np.array] = None):
         data = self.data if data is None else self.data
@@ -79,43 +92,332 @@ class SpectralCube(Spectral):
         self.data = data
         self.width, self.height, data_domain = self.data.shape
         self.shape = self.data.shape
+        self._integral = None
+
+    def astype(self, dtype: np.dtype) -> "SpectralCube":
+        """
+        Get a new SpectralCube with the data converted to dtype, e.g. np.float64 for a higher precision.
+        :param dtype: numpy data type.
+        :return: SpectralCube
+        """
+        return SpectralCube(data=self.data.astype(dtype), domain=self.domain, metadata=self.metadata)
+
+    def save(
+        self,
+        file_name: str,
+        chunks: Optional[Tuple[int, int, int]] = None,
+        compression: Optional[str] = DEFAULT_COMPRESSION,
+        metadata: Optional[dict] = None,
+    ):
+        """
+        Save the cube in a chunked and compressed HDF5 store (h5py is required).
+        :param file_name: path to the store file.
+        :param chunks: (samples, lines, bands) chunk shape, (64, 64, 32) by default.
+        :param compression: "lzf" (fast, default), "gzip" or None.
+        :param metadata: JSON serializable provenance, the cube metadata if None.
+        :return:
+        """
+        write_cube_store(
+            file_name,
+            self.data,
+            self.domain,
+            chunks=chunks,
+            compression=compression,
+            metadata=self.metadata if metadata is None else metadata,
+        )
+
+    def to_envi(
+        self,
+        file_name: str,
+        interleave: str = "bil",
+        dtype: Optional[np.dtype] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        Write the cube in an ENVI .raw file and its .hdr file, the domain being written as wavelength.
+        The data is streamed chunk of lines by chunk of lines, so memory-mapped or stored cubes are never fully loaded.
+        :param file_name: path to the .raw file, the header is written next to it with the .hdr extension.
+        :param interleave: "bil", "bip" or "bsq".
+        :param dtype: data type of the file, the data type of the cube if None.
+        :param chunk_size: number of lines written at once.
+        :return:
+        """
+        wavelength = self.domain if np.issubdtype(self.domain.dtype, np.number) else None
+        write_raw(
+            file_name,
+            self.data,
+            interleave=interleave,
+            dtype=dtype,
+            wavelength=wavelength,
+            chunk_size=chunk_size,
+        )
 
     @staticmethod
-    def from_mat_file(data_file_name: str, domain_file_name: Optional[str] = None):
+    def open(file_name: str):
+        """
+        Open a SpectralCube saved with SpectralCube.save.
+        The data is read lazily: slicing a band or a tile only reads the chunks it needs.
+        The store stays open until close is called, e.g. with SpectralCube.open(file_name) as cube: ...
+        :param file_name: path to the store file.
+        :return: SpectralCube with the h5py dataset as data.
+        """
+        data, domain, metadata = open_cube_store(file_name)
+        try:
+            spectral_cube = SpectralCube(data=data, domain=domain, metadata=metadata)
+        except BaseException:
+            data.file.close()
+            raise
+        spectral_cube._file = data.file
+        return spectral_cube
+
+    def close(self):
+        """
+        Close the file opened for the cube by SpectralCube.open or by SpectralCube.from_mat_file for a MATLAB v7.3
+        file, its data cannot be read afterwards.
+        Nothing is done for the other cubes.
+        :return:
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def compress(self, mask: np.array, chunk_size: int = DEFAULT_CHUNK_SIZE) -> "MaskedSpectralCube":
+        """
+        Keep only the pixels of a mask, e.g. the foreground of a conveyor belt scan.
+        :param mask: boolean array of shape (x, y), True for the pixels to keep.
+        :param chunk_size: number of rows (0-axis) read at once, to bound the memory of memory-mapped or stored cubes.
+        :return: MaskedSpectralCube
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != self.shape[:2]:
+            raise exceptions.ArrayDimensionError(mask.shape, self.shape[:2])
+        data = np.empty((np.count_nonzero(mask), self.shape[2]), dtype=self.dtype)
+        start = 0
+        for x_start in range(0, self.shape[0], chunk_size):
+            rows = slice(x_start, x_start + chunk_size)
+            pixels = np.asarray(self.data[rows])[mask[rows]]
+            data[start : start + pixels.shape[0]] = pixels
+            start += pixels.shape[0]
+        return MaskedSpectralCube(data=data, domain=self.domain, mask=mask, metadata=self.metadata)
+
+    def objects(self, mask: np.array, connectivity: int = 1, median: bool = True):
+        """
+        Label the connected components of a mask and compute the count, mean, std and median spectrum of each object.
+        The object spectra (e.g. objects.mean) are SpectralMat ready for preprocessing or kmeans.
+        :param mask: boolean array of shape (x, y), e.g. from segment.
+        :param connectivity: 1 for 4-connected pixels, 2 for 8-connected pixels.
+        :param median: compute the median spectra.
+        :return: SpectralObjects
+        """
+        from hyperpy.spectral.objects import extract_objects
+
+        return extract_objects(self, mask, connectivity=connectivity, median=median)
+
+    def integral(self, squares: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Get the summed-area tables of the cube, built on the first call and then cached with the cube.
+        The mean (and variance) spectrum of any RectangleMask is then computed in constant time.
+        :param squares: also build the table of the squared values, needed by the variance.
+        :param chunk_size: number of rows (0-axis) read at once while building the tables.
+        :return: IntegralCube
+        """
+        from hyperpy.spectral.integral import IntegralCube
+
+        if self._integral is None or (squares and self._integral.square_table is None):
+            self._integral = IntegralCube(self, squares=squares, chunk_size=chunk_size)
+        return self._integral
+
+    def lazy(self):
+        """
+        Get a LazySpectralCube recording the operations on the cube instead of computing them.
+        :return: LazySpectralCube
+        """
+        from hyperpy.spectral.lazy import LazySpectralCube
+
+        return LazySpectralCube.from_cube(self)
+
+    @staticmethod
+    def from_mat_file(
+        data_file_name: str,
+        domain_file_name: Optional[str] = None,
+        variable_name: Optional[str] = None,
+        domain_variable_name: Optional[str] = None,
+    ):
         """
         Construct a SpectralCube instance from a .mat file containing the data array and a .mat file containing the domain array.
+        MATLAB v7.3 data files are read lazily, chunk by chunk when the cube is sliced,
+        and stay open until close is called, e.g. with SpectralCube.from_mat_file(file_name) as cube: ...
         :param data_file_name:
         :param domain_file_name:
+        :param variable_name: name of the data variable, the first variable if None.
+        :param domain_variable_name: name of the domain variable, the first variable if None.
         :return:
         """
         domain_file_name = domain_file_name or None
-        data: np.array = read_mat_file(data_file_name)
-        if domain_file_name is None:
-            domain = np.arange(1, data.shape[2] + 1)
-        else:
-            domain: np.array = read_mat_file(domain_file_name)
-        return SpectralCube(data=data, domain=domain)
+        data: np.array = read_mat_file(data_file_name, variable_name)
+        try:
+            if domain_file_name is None:
+                domain = np.arange(1, data.shape[2] + 1)
+            else:
+                domain_data = read_mat_file(domain_file_name, domain_variable_name)
+                # MATLAB vectors are stored as 1 x n or n x 1 matrices
+                domain: np.array = np.ravel(domain_data)
+                if isinstance(domain_data, MatDataset):
+                    domain_data.close()
+            spectral_cube = SpectralCube(data=data, domain=domain)
+        except BaseException:
+            if isinstance(data, MatDataset):
+                data.close()
+            raise
+        if isinstance(data, MatDataset):
+            spectral_cube._file = data.file
+        return spectral_cube
 
     @staticmethod
-    def from_specim(data_file_name: str, **kwargs):
+    def from_specim(
+        data_file_name: str, lazy: bool = False, dtype: np.dtype = DEFAULT_DTYPE, **kwargs
+    ):
         """
         Construct a SpectralCube instance from a specim file.
         :param data_file_name:
+        :param lazy: kept for compatibility, the raw measurement is always memory-mapped.
+        :param dtype: data type of the reflectance, float32 by default.
         :return:
         """
-        data, domain = read_specim(data_file_name, **kwargs)
-        return SpectralCube(data=data, domain=domain)
+        data, domain = read_specim(data_file_name, lazy=lazy, dtype=dtype, **kwargs)
+        return SpectralCube(
+            data=data, domain=domain, metadata={"source": data_file_name, "format": "specim"}
+        )
 
     @staticmethod
-    def from_hyspex(data_file_name: str, end_white_index: int, **kwargs):
+    def from_hyspex(
+        data_file_name: str,
+        end_white_index: int,
+        lazy: bool = False,
+        dtype: np.dtype = DEFAULT_DTYPE,
+        **kwargs
+    ):
         """
         Construct a SpectralCube instance from a specim file.
         :param end_white_index:
         :param data_file_name:
+        :param lazy: kept for compatibility, the raw measurement is always memory-mapped.
+        :param dtype: data type of the reflectance, float32 by default.
         :return:
         """
-        data, domain = read_hyspex(data_file_name, end_white_index, **kwargs)
-        return SpectralCube(data=data, domain=domain)
+        data, domain = read_hyspex(
+            data_file_name, end_white_index, lazy=lazy, dtype=dtype, **kwargs
+        )
+        return SpectralCube(
+            data=data,
+            domain=domain,
+            metadata={"source": data_file_name, "format": "hyspex", "end_white_index": end_white_index},
+        )
+
+    @staticmethod
+    def iter_specim(
+        data_file_names: Iterable[str],
+        n_jobs: int = DEFAULT_IO_JOBS,
+        prefetch: Optional[int] = None,
+        **kwargs
+    ) -> Iterator["SpectralCube"]:
+        """
+        Load a series of specim files on a thread pool, the next files being loaded while the current cube is used.
+        :param data_file_names: paths to the .raw files.
+        :param n_jobs: number of loading threads.
+        :param prefetch: maximal number of cubes loaded ahead, n_jobs if None.
+        :param kwargs: passed to SpectralCube.from_specim.
+        :return: iterator of SpectralCube, in the order of data_file_names.
+        """
+        return iter_load(
+            SpectralCube.from_specim, data_file_names, n_jobs=n_jobs, prefetch=prefetch, **kwargs
+        )
+
+    @staticmethod
+    def iter_hyspex(
+        data_file_names: Iterable[str],
+        end_white_index: int,
+        n_jobs: int = DEFAULT_IO_JOBS,
+        prefetch: Optional[int] = None,
+        **kwargs
+    ) -> Iterator["SpectralCube"]:
+        """
+        Load a series of hyspex files on a thread pool, the next files being loaded while the current cube is used.
+        :param data_file_names: paths to the .raw files.
+        :param end_white_index: end index for white measurement.
+        :param n_jobs: number of loading threads.
+        :param prefetch: maximal number of cubes loaded ahead, n_jobs if None.
+        :param kwargs: passed to SpectralCube.from_hyspex.
+        :return: iterator of SpectralCube, in the order of data_file_names.
+        """
+        return iter_load(
+            SpectralCube.from_hyspex,
+            data_file_names,
+            n_jobs=n_jobs,
+            prefetch=prefetch,
+            end_white_index=end_white_index,
+            **kwargs
+        )
+
+
+@dataclass
+class MaskedSpectralCube(Spectral):
+    """
+    Valid pixels of a cube stored as a compact (n_valid, bands) matrix, with the (x, y) mask locating them.
+    Transformers and models work on the compact matrix, so the cost scales with the valid pixels only.
+    """
+
+    mask: np.array
+    metadata: Optional[dict] = field(default=None, compare=False)
+
+    def __post_init__(self):
+        """
+        Make some check for the consistency of the data.
+        """
+        if len(self.data.shape) != 2:
+            raise exceptions.DataDimensionError(len(self.data.shape), 2)
+        if len(self.domain.shape) != 1:
+            raise exceptions.DataDimensionError(len(self.domain.shape), 1)
+        if self.data.shape[1] != self.domain.shape[0]:
+            raise exceptions.WrongDomainDimension(self.domain.shape, self.data.shape)
+        if len(self.mask.shape) != 2:
+            raise exceptions.DataDimensionError(len(self.mask.shape), 2)
+        self.mask = np.asarray(self.mask, dtype=bool)
+        if np.count_nonzero(self.mask) != self.data.shape[0]:
+            raise exceptions.ArrayDimensionError(np.count_nonzero(self.mask), self.data.shape[0])
+        # Shape of the full cube
+        self.width, self.height = self.mask.shape
+        self.shape = self.mask.shape + self.domain.shape
+
+    def get_matrix(self):
+        """
+        Get the compact matrix of the valid pixels.
+        """
+        return self.data
+
+    @property
+    def pixel_index(self) -> np.array:
+        """
+        Flat (x * y) index of the valid pixels, in the order of the matrix rows.
+        """
+        return np.flatnonzero(self.mask)
+
+    def to_cube(self, fill_value=np.nan) -> SpectralCube:
+        """
+        Scatter the valid pixels in a full SpectralCube.
+        :param fill_value: value of the pixels outside the mask.
+        :return: SpectralCube
+        """
+        dtype = np.result_type(self.data.dtype, np.min_scalar_type(fill_value))
+        data = np.full(self.shape, fill_value, dtype=dtype)
+        data[self.mask] = self.data
+        return SpectralCube(data=data, domain=self.domain, metadata=self.metadata)
 
 
 def as_cube(
@@ -128,6 +430,10 @@ def as_cube(
     :param domain: Optional. If None use the domain of the reference spectral spectral.
     :return: SpectralCube
     """
-    domain = domain or spectral_cube.domain
+    domain = spectral_cube.domain if domain is None else domain
+    if isinstance(spectral_cube, MaskedSpectralCube):
+        # Results stay compact, MaskedSpectralCube.to_cube scatters them on demand
+        data_mat = data.reshape((spectral_cube.data.shape[0],) + domain.shape)
+        return MaskedSpectralCube(data=data_mat, domain=domain, mask=spectral_cube.mask)
     data_cube = data.reshape(spectral_cube.shape[:2]+domain.shape)
     return SpectralCube(data=data_cube, domain=domain)
@@ -55,9 +55,18 @@ class RectangleMask:
             raise DataDimensionError(len(array.shape), "2 or 3")
         return masked_array
 
+    def window(self) -> dict:
+        """
+        Get the mask as a window to read from the file: SpectralCube.from_specim(path, **mask.window())
+        Only the bytes of the window are then read instead of the whole file.
+        :return: dict with the samples (0-axis) and lines (1-axis) ranges.
+        """
+        return {"samples": tuple(self.x_mask), "lines": tuple(self.y_mask)}
+
     def apply_spectral(self, spectral: SpectralCube, inplace=False):
         """
         Apply the rectangle mask on a SpectralCube
+        For a memory-mapped SpectralCube (lazy loading), the result is a view and nothing is read.
         :param spectral: instance of SpectralCube
         :param inplace:
         :return:
@@ -68,6 +77,23 @@ class RectangleMask:
         else:
             spectral.update_data(masked_array)
 
+    def mean_spectrum(self, spectral: SpectralCube) -> np.array:
+        """
+        Get the mean spectrum of the rectangle in constant time from the summed-area table of the cube,
+        built on the first call (see SpectralCube.integral).
+        :param spectral: instance of SpectralCube
+        :return: numpy array of shape (bands,).
+        """
+        return spectral.integral().mean(self)
+
+    def variance_spectrum(self, spectral: SpectralCube) -> np.array:
+        """
+        Get the variance spectrum of the rectangle in constant time from the summed-area tables of the cube.
+        :param spectral: instance of SpectralCube
+        :return: numpy array of shape (bands,).
+        """
+        return spectral.integral(squares=True).variance(self)
+
 def get_max_rectangle_mask(mask: np.array) -> RectangleMask:
     """
     Get the largest rectangle mask from the input mask.
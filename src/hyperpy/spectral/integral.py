@@ -0,0 +1,157 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from hyperpy.exceptions import ArrayDimensionError
+from hyperpy.loading.utils import DEFAULT_CHUNK_SIZE
+from hyperpy.spectral.classes import SpectralCube, SpectralMat
+from hyperpy.spectral.cube_crop import RectangleMask
+
+
+def summed_area_table(
+    data: np.array, squares: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> np.array:
+    """
+    Compute the float64 summed-area table of a (x, y, bands) cube, padded with a leading row and column of zeros:
+    table[i, j] is the sum of data[:i, :j] for each band.
+    The cube is read chunk of rows by chunk of rows, so memory-mapped or stored cubes are never fully loaded.
+    :param data: array like of shape (x, y, bands).
+    :param squares: sum the squared values instead.
+    :param chunk_size: number of rows (0-axis) read at once.
+    :return: float64 numpy array of shape (x + 1, y + 1, bands).
+    """
+    x, y, bands = data.shape
+    table = np.zeros((x + 1, y + 1, bands), dtype=np.float64)
+    for start in range(0, x, chunk_size):
+        stop = min(start + chunk_size, x)
+        block = np.asarray(data[start:stop], dtype=np.float64)
+        if squares:
+            np.square(block, out=block)
+        rows = table[start + 1 : stop + 1, 1:]
+        np.cumsum(block, axis=1, out=rows)
+        np.cumsum(rows, axis=0, out=rows)
+        rows += table[start, 1:]
+    return table
+
+
+class IntegralCube:
+    """
+    Summed-area tables of a SpectralCube: the sum, mean and variance spectra of any rectangle
+    are computed from 4 corners of the tables, in constant time whatever the size of the rectangle.
+    The tables are float64 for accuracy, NaN pixels propagate to the rectangles containing them.
+    """
+
+    def __init__(
+        self, spectral_cube: SpectralCube, squares: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        """
+        :param spectral_cube: instance of SpectralCube.
+        :param squares: also build the table of the squared values, needed by the variance.
+        :param chunk_size: number of rows (0-axis) read at once.
+        """
+        self.shape = spectral_cube.shape
+        self.domain = spectral_cube.domain
+        self.table = summed_area_table(spectral_cube.data, chunk_size=chunk_size)
+        self.square_table = (
+            summed_area_table(spectral_cube.data, squares=True, chunk_size=chunk_size) if squares else None
+        )
+
+    def _corners(self, x_masks: np.array, y_masks: np.array) -> Tuple[np.array, ...]:
+        x_masks = np.clip(np.asarray(x_masks, dtype=np.intp).reshape(-1, 2), 0, self.shape[0])
+        y_masks = np.clip(np.asarray(y_masks, dtype=np.intp).reshape(-1, 2), 0, self.shape[1])
+        x0, x1 = x_masks[:, 0], np.maximum(x_masks[:, 0], x_masks[:, 1])
+        y0, y1 = y_masks[:, 0], np.maximum(y_masks[:, 0], y_masks[:, 1])
+        return x0, x1, y0, y1
+
+    @staticmethod
+    def _sum(table: np.array, x0: np.array, x1: np.array, y0: np.array, y1: np.array) -> np.array:
+        return table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+
+    def count(self, x_masks: np.array, y_masks: np.array) -> np.array:
+        """
+        Get the number of pixels of rectangles.
+        :param x_masks: (first, last) indexes on the 0-axis, array of shape (2,) or (n, 2).
+        :param y_masks: (first, last) indexes on the 1-axis, array of shape (2,) or (n, 2).
+        :return: numpy array of shape (n,).
+        """
+        x0, x1, y0, y1 = self._corners(x_masks, y_masks)
+        return (x1 - x0) * (y1 - y0)
+
+    def sums(self, x_masks: np.array, y_masks: np.array, squares: bool = False) -> np.array:
+        """
+        Get the sum spectra of rectangles.
+        :param x_masks: (first, last) indexes on the 0-axis, array of shape (2,) or (n, 2).
+        :param y_masks: (first, last) indexes on the 1-axis, array of shape (2,) or (n, 2).
+        :param squares: sum the squared values.
+        :return: numpy array of shape (n, bands).
+        """
+        if squares and self.square_table is None:
+            raise ValueError("The table of the squared values was not built, use squares=True")
+        table = self.square_table if squares else self.table
+        return self._sum(table, *self._corners(x_masks, y_masks))
+
+    def means(self, x_masks: np.array, y_masks: np.array) -> np.array:
+        """
+        Get the mean spectra of rectangles, nan for the empty ones.
+        :param x_masks: (first, last) indexes on the 0-axis, array of shape (2,) or (n, 2).
+        :param y_masks: (first, last) indexes on the 1-axis, array of shape (2,) or (n, 2).
+        :return: numpy array of shape (n, bands).
+        """
+        count = self.count(x_masks, y_masks)[:, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.sums(x_masks, y_masks) / count
+
+    def variances(self, x_masks: np.array, y_masks: np.array) -> np.array:
+        """
+        Get the (population) variance spectra of rectangles, nan for the empty ones.
+        :param x_masks: (first, last) indexes on the 0-axis, array of shape (2,) or (n, 2).
+        :param y_masks: (first, last) indexes on the 1-axis, array of shape (2,) or (n, 2).
+        :return: numpy array of shape (n, bands).
+        """
+        count = self.count(x_masks, y_masks)[:, np.newaxis]
+        square_sums = self.sums(x_masks, y_masks, squares=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.sums(x_masks, y_masks) / count
+            variance = square_sums / count - np.square(mean)
+        # Rounding errors of the difference can be slightly negative
+        return np.maximum(variance, 0, where=np.isfinite(variance), out=variance)
+
+    def _check_mask(self, rectangle_mask: RectangleMask):
+        if tuple(rectangle_mask.shape[:2]) != tuple(self.shape[:2]):
+            raise ArrayDimensionError(rectangle_mask.shape, self.shape)
+
+    def mean(self, rectangle_mask: RectangleMask) -> np.array:
+        """
+        Get the mean spectrum of a RectangleMask.
+        :param rectangle_mask: instance of RectangleMask with the shape of the cube.
+        :return: numpy array of shape (bands,).
+        """
+        self._check_mask(rectangle_mask)
+        return self.means(rectangle_mask.x_mask, rectangle_mask.y_mask)[0]
+
+    def variance(self, rectangle_mask: RectangleMask) -> np.array:
+        """
+        Get the variance spectrum of a RectangleMask.
+        :param rectangle_mask: instance of RectangleMask with the shape of the cube.
+        :return: numpy array of shape (bands,).
+        """
+        self._check_mask(rectangle_mask)
+        return self.variances(rectangle_mask.x_mask, rectangle_mask.y_mask)[0]
+
+    def roi_spectra(
+        self, rectangle_masks: Sequence[RectangleMask], variance: bool = False
+    ) -> Tuple[SpectralMat, Optional[SpectralMat]]:
+        """
+        Get the mean spectra of several RectangleMask, one row per rectangle.
+        :param rectangle_masks: instances of RectangleMask with the shape of the cube.
+        :param variance: also get the variance spectra.
+        :return: mean SpectralMat, and variance SpectralMat (None if variance is False).
+        """
+        for rectangle_mask in rectangle_masks:
+            self._check_mask(rectangle_mask)
+        x_masks = np.array([rectangle_mask.x_mask for rectangle_mask in rectangle_masks]).reshape(-1, 2)
+        y_masks = np.array([rectangle_mask.y_mask for rectangle_mask in rectangle_masks]).reshape(-1, 2)
+        means = SpectralMat(data=self.means(x_masks, y_masks), domain=self.domain)
+        if not variance:
+            return means, None
+        return means, SpectralMat(data=self.variances(x_masks, y_masks), domain=self.domain)
@@ -0,0 +1,338 @@
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+from sklearn.base import TransformerMixin
+
+from hyperpy.exceptions import ArrayDimensionError
+from hyperpy.loading.envi_header import find_hdr_file, read_envi_header
+from hyperpy.spectral.classes import SpectralCube
+
+Range = Tuple[int, int]
+
+
+class Predictor(TransformerMixin):
+    """
+    Row wise prediction of a fitted model (e.g. KMeans) as a transformer with a single output column.
+    """
+
+    def __init__(self, model, name: str = "prediction"):
+        self.name = "Prediction"
+        self.short_name = name
+        self.model = model
+        self.transformed_domain = np.array([name])
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X: np.array) -> np.array:
+        return np.expand_dims(self.model.predict(X), 1)
+
+
+class CubeWindow:
+    """
+    Window of a (x, y, bands) array read only when sliced, for numpy arrays, memmaps or h5py datasets.
+    """
+
+    def __init__(self, data, samples: Range, lines: Range, bands: np.array):
+        self.data = data
+        self.samples = samples
+        self.lines = lines
+        self.bands = bands
+        self.shape = (samples[1] - samples[0], lines[1] - lines[0], len(bands))
+        self.dtype = data.dtype
+        # Contiguous bands are read as a slice, the others as sorted indexes (required by h5py)
+        band_range = get_band_range(bands)
+        if band_range is not None:
+            self.band_index, self.band_order = slice(*band_range), None
+        else:
+            self.band_index, self.band_order = np.unique(bands, return_inverse=True)
+
+    def __getitem__(self, tile: Tuple[slice, ...]) -> np.array:
+        x, y = tile[:2]
+        x_start, x_stop, _ = x.indices(self.shape[0])
+        y_start, y_stop, _ = y.indices(self.shape[1])
+        window = self.data[
+            self.samples[0] + x_start : self.samples[0] + x_stop,
+            self.lines[0] + y_start : self.lines[0] + y_stop,
+            self.band_index,
+        ]
+        window = np.asarray(window)
+        if self.band_order is not None:
+            window = window[:, :, self.band_order]
+        return window[(slice(None), slice(None)) + tuple(tile[2:])]
+
+    def __array__(self, dtype=None) -> np.array:
+        array = self[:, :]
+        return array if dtype is None else array.astype(dtype)
+
+
+class LoaderWindow:
+    """
+    Window of a file read by a loader (e.g. read_specim) only when sliced: each tile calls the loader on its own
+    window, so the peak memory is bounded by the tile instead of the whole window.
+    """
+
+    def __init__(self, loader: Callable, samples: Range, lines: Range, bands: Union[Range, np.array]):
+        self.loader = loader
+        self.samples = samples
+        self.lines = lines
+        self.bands = bands
+        nbr_bands = bands[1] - bands[0] if isinstance(bands, tuple) else len(bands)
+        self.shape = (samples[1] - samples[0], lines[1] - lines[0], nbr_bands)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self[:1, :1].dtype
+
+    def __getitem__(self, tile: Tuple[slice, ...]) -> np.array:
+        x, y = tile[:2]
+        x_start, x_stop, _ = x.indices(self.shape[0])
+        y_start, y_stop, _ = y.indices(self.shape[1])
+        window, _ = self.loader(
+            samples=(self.samples[0] + x_start, self.samples[0] + max(x_start, x_stop)),
+            lines=(self.lines[0] + y_start, self.lines[0] + max(y_start, y_stop)),
+            bands=self.bands,
+        )
+        return np.asarray(window)[(slice(None), slice(None)) + tuple(tile[2:])]
+
+    def __array__(self, dtype=None) -> np.array:
+        array = self[:, :]
+        return array if dtype is None else array.astype(dtype)
+
+
+class LazySpectralCube:
+    """
+    SpectralCube whose operations are recorded instead of being computed.
+    Crops, band selections, transformers and model predictions are chained in a graph,
+    which is optimized and executed tile by tile by compute:
+    - all the crops are merged in a single window read from the source,
+    - the band selections done before any transformer are read from the source as well,
+    - the row wise transformers are fused (see compile_transformers).
+    """
+
+    def __init__(
+        self,
+        source: Union[SpectralCube, Callable],
+        shape: Tuple[int, int, int],
+        domain: np.array,
+        nodes: tuple = (),
+    ):
+        """
+        :param source: SpectralCube (in memory, memory-mapped or stored),
+            or loader called with the samples, lines and bands to read.
+        :param shape: shape of the source.
+        :param domain: domain of the source.
+        :param nodes: recorded operations, as (name, argument) tuples.
+        """
+        self.source = source
+        self.source_shape = tuple(shape)
+        self.source_domain = np.asarray(domain)
+        self.nodes = tuple(nodes)
+
+    @staticmethod
+    def from_cube(spectral_cube: SpectralCube) -> "LazySpectralCube":
+        """
+        Record operations on an existing SpectralCube.
+        :param spectral_cube:
+        :return: LazySpectralCube
+        """
+        return LazySpectralCube(spectral_cube, spectral_cube.shape, spectral_cube.domain)
+
+    @staticmethod
+    def from_specim(data_file_name: str, **kwargs) -> "LazySpectralCube":
+        """
+        Record operations on a specim file, only the window needed by the result is read and calibrated.
+        :param data_file_name:
+        :param kwargs: passed to read_specim.
+        :return: LazySpectralCube
+        """
+        from hyperpy import read_specim
+
+        header = read_envi_header(find_hdr_file(data_file_name))
+        return LazySpectralCube(
+            lambda **window: read_specim(data_file_name, **window, **kwargs),
+            header.shape,
+            get_header_domain(header),
+        )
+
+    @staticmethod
+    def from_hyspex(data_file_name: str, end_white_index: int, **kwargs) -> "LazySpectralCube":
+        """
+        Record operations on a hyspex file, only the window needed by the result is read and calibrated.
+        :param data_file_name:
+        :param end_white_index: end index for white measurement.
+        :param kwargs: passed to read_hyspex.
+        :return: LazySpectralCube
+        """
+        from hyperpy import read_hyspex
+
+        header = read_envi_header(find_hdr_file(data_file_name))
+        return LazySpectralCube(
+            lambda **window: read_hyspex(data_file_name, end_white_index, **window, **kwargs),
+            header.shape,
+            get_header_domain(header),
+        )
+
+    def _chain(self, node: tuple) -> "LazySpectralCube":
+        return LazySpectralCube(
+            self.source, self.source_shape, self.source_domain, self.nodes + (node,)
+        )
+
+    def crop(
+        self,
+        rectangle_mask=None,
+        samples: Optional[Range] = None,
+        lines: Optional[Range] = None,
+    ) -> "LazySpectralCube":
+        """
+        Record a spatial crop, given as a RectangleMask or as samples (0-axis) and lines (1-axis) ranges.
+        :param rectangle_mask: instance of RectangleMask with the shape of the cube.
+        :param samples: (first, last) range of the 0-axis.
+        :param lines: (first, last) range of the 1-axis.
+        :return: LazySpectralCube
+        """
+        if rectangle_mask is not None:
+            if tuple(rectangle_mask.shape[:2]) != self.shape[:2]:
+                raise ArrayDimensionError(self.shape, rectangle_mask.shape)
+            samples, lines = rectangle_mask.x_mask, rectangle_mask.y_mask
+        samples = (0, self.shape[0]) if samples is None else tuple(samples)
+        lines = (0, self.shape[1]) if lines is None else tuple(lines)
+        return self._chain(("crop", (samples, lines)))
+
+    def select_bands(self, selection) -> "LazySpectralCube":
+        """
+        Record a band selection.
+        :param selection: (first, last) range of bands, or list/array of band indexes or boolean mask.
+        :return: LazySpectralCube
+        """
+        if isinstance(selection, tuple):
+            selection = np.arange(*selection)
+        return self._chain(("bands", np.arange(self.shape[2])[np.asarray(selection)]))
+
+    def transform(self, *transformers: TransformerMixin) -> "LazySpectralCube":
+        """
+        Record row wise transformers (fit beforehand if needed).
+        Crops are read from the source before transforming, which only gives the same result for row wise
+        transformers: the others (e.g. Positive) raise a ValueError, apply them with spectral_process instead.
+        :param transformers:
+        :return: LazySpectralCube
+        """
+        from hyperpy.preprocessing.utils import check_row_wise
+
+        check_row_wise(transformers)
+        return self._chain(("transform", transformers))
+
+    def predict(self, model, name: str = "prediction") -> "LazySpectralCube":
+        """
+        Record the prediction of a fitted model for each pixel, e.g. a KMeans returned by kmeans.
+        :param model: fitted model with a predict method.
+        :param name: domain of the prediction.
+        :return: LazySpectralCube
+        """
+        return self._chain(("transform", (Predictor(model, name),)))
+
+    def plan(self) -> Tuple[Range, Range, np.array, list]:
+        """
+        Optimize the graph.
+        :return: (samples, lines, bands) window to read from the source, and the transformers to apply on it.
+        """
+        from hyperpy.preprocessing import DomainSelection
+        from hyperpy.preprocessing.utils import get_transformed_domain
+
+        samples = (0, self.source_shape[0])
+        lines = (0, self.source_shape[1])
+        bands = np.arange(self.source_shape[2])
+        domain = self.source_domain
+        transformers = []
+        for name, argument in self.nodes:
+            if name == "crop":
+                # Transformers are row wise, crops commute with them
+                samples = compose_range(samples, argument[0])
+                lines = compose_range(lines, argument[1])
+            elif name == "bands" and not transformers:
+                bands = bands[argument]
+                domain = domain[argument]
+            elif name == "bands":
+                transformers.append(DomainSelection(argument, domain))
+                domain = domain[argument]
+            else:
+                transformers.extend(argument)
+                domain = get_transformed_domain(domain, argument)
+        return samples, lines, bands, transformers
+
+    @property
+    def domain(self) -> np.array:
+        from hyperpy.preprocessing.utils import get_transformed_domain
+
+        _, _, bands, transformers = self.plan()
+        return get_transformed_domain(self.source_domain[bands], transformers)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        samples, lines, _, _ = self.plan()
+        return samples[1] - samples[0], lines[1] - lines[0], self.domain.shape[0]
+
+    def compute(
+        self,
+        tile_shape: Optional[Tuple[int, int]] = None,
+        out: Optional[np.array] = None,
+        n_jobs: int = 1,
+    ) -> SpectralCube:
+        """
+        Execute the graph.
+        :param tile_shape: (x, y) size of the spatial tiles read and transformed at once. If None, the window at once.
+            For a file source, the loader is called tile by tile, which bounds the peak memory.
+        :param out: numpy array of the output shape to write the result in (e.g. a np.memmap).
+        :param n_jobs: number of threads transforming the tiles concurrently.
+        :return: SpectralCube
+        """
+        from hyperpy.preprocessing import spectral_process
+        from hyperpy.preprocessing.utils import iter_tiles
+
+        samples, lines, bands, transformers = self.plan()
+        band_domain = self.source_domain[bands]
+        if isinstance(self.source, SpectralCube):
+            data = CubeWindow(self.source.data, samples, lines, bands)
+        else:
+            # Loaders read a (first, last) range of bands as a view, and are called tile by tile
+            band_range = get_band_range(bands)
+            band_selection = bands if band_range is None else band_range
+            data = LoaderWindow(self.source, samples, lines, band_selection)
+        window_cube = SpectralCube(data=data, domain=band_domain)
+        if not transformers:
+            if out is None:
+                return SpectralCube(data=np.asarray(data), domain=band_domain)
+            tile_shape = tile_shape or tuple(max(size, 1) for size in data.shape[:2])
+            for tile in iter_tiles(data.shape[:2], tile_shape):
+                out[tile] = data[tile]
+            return SpectralCube(data=out, domain=band_domain)
+        return spectral_process(
+            window_cube, transformers, tile_shape=tile_shape, out=out, n_jobs=n_jobs, fuse=True
+        )
+
+
+def compose_range(current: Range, selection: Range) -> Range:
+    """
+    Get the source range of a (first, last) range selected in a source range.
+    """
+    start = current[0] + min(max(selection[0], 0), current[1] - current[0])
+    stop = current[0] + min(max(selection[1], 0), current[1] - current[0])
+    return start, max(start, stop)
+
+
+def get_band_range(bands: np.array) -> Optional[Range]:
+    """
+    Get the (first, last) range of contiguous increasing band indexes, None otherwise.
+    """
+    if len(bands) and np.array_equal(bands, np.arange(bands[0], bands[0] + len(bands))):
+        return int(bands[0]), int(bands[0]) + len(bands)
+    return None
+
+
+def get_header_domain(header) -> np.array:
+    """
+    Get the wavelength of an ENVI header, a range of the bands if missing.
+    """
+    if header.wavelength is None:
+        return np.arange(1, header.bands + 1)
+    return np.array(header.wavelength)
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
+
+from hyperpy.spectral.classes import MaskedSpectralCube, SpectralCube, SpectralMat
+from hyperpy.spectral.segmentation import label_objects
+
+
+@dataclass
+class SpectralObjects:
+    """
+    Spectral statistics of the objects (connected components) of a cube.
+    Row i of the statistics is the object labelled i + 1, the background being labelled 0.
+    """
+
+    labels: np.array
+    count: np.array
+    mean: SpectralMat
+    std: SpectralMat
+    median: Optional[SpectralMat] = None
+
+    def __len__(self) -> int:
+        return self.count.shape[0]
+
+    def to_map(self, values: np.array, fill_value=0) -> np.array:
+        """
+        Scatter one value per object (e.g. its k-means class) in an image of the labels shape.
+        :param values: array of shape (n_objects,) or (n_objects, 1).
+        :param fill_value: value of the background.
+        :return: numpy array of shape (x, y).
+        """
+        values = np.ravel(values)
+        if values.shape[0] != len(self):
+            raise ValueError(f"Expected {len(self)} values, got {values.shape[0]}")
+        return np.concatenate(([fill_value], values))[self.labels]
+
+
+def object_statistics(
+    spectral: Union[SpectralCube, MaskedSpectralCube], labels: np.array, median: bool = True
+) -> SpectralObjects:
+    """
+    Compute the pixel count, mean, standard deviation and median spectrum of each object in one vectorized pass.
+    The pixels are sorted once by (object, value) for all the bands, then the statistics are segment reductions.
+    :param spectral: instance of SpectralCube or MaskedSpectralCube.
+    :param labels: int array of shape (x, y), 0 for the background and 1 to n for the objects.
+    :param median: compute the median spectra, which needs a sort of the object pixels.
+    :return: SpectralObjects
+    """
+    labels = np.asarray(labels)
+    if labels.shape != spectral.shape[:2]:
+        raise ValueError(
+            f"labels of shape {labels.shape} do not match the cube shape {spectral.shape[:2]}"
+        )
+    nbr_objects = int(labels.max(initial=0))
+    if isinstance(spectral, MaskedSpectralCube):
+        pixel_labels = labels[spectral.mask]
+        values = spectral.data[pixel_labels > 0]
+        pixel_labels = pixel_labels[pixel_labels > 0] - 1
+    else:
+        foreground = labels > 0
+        values = spectral.data[foreground]
+        pixel_labels = labels[foreground] - 1
+    values = np.asarray(values, dtype=np.float64)
+    count = np.bincount(pixel_labels, minlength=nbr_objects)
+
+    # Group the pixels by object, sorted by value within the objects for each band
+    if median:
+        order = np.argsort(values, axis=0, kind="stable")
+        order = np.take_along_axis(
+            order, np.argsort(pixel_labels[order], axis=0, kind="stable"), axis=0
+        )
+        values = np.take_along_axis(values, order, axis=0)
+    else:
+        values = values[np.argsort(pixel_labels, kind="stable")]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+    found = count > 0
+    nbr_bands = values.shape[1]
+
+    def reduce_objects(array: np.array) -> np.array:
+        reduced = np.full((nbr_objects, nbr_bands), np.nan)
+        if np.any(found):
+            reduced[found] = np.add.reduceat(array, starts[found], axis=0)
+        return reduced
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = reduce_objects(values) / count[:, np.newaxis]
+    median_values = None
+    if median:
+        low = np.take(values, starts + (count - 1) // 2, axis=0, mode="clip")
+        high = np.take(values, starts + count // 2, axis=0, mode="clip")
+        median_values = np.where(found[:, np.newaxis], (low + high) / 2, np.nan)
+    # Second pass on the deviations for an accurate variance
+    sorted_labels = np.repeat(np.arange(nbr_objects), count)
+    values -= mean[sorted_labels]
+    np.square(values, out=values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(reduce_objects(values) / count[:, np.newaxis])
+
+    domain = spectral.domain
+    return SpectralObjects(
+        labels=labels,
+        count=count,
+        mean=SpectralMat(data=mean, domain=domain),
+        std=SpectralMat(data=std, domain=domain),
+        median=None if median_values is None else SpectralMat(data=median_values, domain=domain),
+    )
+
+
+def extract_objects(
+    spectral: Union[SpectralCube, MaskedSpectralCube],
+    mask: Optional[np.array] = None,
+    connectivity: int = 1,
+    median: bool = True,
+) -> SpectralObjects:
+    """
+    Label the connected components of a mask and compute their spectral statistics.
+    :param spectral: instance of SpectralCube or MaskedSpectralCube.
+    :param mask: boolean array of shape (x, y), e.g. from segment. If None, the mask of the MaskedSpectralCube.
+    :param connectivity: 1 for 4-connected pixels, 2 for 8-connected pixels.
+    :param median: compute the median spectra.
+    :return: SpectralObjects
+    """
+    if mask is None:
+        if not isinstance(spectral, MaskedSpectralCube):
+            raise ValueError("A mask is needed to extract the objects of a SpectralCube")
+        mask = spectral.mask
+    labels, _ = label_objects(mask, connectivity)
+    return object_statistics(spectral, labels, median=median)
@@ -0,0 +1,153 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import ndimage
+
+from hyperpy.spectral.classes import SpectralCube
+from hyperpy.spectral.lazy import CubeWindow
+
+INDEXES = ("normalized_difference", "ratio", "mean")
+# 8-connected structuring element, keeping the corners of the regions
+SQUARE = np.ones((3, 3), dtype=bool)
+
+
+def nearest_band(domain: np.array, wavelength: float) -> int:
+    """
+    Get the index of the band closest to a wavelength.
+    :param domain: domain of the cube.
+    :param wavelength: wavelength to look for.
+    :return: band index.
+    """
+    return int(np.argmin(np.abs(np.asarray(domain, dtype=np.float64) - wavelength)))
+
+
+def read_bands(spectral_cube: SpectralCube, bands: Sequence[int], dtype=np.float32) -> np.array:
+    """
+    Read a few bands of a cube. For a memory-mapped or stored cube, the other bands are not read.
+    :param spectral_cube: instance of SpectralCube.
+    :param bands: band indexes.
+    :param dtype: data type of the result.
+    :return: numpy array of shape (x, y, len(bands)).
+    """
+    window = CubeWindow(
+        spectral_cube.data,
+        (0, spectral_cube.shape[0]),
+        (0, spectral_cube.shape[1]),
+        np.asarray(bands),
+    )
+    return np.asarray(window[:, :], dtype=dtype)
+
+
+def spectral_index(
+    spectral_cube: SpectralCube, bands: Sequence[int], index: str = "normalized_difference"
+) -> np.array:
+    """
+    Compute a spectral index image from a few bands.
+    :param spectral_cube: instance of SpectralCube.
+    :param bands: band indexes: (a, b) for "normalized_difference" (a - b) / (a + b) (e.g. NDVI)
+        and "ratio" a / b, any number of bands for "mean".
+    :param index: "normalized_difference", "ratio" or "mean".
+    :return: float32 numpy array of shape (x, y), nan where the index is undefined.
+    """
+    if index not in INDEXES:
+        raise ValueError(f"{index} is an invalid index. Should be among {list(INDEXES)}")
+    if index != "mean" and len(bands) != 2:
+        raise ValueError(f"The {index} index needs 2 bands, got {len(bands)}")
+    values = read_bands(spectral_cube, bands)
+    if index == "mean":
+        return np.mean(values, axis=2)
+    first, second = values[:, :, 0], values[:, :, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if index == "ratio":
+            image = np.divide(first, second)
+        else:
+            image = np.subtract(first, second)
+            image /= first + second
+    image[~np.isfinite(image)] = np.nan
+    return image
+
+
+def clean_mask(
+    mask: np.array,
+    opening: int = 1,
+    closing: int = 1,
+    fill_holes: bool = True,
+    min_size: int = 0,
+) -> np.array:
+    """
+    Clean a binary mask with morphological operations.
+    :param mask: boolean array of shape (x, y).
+    :param opening: number of opening iterations removing the isolated pixels.
+    :param closing: number of closing iterations joining the close regions.
+    :param fill_holes: fill the holes of the regions.
+    :param min_size: minimal number of pixels of a region, the smaller ones are removed.
+    :return: boolean array of shape (x, y).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if opening:
+        mask = ndimage.binary_opening(mask, structure=SQUARE, iterations=opening)
+    if closing:
+        # Pad so that the closing does not erode the regions touching the borders
+        padded = np.pad(mask, closing)
+        padded = ndimage.binary_closing(padded, structure=SQUARE, iterations=closing)
+        mask = padded[closing:-closing, closing:-closing]
+    if fill_holes:
+        mask = ndimage.binary_fill_holes(mask)
+    if min_size > 1:
+        labels, _ = ndimage.label(mask)
+        sizes = np.bincount(labels.ravel())
+        keep = sizes >= min_size
+        keep[0] = False
+        mask = keep[labels]
+    return mask
+
+
+def label_objects(mask: np.array, connectivity: int = 1) -> Tuple[np.array, int]:
+    """
+    Label the connected components of a mask.
+    :param mask: boolean array of shape (x, y).
+    :param connectivity: 1 for 4-connected pixels, 2 for 8-connected pixels.
+    :return: int32 labels of shape (x, y) (0 for the background, 1 to n for the objects) and n.
+    """
+    structure = ndimage.generate_binary_structure(2, connectivity)
+    labels, nbr_objects = ndimage.label(mask, structure=structure, output=np.int32)
+    return labels, nbr_objects
+
+
+def segment(
+    spectral_cube: SpectralCube,
+    bands: Sequence[int],
+    index: str = "normalized_difference",
+    low: Optional[float] = None,
+    high: Optional[float] = None,
+    opening: int = 1,
+    closing: int = 1,
+    fill_holes: bool = True,
+    min_size: int = 0,
+    connectivity: int = 1,
+) -> Tuple[np.array, np.array]:
+    """
+    Segment the foreground of a cube by thresholding a spectral index, reading only its bands.
+    The mask can be given to get_max_rectangle_mask or SpectralCube.compress.
+    :param spectral_cube: instance of SpectralCube.
+    :param bands: band indexes of the index (see spectral_index),
+        e.g. [nearest_band(domain, 800), nearest_band(domain, 670)] for a NDVI.
+    :param index: "normalized_difference", "ratio" or "mean".
+    :param low: minimal value of the foreground pixels. If None, no minimum.
+    :param high: maximal value of the foreground pixels. If None, no maximum.
+    :param opening: see clean_mask.
+    :param closing: see clean_mask.
+    :param fill_holes: see clean_mask.
+    :param min_size: see clean_mask.
+    :param connectivity: see label_objects.
+    :return: boolean mask and object labels of shape (x, y).
+    """
+    image = spectral_index(spectral_cube, bands, index)
+    mask = np.isfinite(image)
+    if low is not None:
+        mask &= image >= low
+    if high is not None:
+        mask &= image <= high
+    mask = clean_mask(mask, opening, closing, fill_holes, min_size)
+    labels, _ = label_objects(mask, connectivity)
+    return mask, labels
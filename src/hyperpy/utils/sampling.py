@@ -2,7 +2,7 @@ from sklearn.base import TransformerMixin
 from typing import Union, Optional
 
 import numpy as np
-from hyperpy.spectral import Spectral, SpectralMat, SpectralCube
+from hyperpy.spectral import Spectral, SpectralMat, SpectralCube, MaskedSpectralCube
 from sklearn.utils import resample
 
 class DataSampler:
@@ -14,10 +14,10 @@ class DataSampler:
         Take a spectral structure
         """
         self.spectral = spectral
-        if isinstance(spectral, SpectralMat):
+        if isinstance(spectral, (SpectralMat, MaskedSpectralCube)):
             self.n_sample = self.spectral.data.shape[0]
         elif isinstance(spectral, SpectralCube):
-            self.n_sample = self.spectral.data.shape[0]*self.spectral.data.shape[0]
+            self.n_sample = self.spectral.data.shape[0]*self.spectral.data.shape[1]
 
         if isinstance(size, float) and 0 < size <= 1:
             self.shape = int(np.ceil(self.n_sample * size))
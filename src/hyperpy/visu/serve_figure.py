@@ -124,9 +124,11 @@ class BoxROIFigure(DynamicFigure):
         if not data or not any(len(d) for d in data.values()):
             return hv.NdOverlay({0: hv.Curve([], self.spectral_axis_name, 'Reflectance')})
 
-        curves = {}
-        data = zip(data['x0'], data['x1'], data['y0'], data['y1'])
-        for i, (x0, x1, y0, y1) in enumerate(data):
-            selection = self.ds.select(x=(x0, x1), y=(y0, y1))
-            curves[i] = hv.Curve(selection.aggregate(self.spectral_axis_name, np.mean))
+        # The image 'y' is the 0-axis of the cube and 'x' its 1-axis, boxes select the pixel centers in [start, stop)
+        x_masks = np.ceil(np.stack([data['y0'], data['y1']], axis=1))
+        y_masks = np.ceil(np.stack([data['x0'], data['x1']], axis=1))
+        # Constant time per box from the summed-area table, built on the first edit
+        means = self.spectral_cube.integral().means(x_masks, y_masks)
+        wavelengths = np.arange(self.spectral_cube.shape[2])
+        curves = {i: hv.Curve((wavelengths, mean), self.spectral_axis_name, 'Cube') for i, mean in enumerate(means)}
         return hv.NdOverlay(curves)
@@ -66,6 +66,10 @@ class TestRectangleMask:
         tested_array = rectangle_mask.apply(input_array)
         assert np.array_equal(tested_array, output_array)
 
+    def test_window(self):
+        rectangle_mask = RectangleMask((5, 4), (1, 3), (2, 4))
+        assert rectangle_mask.window() == {"samples": (1, 3), "lines": (2, 4)}
+
 
 class TestGetMaxRectangleMask:
     def test_get_max_rectangle_mask(self):
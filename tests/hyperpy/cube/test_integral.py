@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from hyperpy.exceptions import ArrayDimensionError
+from hyperpy.spectral import IntegralCube, RectangleMask, SpectralCube, summed_area_table
+
+
+@pytest.fixture
+def spectral_cube():
+    data = np.random.default_rng(0).random((9, 7, 4)).astype(np.float32)
+    return SpectralCube(data=data, domain=np.arange(4))
+
+
+class TestSummedAreaTable:
+    def test_summed_area_table(self, spectral_cube):
+        table = summed_area_table(spectral_cube.data, chunk_size=2)
+        assert table.shape == (10, 8, 4)
+        assert table.dtype == np.float64
+        np.testing.assert_array_equal(table[0], 0)
+        np.testing.assert_array_equal(table[:, 0], 0)
+        np.testing.assert_allclose(table[5, 3], spectral_cube.data[:5, :3].sum(axis=(0, 1), dtype=np.float64))
+        np.testing.assert_allclose(table[-1, -1], spectral_cube.data.sum(axis=(0, 1), dtype=np.float64))
+
+    def test_summed_area_table_squares(self, spectral_cube):
+        table = summed_area_table(spectral_cube.data, squares=True)
+        expected = np.square(spectral_cube.data.astype(np.float64)).sum(axis=(0, 1))
+        np.testing.assert_allclose(table[-1, -1], expected)
+
+
+class TestIntegralCube:
+    def test_mean(self, spectral_cube):
+        integral = IntegralCube(spectral_cube)
+        rectangle_mask = RectangleMask((9, 7), (2, 7), (1, 4))
+        expected = spectral_cube.data[2:7, 1:4].mean(axis=(0, 1), dtype=np.float64)
+        np.testing.assert_allclose(integral.mean(rectangle_mask), expected)
+
+    def test_variance(self, spectral_cube):
+        integral = IntegralCube(spectral_cube, squares=True)
+        rectangle_mask = RectangleMask((9, 7), (0, 9), (3, 7))
+        expected = spectral_cube.data[:, 3:].astype(np.float64).var(axis=(0, 1))
+        np.testing.assert_allclose(integral.variance(rectangle_mask), expected, atol=1e-12)
+
+    def test_variance_without_squares(self, spectral_cube):
+        integral = IntegralCube(spectral_cube)
+        with pytest.raises(ValueError):
+            integral.variance(RectangleMask((9, 7), (0, 2), (0, 2)))
+
+    def test_means_clipped_and_empty(self, spectral_cube):
+        integral = IntegralCube(spectral_cube)
+        means = integral.means([[-2, 3], [4, 4]], [[5, 20], [0, 7]])
+        np.testing.assert_allclose(means[0], spectral_cube.data[:3, 5:].mean(axis=(0, 1), dtype=np.float64))
+        assert np.all(np.isnan(means[1]))
+        np.testing.assert_array_equal(integral.count([[-2, 3], [4, 4]], [[5, 20], [0, 7]]), [6, 0])
+
+    def test_mean_fail_shape(self, spectral_cube):
+        integral = IntegralCube(spectral_cube)
+        with pytest.raises(ArrayDimensionError):
+            integral.mean(RectangleMask((5, 5), (0, 2), (0, 2)))
+
+    def test_roi_spectra(self, spectral_cube):
+        integral = IntegralCube(spectral_cube, squares=True)
+        rectangle_masks = [RectangleMask((9, 7), (0, 2), (0, 2)), RectangleMask((9, 7), (3, 9), (2, 5))]
+        means, variances = integral.roi_spectra(rectangle_masks, variance=True)
+        assert means.data.shape == (2, 4)
+        np.testing.assert_array_equal(means.domain, spectral_cube.domain)
+        for i, rectangle_mask in enumerate(rectangle_masks):
+            pixels = rectangle_mask.apply(spectral_cube.data).astype(np.float64)
+            np.testing.assert_allclose(means.data[i], pixels.mean(axis=(0, 1)))
+            np.testing.assert_allclose(variances.data[i], pixels.var(axis=(0, 1)), atol=1e-12)
+
+
+class TestSpectralCubeIntegral:
+    def test_integral_cached(self, spectral_cube):
+        integral = spectral_cube.integral()
+        assert spectral_cube.integral() is integral
+        assert integral.square_table is None
+        integral = spectral_cube.integral(squares=True)
+        assert integral.square_table is not None
+        assert spectral_cube.integral() is integral
+
+    def test_integral_reset_on_update(self, spectral_cube):
+        integral = spectral_cube.integral()
+        spectral_cube.update_data(spectral_cube.data[:4])
+        assert spectral_cube.integral() is not integral
+        assert spectral_cube.integral().table.shape == (5, 8, 4)
+
+    def test_rectangle_mask_spectra(self, spectral_cube):
+        rectangle_mask = RectangleMask((9, 7), (1, 8), (2, 6))
+        pixels = rectangle_mask.apply(spectral_cube.data).astype(np.float64)
+        np.testing.assert_allclose(rectangle_mask.mean_spectrum(spectral_cube), pixels.mean(axis=(0, 1)))
+        np.testing.assert_allclose(
+            rectangle_mask.variance_spectrum(spectral_cube), pixels.var(axis=(0, 1)), atol=1e-12
+        )
@@ -0,0 +1,149 @@
+from unittest import mock
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+
+from hyperpy.exceptions import ArrayDimensionError
+from hyperpy.loading.utils import read_specim, write_raw
+from hyperpy.preprocessing import (
+    DomainSelection,
+    MeanCentering,
+    Normalization,
+    Positive,
+    StandardNormalVariate,
+    spectral_process,
+)
+from hyperpy.spectral import LazySpectralCube, RectangleMask, SpectralCube
+from hyperpy.spectral.lazy import CubeWindow, compose_range
+
+
+@pytest.fixture
+def cube():
+    data = np.random.RandomState(0).rand(8, 6, 5) + 1
+    return SpectralCube(data=data, domain=np.arange(5) * 10.0 + 400)
+
+
+class TestComposeRange:
+    def test_compose_range(self):
+        assert compose_range((2, 8), (1, 3)) == (3, 5)
+        assert compose_range((2, 8), (4, 20)) == (6, 8)
+
+
+class TestCubeWindow:
+    @pytest.mark.parametrize("bands", [np.array([1, 2, 3]), np.array([3, 0, 2])])
+    def test_cube_window(self, cube, bands):
+        window = CubeWindow(cube.data, (1, 5), (2, 6), bands)
+        expected = cube.data[1:5, 2:6][:, :, bands]
+
+        assert window.shape == expected.shape
+        np.testing.assert_array_equal(window[1:3, :], expected[1:3, :])
+        np.testing.assert_array_equal(np.asarray(window), expected)
+
+
+class TestLazySpectralCube:
+    def test_crop_bands(self, cube):
+        lazy = (
+            cube.lazy()
+            .crop(samples=(1, 7))
+            .select_bands([0, 2, 4])
+            .crop(RectangleMask((6, 6), (1, 4), (2, 5)))
+            .select_bands((1, 3))
+        )
+        samples, lines, bands, transformers = lazy.plan()
+
+        assert (samples, lines) == ((2, 5), (2, 5))
+        np.testing.assert_array_equal(bands, [2, 4])
+        assert transformers == []
+        assert lazy.shape == (3, 3, 2)
+        result = lazy.compute()
+        np.testing.assert_array_equal(result.data, cube.data[2:5, 2:5][:, :, [2, 4]])
+        np.testing.assert_array_equal(result.domain, [420.0, 440.0])
+
+    def test_crop_wrong_shape(self, cube):
+        with pytest.raises(ArrayDimensionError):
+            cube.lazy().crop(RectangleMask((2, 2), (0, 1), (0, 1)))
+
+    @pytest.mark.parametrize("tile_shape", [None, (3, 2)])
+    def test_transform(self, cube, tile_shape):
+        transformers = (MeanCentering(), StandardNormalVariate(), Normalization())
+        lazy = cube.lazy().select_bands([0, 1, 3]).transform(*transformers).crop(samples=(2, 6))
+        expected = spectral_process(
+            SpectralCube(cube.data[2:6][:, :, [0, 1, 3]], cube.domain[[0, 1, 3]]), transformers
+        )
+
+        result = lazy.compute(tile_shape=tile_shape)
+        np.testing.assert_allclose(result.data, expected.data)
+        np.testing.assert_array_equal(result.domain, expected.domain)
+
+    def test_transform_not_row_wise(self, cube):
+        data = cube.data - 1.5
+        data[0, 0, 0] = -5
+        expected = spectral_process(SpectralCube(data, cube.domain), (Positive(),)).data[2:6]
+        cropped = spectral_process(SpectralCube(data[2:6], cube.domain), (Positive(),)).data
+        # Moving the crop before the transformer would change the result
+        assert not np.allclose(cropped, expected)
+
+        with pytest.raises(ValueError, match="Positive"):
+            SpectralCube(data, cube.domain).lazy().transform(Positive()).crop(samples=(2, 6))
+
+    def test_bands_after_transform(self, cube):
+        lazy = cube.lazy().transform(MeanCentering()).select_bands([1, 2])
+        _, _, bands, transformers = lazy.plan()
+
+        np.testing.assert_array_equal(bands, np.arange(5))
+        assert isinstance(transformers[-1], DomainSelection)
+        np.testing.assert_array_equal(lazy.domain, [410.0, 420.0])
+        expected = cube.data - cube.data.mean(axis=2, keepdims=True)
+        np.testing.assert_allclose(lazy.compute().data, expected[:, :, 1:3])
+
+    def test_predict(self, cube):
+        model = KMeans(n_clusters=2, n_init=1, random_state=0).fit(cube.get_matrix())
+        lazy = cube.lazy().crop(lines=(1, 4)).predict(model, "k_means_class")
+
+        result = lazy.compute(tile_shape=(4, 4))
+        assert result.shape == (8, 3, 1)
+        np.testing.assert_array_equal(result.domain, ["k_means_class"])
+        expected = model.predict(cube.data[:, 1:4].reshape((-1, 5))).reshape((8, 3))
+        np.testing.assert_array_equal(result.data[:, :, 0], expected)
+
+    def test_from_specim(self, tmp_path):
+        raw = np.arange(6 * 4 * 3, dtype=np.uint16).reshape((6, 4, 3)) + 20
+        file_name = str(tmp_path / "data.raw")
+        write_raw(file_name, raw, wavelength=[400.0, 500.0, 600.0])
+        write_raw(str(tmp_path / "WHITEREF_data.raw"), np.full((6, 2, 3), 200, dtype=np.uint16))
+        write_raw(str(tmp_path / "DARKREF_data.raw"), np.full((6, 2, 3), 10, dtype=np.uint16))
+        expected, _ = read_specim(file_name)
+
+        with mock.patch("hyperpy.read_specim", wraps=read_specim) as mocked_read_specim:
+            lazy = LazySpectralCube.from_specim(file_name)
+            result = lazy.crop(samples=(1, 4)).select_bands([1, 2]).compute()
+
+        mocked_read_specim.assert_called_once_with(
+            file_name, samples=(1, 4), lines=(0, 4), bands=(1, 3)
+        )
+        np.testing.assert_allclose(result.data, expected[1:4, :, 1:3])
+        np.testing.assert_array_equal(result.domain, [500.0, 600.0])
+
+    def test_from_specim_tiles(self, tmp_path):
+        raw = np.arange(6 * 4 * 3, dtype=np.uint16).reshape((6, 4, 3)) + 20
+        file_name = str(tmp_path / "data.raw")
+        write_raw(file_name, raw, wavelength=[400.0, 500.0, 600.0])
+        write_raw(str(tmp_path / "WHITEREF_data.raw"), np.full((6, 2, 3), 200, dtype=np.uint16))
+        write_raw(str(tmp_path / "DARKREF_data.raw"), np.full((6, 2, 3), 10, dtype=np.uint16))
+        expected, _ = read_specim(file_name)
+
+        with mock.patch("hyperpy.read_specim", wraps=read_specim) as mocked_read_specim:
+            lazy = LazySpectralCube.from_specim(file_name).crop(samples=(1, 6))
+            result = lazy.transform(StandardNormalVariate()).compute(tile_shape=(2, 3))
+            out = np.empty((5, 4, 3), dtype=np.float32)
+            copied = lazy.compute(tile_shape=(3, 4), out=out)
+
+        # The loader reads one tile at a time
+        windows = [call.kwargs["samples"] + call.kwargs["lines"] for call in mocked_read_specim.call_args_list]
+        assert windows[:6] == [(1, 3, 0, 3), (1, 3, 3, 4), (3, 5, 0, 3), (3, 5, 3, 4), (5, 6, 0, 3), (5, 6, 3, 4)]
+        assert windows[6:] == [(1, 4, 0, 4), (4, 6, 0, 4)]
+        snv = StandardNormalVariate().transform(expected[1:].reshape((-1, 3))).reshape((5, 4, 3))
+        np.testing.assert_allclose(result.data, snv, rtol=1e-5, atol=1e-5)
+        assert copied.data is out
+        np.testing.assert_allclose(out, expected[1:])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from hyperpy import kmeans
+from hyperpy.spectral import SpectralCube, SpectralMat
+from hyperpy.spectral.objects import extract_objects, object_statistics
+
+
+@pytest.fixture
+def cube():
+    data = np.random.RandomState(0).rand(9, 8, 4).astype(np.float32)
+    return SpectralCube(data=data, domain=np.arange(4) * 10.0)
+
+
+@pytest.fixture
+def labels():
+    labels = np.zeros((9, 8), dtype=np.int32)
+    labels[0:3, 0:3] = 1
+    labels[5:9, 1:3] = 2
+    labels[4, 6] = 4
+    return labels
+
+
+class TestObjectStatistics:
+    def test_object_statistics(self, cube, labels):
+        objects = object_statistics(cube, labels)
+
+        assert len(objects) == 4
+        np.testing.assert_array_equal(objects.count, [9, 8, 0, 1])
+        assert isinstance(objects.mean, SpectralMat)
+        for label in [1, 2, 4]:
+            pixels = cube.data[labels == label].astype(np.float64)
+            np.testing.assert_allclose(objects.mean.data[label - 1], pixels.mean(axis=0))
+            np.testing.assert_allclose(objects.std.data[label - 1], pixels.std(axis=0))
+            np.testing.assert_allclose(
+                objects.median.data[label - 1], np.median(pixels, axis=0)
+            )
+        # Label 3 has no pixel
+        assert np.isnan(objects.mean.data[2]).all()
+        assert np.isnan(objects.median.data[2]).all()
+
+    def test_object_statistics_without_median(self, cube, labels):
+        objects = object_statistics(cube, labels, median=False)
+
+        assert objects.median is None
+        np.testing.assert_allclose(
+            objects.mean.data[1], cube.data[labels == 2].astype(np.float64).mean(axis=0)
+        )
+
+    def test_object_statistics_masked(self, cube, labels):
+        masked = cube.compress(labels > 0)
+        expected = object_statistics(cube, labels)
+        objects = object_statistics(masked, labels)
+
+        np.testing.assert_array_equal(objects.count, expected.count)
+        np.testing.assert_allclose(objects.median.data, expected.median.data)
+
+    def test_object_statistics_wrong_shape(self, cube):
+        with pytest.raises(ValueError):
+            object_statistics(cube, np.zeros((2, 2), dtype=int))
+
+
+class TestExtractObjects:
+    def test_extract_objects(self, cube, labels):
+        objects = cube.objects(labels > 0)
+
+        assert len(objects) == 3
+        np.testing.assert_array_equal(objects.count, [9, 1, 8])
+
+    def test_extract_objects_masked(self, cube, labels):
+        objects = extract_objects(cube.compress(labels > 0))
+        np.testing.assert_array_equal(objects.count, [9, 1, 8])
+        with pytest.raises(ValueError):
+            extract_objects(cube)
+
+    def test_kmeans_objects(self, cube, labels):
+        objects = cube.objects(labels > 0)
+        _, classes = kmeans(objects.mean, n_clusters=2, n_init=1, random_state=0)
+
+        class_map = objects.to_map(classes.data, fill_value=-1)
+        assert class_map.shape == (9, 8)
+        assert (class_map[labels == 0] == -1).all()
+        np.testing.assert_array_equal(class_map[0:3, 0:3], classes.data[0, 0])
+        with pytest.raises(ValueError):
+            objects.to_map(np.zeros(2))
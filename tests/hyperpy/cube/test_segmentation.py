@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from hyperpy.spectral import SpectralCube, get_max_rectangle_mask
+from hyperpy.spectral.segmentation import (
+    clean_mask,
+    label_objects,
+    nearest_band,
+    read_bands,
+    segment,
+    spectral_index,
+)
+
+
+class RecordingArray:
+    """
+    Array recording the indexes it is read with.
+    """
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self.indexes = []
+
+    def __getitem__(self, index):
+        self.indexes.append(index)
+        return self.array[index]
+
+
+@pytest.fixture
+def cube():
+    """
+    Background reflecting band 0, two objects reflecting band 2.
+    """
+    data = np.zeros((10, 12, 3), dtype=np.float32)
+    data[:, :, 0] = 0.8
+    data[:, :, 2] = 0.1
+    for x, y in [(slice(1, 4), slice(1, 5)), (slice(6, 9), slice(7, 11))]:
+        data[x, y, 0] = 0.1
+        data[x, y, 2] = 0.9
+    # Noisy isolated pixel
+    data[8, 1, 2] = 0.9
+    return SpectralCube(data=data, domain=np.array([670.0, 720.0, 800.0]))
+
+
+class TestSpectralIndex:
+    def test_nearest_band(self, cube):
+        assert nearest_band(cube.domain, 790) == 2
+
+    def test_read_bands(self, cube):
+        data = RecordingArray(cube.data)
+        values = read_bands(SpectralCube(data=data, domain=cube.domain), [2, 0])
+
+        assert len(data.indexes) == 1
+        np.testing.assert_array_equal(data.indexes[0][2], [0, 2])
+        np.testing.assert_array_equal(values, cube.data[:, :, [2, 0]])
+
+    def test_spectral_index(self, cube):
+        ndi = spectral_index(cube, [2, 0])
+        ratio = spectral_index(cube, [2, 0], "ratio")
+        mean = spectral_index(cube, [0, 2], "mean")
+
+        assert ndi.dtype == np.float32
+        np.testing.assert_allclose(ndi[2, 2], 0.8 / 1.0)
+        np.testing.assert_allclose(ratio[2, 2], 9.0)
+        np.testing.assert_allclose(mean[0, 0], 0.45)
+
+    def test_spectral_index_undefined(self, cube):
+        assert np.isnan(spectral_index(cube, [1, 1])).all()
+
+    def test_spectral_index_invalid(self, cube):
+        with pytest.raises(ValueError):
+            spectral_index(cube, [2, 0], "other")
+        with pytest.raises(ValueError):
+            spectral_index(cube, [2], "ratio")
+
+
+class TestCleanMask:
+    def test_clean_mask(self):
+        mask = np.zeros((10, 10), dtype=bool)
+        mask[1:8, 1:8] = True
+        mask[4, 4] = False
+        mask[9, 9] = True
+
+        cleaned = clean_mask(mask)
+        expected = np.zeros((10, 10), dtype=bool)
+        expected[1:8, 1:8] = True
+        np.testing.assert_array_equal(cleaned, expected)
+
+    def test_clean_mask_min_size(self):
+        mask = np.zeros((8, 8), dtype=bool)
+        mask[0:2, 0:2] = True
+        mask[4:8, 4:8] = True
+
+        cleaned = clean_mask(mask, opening=0, closing=0, min_size=5)
+        np.testing.assert_array_equal(cleaned[0:2, 0:2], False)
+        np.testing.assert_array_equal(cleaned[4:8, 4:8], True)
+
+
+class TestSegment:
+    def test_label_objects(self):
+        mask = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 0]], dtype=bool)
+        assert label_objects(mask)[1] == 2
+        assert label_objects(mask, connectivity=2)[1] == 1
+
+    def test_segment(self, cube):
+        mask, labels = segment(cube, [2, 0], low=0.5)
+
+        assert mask.sum() == 3 * 4 * 2
+        assert labels.max() == 2
+        assert not mask[8, 1]
+        np.testing.assert_array_equal(labels[1:4, 1:5], labels[1, 1])
+        rectangle = get_max_rectangle_mask(labels == labels[7, 8])
+        assert (rectangle.x_mask, rectangle.y_mask) == ((6, 9), (7, 11))
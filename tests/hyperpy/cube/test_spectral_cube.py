@@ -5,7 +5,8 @@ import pytest
 from mock import Mock
 
 from hyperpy import exceptions
-from hyperpy.spectral.classes import SpectralCube, as_cube
+from hyperpy.loading.utils import read_raw, get_wavelength
+from hyperpy.spectral.classes import SpectralCube, MaskedSpectralCube, as_cube
 
 
 class TestSpectralCube:
@@ -49,6 +50,21 @@ class TestSpectralCube:
 
         np.allclose(expected_mat, test_mat)
 
+    def test_astype(self):
+        cube = SpectralCube(np.zeros((2, 2, 3), dtype=np.float32), np.zeros((3,)))
+        assert cube.dtype == np.float32
+        assert cube.astype(np.float64).dtype == np.float64
+
+    def test_to_envi(self, tmp_path):
+        cube = SpectralCube(
+            np.random.rand(3, 4, 2).astype(np.float32), np.array([400.0, 410.0])
+        )
+        file_name = str(tmp_path / "cube.raw")
+        cube.to_envi(file_name, interleave="bsq")
+
+        np.testing.assert_array_equal(read_raw(file_name), cube.data)
+        np.testing.assert_array_equal(get_wavelength(file_name), cube.domain)
+
     @mock.patch("hyperpy.spectral.classes.read_mat_file")
     def test_from_mat_file_without_domain(self, mocked_read_mat):
         test_cube = np.array(
@@ -117,17 +133,75 @@ class TestSpectralCube:
         np.allclose(spectral_cube.data, test_cube)
         np.allclose(spectral_cube.domain, test_domain)
 
+    @mock.patch("hyperpy.spectral.classes.read_specim")
+    def test_iter_specim(self, mocked_read_specim):
+        mocked_read_specim.side_effect = lambda file_name, **kwargs: (
+            np.full((2, 2, 2), int(file_name)),
+            np.array([10, 12]),
+        )
 
-class TestAsCube:
-    @mock.patch("hyperpy.spectral.classes.SpectralCube.__new__")
-    def test_as_cube(self, mocked_spectral_cube_new):
-        data = [[1, 2], [3, 4]]
-        domain = [1]
-        spectral_cube = Mock(spec=SpectralCube, shape=(4, 1))
-        as_cube(data, spectral_cube, domain=domain)
+        cubes = list(SpectralCube.iter_specim(["1", "2", "3"], n_jobs=2))
 
-        reshaped_array = np.array([[1], [2], [2], [3]])
+        assert [cube.data[0, 0, 0] for cube in cubes] == [1, 2, 3]
+        assert cubes[1].metadata["source"] == "2"
 
-        assert mocked_spectral_cube_new.called_once_with(
-            data=reshaped_array, domain=[1]
-        )
+
+class TestAsCube:
+    def test_as_cube(self):
+        data = np.array([[1, 2], [3, 4], [5, 6], [7, 8]])
+        domain = np.array([1, 2])
+        spectral_cube = SpectralCube(np.zeros((2, 2, 3)), np.zeros((3,)))
+        cube = as_cube(data, spectral_cube, domain=domain)
+
+        reshaped_array = np.array([[[1, 2], [3, 4]], [[5, 6], [7, 8]]])
+
+        np.testing.assert_array_equal(cube.data, reshaped_array)
+        np.testing.assert_array_equal(cube.domain, domain)
+
+
+class TestMaskedSpectralCube:
+    data = np.arange(3 * 4 * 2, dtype=np.float32).reshape((3, 4, 2))
+    mask = np.array(
+        [
+            [True, False, False, True],
+            [False, False, False, False],
+            [False, True, True, False],
+        ]
+    )
+
+    def test_compress(self):
+        cube = SpectralCube(self.data, np.array([1, 2]))
+        masked = cube.compress(self.mask, chunk_size=2)
+
+        assert masked.shape == (3, 4, 2)
+        assert masked.dtype == np.float32
+        np.testing.assert_array_equal(masked.get_matrix(), self.data[self.mask])
+        np.testing.assert_array_equal(masked.pixel_index, [0, 3, 9, 10])
+
+    def test_compress_wrong_mask(self):
+        cube = SpectralCube(self.data, np.array([1, 2]))
+        with pytest.raises(exceptions.ArrayDimensionError):
+            cube.compress(np.ones((2, 2), dtype=bool))
+
+    def test_check(self):
+        with pytest.raises(exceptions.DataDimensionError):
+            MaskedSpectralCube(self.data, np.array([1, 2]), self.mask)
+        with pytest.raises(exceptions.ArrayDimensionError):
+            MaskedSpectralCube(np.zeros((3, 2)), np.array([1, 2]), self.mask)
+
+    def test_to_cube(self):
+        masked = SpectralCube(self.data, np.array([1, 2])).compress(self.mask)
+        cube = masked.to_cube()
+
+        np.testing.assert_array_equal(cube.data[self.mask], self.data[self.mask])
+        assert np.isnan(cube.data[~self.mask]).all()
+        np.testing.assert_array_equal(masked.to_cube(fill_value=0).data[~self.mask], 0)
+
+    def test_as_cube(self):
+        masked = SpectralCube(self.data, np.array([1, 2])).compress(self.mask)
+        classes = as_cube(np.array([0, 1, 1, 0]), masked, np.array(["class"]))
+
+        assert isinstance(classes, MaskedSpectralCube)
+        full = classes.to_cube(fill_value=-1).data[:, :, 0]
+        np.testing.assert_array_equal(full[self.mask], [0, 1, 1, 0])
+        np.testing.assert_array_equal(full[~self.mask], -1)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from hyperpy.loading.batch import iter_load
+
+
+class Loader:
+    """
+    Fake loader recording the number of files loaded at the same time.
+    """
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.loaded = []
+
+    def __call__(self, file_name, suffix=""):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+            self.loaded.append(file_name)
+        return file_name + suffix
+
+
+class TestIterLoad:
+    def test_iter_load_order(self):
+        loader = Loader()
+        file_names = [f"{index}.raw" for index in range(10)]
+        results = list(iter_load(loader, file_names, n_jobs=3, suffix="!"))
+
+        assert results == [file_name + "!" for file_name in file_names]
+        assert 1 < loader.max_running <= 3
+
+    def test_iter_load_prefetch(self):
+        loader = Loader(delay=0)
+        iterator = iter_load(loader, (f"{index}.raw" for index in range(10)), n_jobs=4, prefetch=2)
+        assert next(iterator) == "0.raw"
+        time.sleep(0.05)
+        # The first file and at most 2 files ahead have been loaded
+        assert len(loader.loaded) <= 3
+        iterator.close()
+        assert len(loader.loaded) <= 3
+
+    def test_iter_load_close_cancel(self):
+        loader = Loader(delay=0.05)
+        iterator = iter_load(loader, [f"{index}.raw" for index in range(10)], n_jobs=1, prefetch=4)
+        assert next(iterator) == "0.raw"
+        iterator.close()
+        # The file being loaded is finished, the queued ones are cancelled
+        assert loader.loaded == ["0.raw", "1.raw"]
+
+    def test_iter_load_error(self):
+        def loader(file_name):
+            if file_name == "bad.raw":
+                raise IOError(file_name)
+            return file_name
+
+        iterator = iter_load(loader, ["good.raw", "bad.raw"], n_jobs=2)
+        assert next(iterator) == "good.raw"
+        with pytest.raises(IOError):
+            next(iterator)
+
+    def test_iter_load_invalid(self):
+        with pytest.raises(ValueError):
+            list(iter_load(Loader(), ["a.raw"], n_jobs=0))
@@ -0,0 +1,113 @@
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from hyperpy.loading.cache import ReflectanceCache, file_fingerprint
+from hyperpy.loading.utils import read_specim, read_hyspex, write_raw
+
+
+def write_specim(directory, raw, white, dark):
+    """
+    Write a Specim acquisition with its references.
+    """
+    file_name = str(directory / "data.raw")
+    write_raw(file_name, raw, dtype=np.uint16, wavelength=np.arange(raw.shape[2]) + 400.0)
+    write_raw(str(directory / "WHITEREF_data.raw"), white, dtype=np.uint16)
+    write_raw(str(directory / "DARKREF_data.raw"), dark, dtype=np.uint16)
+    return file_name
+
+
+@pytest.fixture
+def specim_file(tmp_path):
+    raw = np.arange(4 * 5 * 3, dtype=np.uint16).reshape((4, 5, 3)) + 10
+    white = np.full((4, 2, 3), 100, dtype=np.uint16)
+    dark = np.full((4, 2, 3), 10, dtype=np.uint16)
+    return write_specim(tmp_path, raw, white, dark)
+
+
+class TestFileFingerprint:
+    def test_file_fingerprint(self, tmp_path):
+        file_name = tmp_path / "file"
+        file_name.write_bytes(b"a" * 1000)
+        fingerprint = file_fingerprint(str(file_name), block_size=100)
+
+        assert fingerprint == file_fingerprint(str(file_name), block_size=100)
+        file_name.write_bytes(b"a" * 999 + b"b")
+        assert fingerprint[3] != file_fingerprint(str(file_name), block_size=100)[3]
+
+
+class TestReflectanceCache:
+    def test_read_specim_cache(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        expected, expected_wavelength = read_specim(specim_file)
+
+        reflectance, wavelength = read_specim(specim_file, cache=cache)
+        assert isinstance(reflectance, np.memmap)
+        assert not reflectance.flags.writeable
+        np.testing.assert_allclose(reflectance, expected)
+        np.testing.assert_array_equal(wavelength, expected_wavelength)
+        assert cache.size > 0
+
+        with mock.patch("hyperpy.loading.utils.stream_reflectance") as mocked_stream:
+            cached, _ = read_specim(specim_file, cache=cache)
+            mocked_stream.assert_not_called()
+        np.testing.assert_allclose(cached, expected)
+
+    def test_read_specim_cache_parameters(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        read_specim(specim_file, cache=cache)
+        reflectance, wavelength = read_specim(specim_file, cache=cache, bands=[2, 0])
+
+        assert reflectance.shape == (4, 5, 2)
+        np.testing.assert_array_equal(wavelength, [402.0, 400.0])
+        assert len(os.listdir(cache.cache_dir)) == 2
+
+    def test_read_specim_cache_modified_file(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        read_specim(specim_file, cache=cache)
+        write_specim(
+            tmp_path,
+            np.zeros((4, 5, 3)),
+            np.full((4, 2, 3), 100),
+            np.full((4, 2, 3), 10),
+        )
+        reflectance, _ = read_specim(specim_file, cache=cache)
+
+        np.testing.assert_allclose(reflectance, -10 / 90)
+
+    def test_read_hyspex_cache(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        expected, _ = read_hyspex(specim_file, end_white_index=2)
+        reflectance, _ = read_hyspex(specim_file, end_white_index=2, cache=cache)
+
+        np.testing.assert_allclose(reflectance, expected)
+        assert cache.load(next(iter(os.listdir(cache.cache_dir)))[:-4]) is not None
+
+    def test_evict(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"), max_bytes=1)
+        read_specim(specim_file, cache=cache, bands=(0, 1))
+        read_specim(specim_file, cache=cache, bands=(1, 2))
+
+        # Only the last cube is kept
+        assert len(os.listdir(cache.cache_dir)) == 1
+        cache.clear()
+        assert cache.size == 0
+
+    def test_calibration_error_removes_temporary(self, tmp_path, specim_file):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        with mock.patch(
+            "hyperpy.loading.utils.stream_reflectance", side_effect=RuntimeError("calibration")
+        ):
+            with pytest.raises(RuntimeError):
+                read_specim(specim_file, cache=cache)
+        assert os.listdir(cache.cache_dir) == []
+
+    def test_clear_temporary(self, tmp_path):
+        cache = ReflectanceCache(str(tmp_path / "cache"))
+        cube = cache.create("key", (2, 2, 2), np.float32)
+        cube.flush()
+        assert len(os.listdir(cache.cache_dir)) == 1
+        cache.clear()
+        assert os.listdir(cache.cache_dir) == []
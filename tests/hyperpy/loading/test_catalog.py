@@ -0,0 +1,111 @@
+import os
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from hyperpy.loading.catalog import AcquisitionCatalog, acquisition_timestamp
+from hyperpy.loading.envi_header import write_envi_header
+
+
+def write_acquisition(directory, name, bands, references=True, date="17-10-2026"):
+    """
+    Write an empty Specim acquisition with its references.
+    """
+    os.makedirs(directory, exist_ok=True)
+    prefixes = ["", "WHITEREF_", "DARKREF_"] if references else [""]
+    for prefix in prefixes:
+        header = {
+            "samples": 2,
+            "lines": 3,
+            "bands": bands,
+            "data type": 12,
+            "interleave": "bil",
+            "acquisition date": f"DATE(dd-mm-yyyy): {date}",
+            "start time": "UTC TIME: 10:11:12",
+            "wavelength": ", ".join(str(400 + 10 * band) for band in range(bands)),
+            "_comments": "",
+        }
+        write_envi_header(os.path.join(directory, f"{prefix}{name}.hdr"), header)
+        with open(os.path.join(directory, f"{prefix}{name}.raw"), "wb") as f:
+            f.write(b"\0" * 2 * 3 * bands * 2)
+    return os.path.join(directory, f"{name}.raw")
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with AcquisitionCatalog(str(tmp_path / "index.sqlite")) as catalog:
+        yield catalog
+
+
+class TestAcquisitionCatalog:
+    def test_scan_query(self, tmp_path, catalog):
+        root = tmp_path / "data"
+        large = write_acquisition(str(root / "a"), "large", 224)
+        write_acquisition(str(root / "a" / "b"), "small", 10, date="01-01-2020")
+        write_acquisition(str(root), "alone", 230, references=False)
+
+        assert catalog.scan(str(root)) == 3
+        assert len(catalog) == 3
+
+        acquisitions = catalog.query(min_bands=224, with_references=True)
+        assert [acquisition.path for acquisition in acquisitions] == [large]
+        acquisition = acquisitions[0]
+        assert acquisition.shape == (2, 3, 224)
+        assert acquisition.dtype == np.uint16
+        assert acquisition.white_ref_path.endswith("WHITEREF_large.raw")
+        assert acquisition.acquisition_time == datetime(2026, 10, 17, 10, 11, 12, tzinfo=timezone.utc)
+        np.testing.assert_array_equal(acquisition.wavelength[:2], np.array([400.0, 410.0]))
+
+        assert len(catalog.query(since=datetime(2026, 10, 12))) == 2
+        assert len(catalog.query(until=datetime(2026, 10, 12))) == 1
+
+    def test_scan_incremental(self, tmp_path, catalog):
+        root = tmp_path / "data"
+        first = write_acquisition(str(root), "first", 5)
+        second = write_acquisition(str(root), "second", 5)
+        assert catalog.scan(str(root)) == 2
+
+        # Nothing changed, no header is read
+        with mock.patch("hyperpy.loading.catalog.read_envi_header") as mocked_read:
+            assert catalog.scan(str(root)) == 0
+            mocked_read.assert_not_called()
+
+        # Modified acquisition is re-indexed and removed one is dropped
+        write_acquisition(str(root), "first", 7)
+        stat = os.stat(first)
+        os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        os.remove(second)
+        assert catalog.scan(str(root)) == 1
+        assert [acquisition.shape[2] for acquisition in catalog.query()] == [7]
+
+    def test_scan_broken_header(self, tmp_path, catalog):
+        root = tmp_path / "data"
+        good = write_acquisition(str(root), "good", 5)
+        broken = write_acquisition(str(root), "broken", 5)
+        with open(os.path.join(str(root), "broken.hdr"), "w") as f:
+            f.write("ENVI\nsamples = 2\n")
+
+        assert catalog.scan(str(root)) == 1
+        assert [acquisition.path for acquisition in catalog.query()] == [good]
+        assert [path for path, _ in catalog.failures] == [broken]
+
+    def test_persistent_index(self, tmp_path):
+        root = tmp_path / "data"
+        write_acquisition(str(root), "first", 5)
+        with AcquisitionCatalog(str(tmp_path / "index.sqlite")) as catalog:
+            catalog.scan(str(root))
+        with AcquisitionCatalog(str(tmp_path / "index.sqlite")) as catalog:
+            assert len(catalog.query(min_bands=5)) == 1
+
+
+class TestAcquisitionTimestamp:
+    def test_envi_acquisition_time(self):
+        timestamp = acquisition_timestamp({"acquisition time": "2026-10-17T10:11:12Z"}, "")
+        assert timestamp == datetime(2026, 10, 17, 10, 11, 12, tzinfo=timezone.utc).timestamp()
+
+    @mock.patch("hyperpy.loading.catalog.os.stat")
+    def test_fallback_mtime(self, mocked_stat):
+        mocked_stat.return_value = mock.Mock(st_mtime=42.0)
+        assert acquisition_timestamp({}, "file.raw") == 42.0
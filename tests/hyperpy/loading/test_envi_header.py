@@ -1,8 +1,31 @@
+import os
 from unittest import mock
 
-from hyperpy.loading.envi_header import find_hdr_file
+import numpy as np
+
+from hyperpy.loading.envi_header import (
+    find_hdr_file,
+    read_hdr_file,
+    read_envi_header,
+    parse_numeric_list,
+    get_envi_data_type,
+)
 import pytest
 
+HEADER = """ENVI
+; a comment
+samples = 4
+lines = 3
+bands = 2
+header offset = 0
+data type = 4
+interleave = BSQ
+byte order = 1
+wavelength = {
+ 400.5, 500,
+ 600.25}
+"""
+
 
 class TestFindHdrFile:
     @mock.patch("hyperpy.loading.envi_header.os.path.isfile")
@@ -24,3 +47,71 @@ class TestFindHdrFile:
         raw_file_name = "/dir1/dir2/file"
         hdr_file_name = find_hdr_file(raw_file_name)
         assert hdr_file_name == "/dir1/dir2/file.hdr"
+
+
+class TestReadHdrFile:
+    def test_read_hdr_file(self, tmp_path):
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(HEADER)
+        output = read_hdr_file(str(hdr_file))
+        assert output["samples"] == "4"
+        assert output["interleave"] == "BSQ"
+        assert output["wavelength"] == "400.5, 500,600.25"
+        assert output["_comments"] == "; a comment\n"
+
+
+class TestReadEnviHeader:
+    def test_read_envi_header(self, tmp_path):
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(HEADER)
+        header = read_envi_header(str(hdr_file))
+        assert header.shape == (4, 3, 2)
+        assert header.header_offset == 0
+        assert header.dtype == np.dtype(">f4")
+        assert header.interleave == "bsq"
+        np.testing.assert_array_equal(header.wavelength, np.array([400.5, 500, 600.25]))
+
+    def test_read_envi_header_fields_read_only(self, tmp_path):
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(HEADER)
+        header = read_envi_header(str(hdr_file))
+        assert header.fields["samples"] == "4"
+        with pytest.raises(TypeError):
+            header.fields["samples"] = "5"
+        assert read_envi_header(str(hdr_file)).fields["samples"] == "4"
+
+    def test_read_envi_header_cache(self, tmp_path):
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(HEADER)
+        header = read_envi_header(str(hdr_file))
+        with mock.patch("hyperpy.loading.envi_header.read_hdr_file") as mocked_read:
+            assert read_envi_header(str(hdr_file)) is header
+            mocked_read.assert_not_called()
+        # A rewritten header is parsed again
+        hdr_file.write_text(HEADER.replace("bands = 2", "bands = 3"))
+        os.utime(hdr_file, ns=(0, os.stat(hdr_file).st_mtime_ns + 1))
+        assert read_envi_header(str(hdr_file)).bands == 3
+
+    def test_read_envi_header_unknown_interleave(self, tmp_path):
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(HEADER.replace("BSQ", "xyz"))
+        with pytest.raises(ValueError):
+            read_envi_header(str(hdr_file))
+
+
+class TestParseNumericList:
+    def test_parse_numeric_list(self):
+        np.testing.assert_array_equal(parse_numeric_list("1, 2.5,3e2,"), np.array([1, 2.5, 300]))
+        np.testing.assert_array_equal(parse_numeric_list("\n 1,\n 2 ,\n"), np.array([1, 2]))
+        assert parse_numeric_list(" ").shape == (0,)
+
+
+class TestGetEnviDataType:
+    def test_get_envi_data_type(self):
+        assert get_envi_data_type(np.dtype("<f4")) == ("4", "0")
+        assert get_envi_data_type(np.dtype(">u2")) == ("12", "1")
+        assert get_envi_data_type(np.uint8) == ("1", "0")
+
+    def test_get_envi_data_type_invalid(self):
+        with pytest.raises(ValueError):
+            get_envi_data_type(np.float16)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from hyperpy.loading.live import LiveReader
+from hyperpy.loading.utils import read_specim, write_raw
+
+
+def write_growing(directory, raw, interleave="bil"):
+    """
+    Write a Specim acquisition with its references, and keep the full raw file content to grow it.
+    """
+    file_name = str(directory / "data.raw")
+    white = np.full(raw.shape[:1] + (2,) + raw.shape[2:], 100, dtype=np.uint16)
+    dark = np.full(raw.shape[:1] + (2,) + raw.shape[2:], 10, dtype=np.uint16)
+    write_raw(str(directory / "WHITEREF_data.raw"), white, interleave=interleave)
+    write_raw(str(directory / "DARKREF_data.raw"), dark, interleave=interleave)
+    write_raw(file_name, raw, interleave=interleave, wavelength=[400.0, 500.0, 600.0])
+    with open(file_name, "rb") as f:
+        content = f.read()
+    return file_name, content
+
+
+def grow(file_name, content, lines, line_bytes):
+    """
+    Truncate the acquisition to its first lines.
+    """
+    with open(file_name, "wb") as f:
+        # Half of the next line is written as well
+        f.write(content[: lines * line_bytes + line_bytes // 2])
+
+
+@pytest.fixture
+def raw():
+    return np.arange(4 * 10 * 3, dtype=np.uint16).reshape((4, 10, 3)) + 10
+
+
+class TestLiveReader:
+    @pytest.mark.parametrize("interleave", ["bil", "bip"])
+    def test_poll(self, tmp_path, raw, interleave):
+        file_name, content = write_growing(tmp_path, raw, interleave)
+        expected, wavelength = read_specim(file_name)
+        line_bytes = 4 * 3 * 2
+        grow(file_name, content, 0, line_bytes)
+
+        reader = LiveReader(file_name)
+        assert reader.poll() is None
+        grow(file_name, content, 3, line_bytes)
+        np.testing.assert_allclose(reader.poll(), expected[:, :3])
+        assert reader.poll() is None
+        grow(file_name, content, 10, line_bytes)
+        np.testing.assert_allclose(reader.poll(), expected[:, 3:])
+
+        cube = reader.cube
+        assert cube.shape == (4, 10, 3)
+        np.testing.assert_allclose(cube.data, expected)
+        np.testing.assert_array_equal(cube.domain, wavelength)
+
+    def test_poll_grow_buffer(self, tmp_path, raw, monkeypatch):
+        monkeypatch.setattr("hyperpy.loading.live.INITIAL_CAPACITY", 2)
+        file_name, content = write_growing(tmp_path, raw)
+        expected, _ = read_specim(file_name)
+        reader = LiveReader(file_name)
+        for lines in range(1, 11):
+            grow(file_name, content, lines, 4 * 3 * 2)
+            reader.poll()
+
+        np.testing.assert_allclose(reader.data, expected)
+
+    def test_iter_blocks(self, tmp_path, raw):
+        file_name, content = write_growing(tmp_path, raw)
+        expected, _ = read_specim(file_name)
+        reader = LiveReader(file_name)
+
+        blocks = list(reader.iter_blocks(min_lines=4, poll_interval=0, idle_timeout=0))
+
+        assert [block.shape[1] for block in blocks] == [10]
+        np.testing.assert_allclose(blocks[0].data, expected)
+
+    def test_run(self, tmp_path, raw):
+        file_name, content = write_growing(tmp_path, raw)
+        reader = LiveReader(file_name)
+        blocks = []
+
+        cube = reader.run(blocks.append, poll_interval=0, max_lines=10)
+
+        assert len(blocks) == 1
+        assert cube.shape == (4, 10, 3)
+
+    def test_bsq(self, tmp_path, raw):
+        file_name, _ = write_growing(tmp_path, raw, interleave="bsq")
+        with pytest.raises(ValueError):
+            LiveReader(file_name)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+import numpy as np
+import pytest
+from scipy.io import savemat
+
+from hyperpy.loading.mat import MatDataset, is_mat_v73
+from hyperpy.loading.utils import read_mat_file
+from hyperpy.spectral import SpectralCube
+
+h5py = pytest.importorskip("h5py")
+
+
+def write_mat_v73(path, **variables):
+    """
+    Write arrays like MATLAB save -v7.3: HDF5 after a 512 bytes user block, column-major.
+    """
+    with h5py.File(path, "w", userblock_size=512) as f:
+        for name, value in variables.items():
+            f.create_dataset(name, data=np.transpose(value), chunks=True)
+    with open(path, "r+b") as f:
+        f.write(b"MATLAB 7.3 MAT-file, Platform: GLNXA64")
+
+
+@pytest.fixture
+def cube():
+    return np.arange(4 * 5 * 3, dtype=np.float64).reshape((4, 5, 3))
+
+
+class TestMatV73:
+    def test_is_mat_v73(self, tmp_path, cube):
+        write_mat_v73(tmp_path / "v73.mat", data=cube)
+        savemat(tmp_path / "v5.mat", {"data": cube})
+
+        assert is_mat_v73(str(tmp_path / "v73.mat"))
+        assert not is_mat_v73(str(tmp_path / "v5.mat"))
+        assert not is_mat_v73(str(tmp_path / "missing.mat"))
+
+    @pytest.mark.parametrize(
+        "index",
+        [
+            (slice(None),),
+            (1,),
+            (slice(1, 3), slice(0, 4, 2), 2),
+            (Ellipsis, 1),
+            (0, Ellipsis),
+            (slice(None), [0, 3]),
+        ],
+    )
+    def test_mat_dataset(self, tmp_path, cube, index):
+        write_mat_v73(tmp_path / "v73.mat", data=cube)
+        data = read_mat_file(str(tmp_path / "v73.mat"))
+
+        assert isinstance(data, MatDataset)
+        assert data.shape == (4, 5, 3)
+        np.testing.assert_array_equal(data[index], cube[index])
+        np.testing.assert_array_equal(np.asarray(data), cube)
+
+    def test_read_mat_file_variable_name(self, tmp_path, cube):
+        write_mat_v73(tmp_path / "v73.mat", domain=np.arange(3.0), data=cube)
+        savemat(tmp_path / "v5.mat", {"domain": np.arange(3.0), "data": cube})
+
+        np.testing.assert_array_equal(read_mat_file(str(tmp_path / "v73.mat"), "data")[()], cube)
+        np.testing.assert_array_equal(read_mat_file(str(tmp_path / "v5.mat"), "data"), cube)
+        with pytest.raises(KeyError):
+            read_mat_file(str(tmp_path / "v73.mat"), "other")
+
+    def test_from_mat_file(self, tmp_path, cube):
+        write_mat_v73(tmp_path / "data.mat", data=cube)
+        write_mat_v73(tmp_path / "domain.mat", domain=np.array([[400.0, 500.0, 600.0]]))
+
+        spectral_cube = SpectralCube.from_mat_file(
+            str(tmp_path / "data.mat"), str(tmp_path / "domain.mat")
+        )
+
+        assert spectral_cube.shape == (4, 5, 3)
+        np.testing.assert_array_equal(spectral_cube.domain, [400.0, 500.0, 600.0])
+        np.testing.assert_array_equal(spectral_cube.get_matrix(), cube.reshape((20, 3)))
+
+    def test_from_mat_file_close(self, tmp_path, cube):
+        write_mat_v73(tmp_path / "data.mat", data=cube)
+        write_mat_v73(tmp_path / "domain.mat", domain=np.array([[400.0, 500.0, 600.0]]))
+        opened = []
+
+        def open_variable(*args):
+            opened.append(read_mat_file(*args))
+            return opened[-1]
+
+        with mock.patch("hyperpy.spectral.classes.read_mat_file", side_effect=open_variable):
+            with SpectralCube.from_mat_file(
+                str(tmp_path / "data.mat"), str(tmp_path / "domain.mat")
+            ) as spectral_cube:
+                # The domain file is closed once read
+                assert not opened[1].file
+                np.testing.assert_array_equal(spectral_cube.data[1], cube[1])
+                assert opened[0].file
+
+        assert not opened[0].file
+        spectral_cube.close()
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from hyperpy.spectral import SpectralCube
+
+h5py = pytest.importorskip("h5py")
+
+from hyperpy.loading.store import get_chunks, open_cube_store, write_cube_store
+
+
+class TestGetChunks:
+    def test_get_chunks(self):
+        assert get_chunks((100, 10, 200)) == (64, 10, 32)
+        assert get_chunks((100, 10, 200), (8, 8, 200)) == (8, 8, 200)
+
+    def test_get_chunks_wrong_dimension(self):
+        with pytest.raises(ValueError):
+            get_chunks((100, 10, 200), (8, 8))
+
+
+class TestCubeStore:
+    def test_write_open(self, tmp_path):
+        data = np.random.rand(10, 7, 5).astype(np.float32)
+        domain = np.linspace(400, 1000, 5)
+        file_name = str(tmp_path / "cube.h5")
+
+        write_cube_store(file_name, data, domain, chunks=(4, 4, 2), metadata={"source": "x.raw"})
+        dataset, stored_domain, metadata = open_cube_store(file_name)
+
+        try:
+            assert dataset.chunks == (4, 4, 2)
+            assert dataset.compression == "lzf"
+            assert dataset.dtype == np.float32
+            np.testing.assert_array_equal(dataset[()], data)
+            np.testing.assert_array_equal(dataset[:, :, 3], data[:, :, 3])
+            np.testing.assert_array_equal(stored_domain, domain)
+            assert metadata["source"] == "x.raw"
+            assert "hyperpy_version" in metadata
+        finally:
+            dataset.file.close()
+
+    def test_string_domain(self, tmp_path):
+        file_name = str(tmp_path / "cube.h5")
+        write_cube_store(file_name, np.zeros((2, 2, 1)), np.array(["class"]))
+        dataset, domain, _ = open_cube_store(file_name)
+        dataset.file.close()
+        np.testing.assert_array_equal(domain, np.array(["class"]))
+
+    def test_open_not_a_store(self, tmp_path):
+        file_name = str(tmp_path / "other.h5")
+        with h5py.File(file_name, "w") as store:
+            store.create_dataset("data", data=np.zeros(2))
+        with pytest.raises(ValueError):
+            open_cube_store(file_name)
+
+
+class TestSpectralCubeStore:
+    def test_save_open(self, tmp_path):
+        cube = SpectralCube(
+            np.random.rand(6, 5, 4), np.arange(4.0), metadata={"source": "x.raw"}
+        )
+        file_name = str(tmp_path / "cube.h5")
+
+        cube.save(file_name, chunks=(2, 2, 4), compression="gzip")
+        with SpectralCube.open(file_name) as stored:
+            assert isinstance(stored.data, h5py.Dataset)
+            assert stored.shape == (6, 5, 4)
+            assert stored.metadata["source"] == "x.raw"
+            np.testing.assert_array_equal(stored.data[1:3, 2:4], cube.data[1:3, 2:4])
+            np.testing.assert_array_equal(stored.get_matrix(), cube.get_matrix())
+            np.testing.assert_array_equal(stored.domain, cube.domain)
+        assert not stored.data.id.valid
+        # Closed store can be rewritten
+        cube.save(file_name)
+        stored.close()
@@ -1,9 +1,12 @@
+import tracemalloc
 from unittest import mock
 from unittest.mock import MagicMock
 
 import numpy as np
+import pytest
 
 from hyperpy import read_mat_file
+from hyperpy.loading.envi_header import write_envi_header, ENVI_TO_NUMPY_DTYPE
 from hyperpy.loading.utils import (
     read_raw,
     read_specim,
@@ -12,6 +15,11 @@ from hyperpy.loading.utils import (
     expand_average,
     read_hyspex,
     get_wavelength,
+    stream_reflectance,
+    create_raw,
+    write_raw,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_DTYPE,
 )
 
 
@@ -30,47 +38,156 @@ class TestReadMatFile:
         np.allclose(output, np.array([1]))
 
 
+def write_raw_file(
+    path, data, header_offset=0, interleave="bil", data_type="12", byte_order="0"
+):
+    """
+    Write an ENVI file from a (samples, lines, bands) array.
+    """
+    samples, lines, bands = data.shape
+    header = {
+        "samples": samples,
+        "lines": lines,
+        "bands": bands,
+        "header offset": header_offset,
+        "data type": data_type,
+        "interleave": interleave,
+        "byte order": byte_order,
+        "_comments": "",
+    }
+    write_envi_header(str(path.with_suffix(".hdr")), header)
+    dtype = np.dtype(ENVI_TO_NUMPY_DTYPE[data_type]).newbyteorder(
+        ">" if byte_order == "1" else "<"
+    )
+    axes = {"bsq": (2, 1, 0), "bil": (1, 2, 0), "bip": (1, 0, 2)}[interleave]
+    with open(path, "wb") as f:
+        f.write(b"\0" * header_offset)
+        np.transpose(data, axes).astype(dtype).tofile(f)
+
+
 class TestReadRaw:
-    @mock.patch("hyperpy.loading.utils.np.fromfile")
-    @mock.patch("hyperpy.loading.utils.read_hdr_file")
-    @mock.patch("hyperpy.loading.utils.open")
-    def test_read_raw(self, mocked_open, mocked_read_hdr, mocked_fromfile):
-        mat_dict = {"bands": 2, "lines": 3, "samples": 4, "header offset": 0}
-        mocked_read_hdr.return_value = mat_dict
-        mocked_open.return_value = MagicMock()
-        mocked_fromfile.return_value = np.arange(24)
-        raw_results = np.array(
-            [
-                [[0, 12], [4, 16], [8, 20]],
-                [[1, 13], [5, 17], [9, 21]],
-                [[2, 14], [6, 18], [10, 22]],
-                [[3, 15], [7, 19], [11, 23]],
-            ]
+    raw_results = np.array(
+        [
+            [[0, 12], [4, 16], [8, 20]],
+            [[1, 13], [5, 17], [9, 21]],
+            [[2, 14], [6, 18], [10, 22]],
+            [[3, 15], [7, 19], [11, 23]],
+        ]
+    )
+
+    def test_read_raw(self, tmp_path):
+        raw_file = tmp_path / "data.raw"
+        write_raw_file(raw_file, self.raw_results)
+        output = read_raw(str(raw_file))
+
+        assert not isinstance(output, np.memmap)
+        np.testing.assert_array_equal(output, self.raw_results)
+
+    def test_read_raw_lazy(self, tmp_path):
+        raw_file = tmp_path / "data.raw"
+        write_raw_file(raw_file, self.raw_results, header_offset=16)
+        output = read_raw(str(raw_file), lazy=True)
+
+        assert isinstance(output, np.memmap)
+        assert output.shape == (4, 3, 2)
+        np.testing.assert_array_equal(output, self.raw_results)
+
+    @pytest.mark.parametrize("interleave", ["bsq", "bil", "bip"])
+    @pytest.mark.parametrize("data_type, byte_order", [("4", "0"), ("4", "1"), ("2", "1")])
+    def test_read_raw_interleave_dtype(self, tmp_path, interleave, data_type, byte_order):
+        raw_file = tmp_path / "data.raw"
+        write_raw_file(
+            raw_file,
+            self.raw_results,
+            interleave=interleave,
+            data_type=data_type,
+            byte_order=byte_order,
         )
-        output = read_raw("", "")
+        output = read_raw(str(raw_file), lazy=True)
+
+        assert output.dtype.newbyteorder("=") == ENVI_TO_NUMPY_DTYPE[data_type]
+        np.testing.assert_array_equal(output, self.raw_results)
+
+    @pytest.mark.parametrize("interleave", ["bsq", "bil", "bip"])
+    @pytest.mark.parametrize("bands", [(1, 2), [1, 0], np.array([True, False])])
+    def test_read_raw_window(self, tmp_path, interleave, bands):
+        raw_file = tmp_path / "data.raw"
+        write_raw_file(raw_file, self.raw_results, interleave=interleave)
+        output = read_raw(str(raw_file), samples=(1, 3), lines=(0, 2), bands=bands)
+
+        assert not isinstance(output, np.memmap)
+        expected = self.raw_results[1:3, 0:2, :]
+        expected = expected[:, :, 1:2] if isinstance(bands, tuple) else expected[:, :, bands]
+        np.testing.assert_array_equal(output, expected)
+
+    def test_read_raw_unknown_interleave(self, tmp_path):
+        raw_file = tmp_path / "data.raw"
+        write_raw_file(raw_file, self.raw_results, interleave="bil")
+        hdr_file = tmp_path / "data.hdr"
+        hdr_file.write_text(hdr_file.read_text().replace("bil", "xyz"))
+        with pytest.raises(ValueError):
+            read_raw(str(raw_file))
+
+
+class TestWriteRaw:
+    data = TestReadRaw.raw_results
+
+    @pytest.mark.parametrize("interleave", ["bsq", "bil", "bip"])
+    def test_write_raw(self, tmp_path, interleave):
+        raw_file = str(tmp_path / "data.raw")
+        write_raw(
+            raw_file,
+            self.data,
+            interleave=interleave,
+            dtype=">i2",
+            wavelength=[400, 500.5],
+            chunk_size=2,
+        )
+        output = read_raw(raw_file)
+
+        assert output.dtype == np.dtype(">i2")
+        np.testing.assert_array_equal(output, self.data)
+        np.testing.assert_array_equal(get_wavelength(raw_file), np.array([400, 500.5]))
+
+    def test_create_raw_as_out(self, tmp_path):
+        raw_file = str(tmp_path / "data.raw")
+        out = create_raw(raw_file, self.data.shape, np.float32)
+        white_average = np.full((4, 2), 2.0)
+        stream_reflectance(self.data, white_average, out=out, chunk_size=2)
+        out.flush()
 
-        np.allclose(output, raw_results)
+        np.testing.assert_allclose(read_raw(raw_file), self.data / 2)
+
+    def test_create_raw_unknown_interleave(self, tmp_path):
+        with pytest.raises(ValueError):
+            create_raw(str(tmp_path / "data.raw"), (1, 1, 1), interleave="xyz")
 
 
 class TestReadSpecim:
     @mock.patch("hyperpy.loading.utils.get_wavelength")
-    @mock.patch("hyperpy.loading.utils.get_reflectance")
-    @mock.patch("hyperpy.loading.utils.expand_average")
+    @mock.patch("hyperpy.loading.utils.stream_reflectance")
+    @mock.patch("hyperpy.loading.utils.reference_average")
     @mock.patch("hyperpy.loading.utils.read_raw")
     def test_read_specim(
         self,
         mocked_read_raw,
-        mocked_expand_average,
-        mocked_get_reflectance,
+        mocked_reference_average,
+        mocked_stream_reflectance,
         mocked_get_wavelengths,
     ):
         mocked_raw = MagicMock(shape=[15, 10])
         mocked_white_ref = MagicMock()
         mocked_black_ref = MagicMock()
         mocked_read_raw.side_effect = [mocked_raw, mocked_white_ref, mocked_black_ref]
+        mocked_white_average = MagicMock()
+        mocked_black_average = MagicMock()
+        mocked_reference_average.side_effect = [
+            mocked_white_average,
+            mocked_black_average,
+        ]
 
         mocked_reflectance = MagicMock()
-        mocked_get_reflectance.return_value = mocked_reflectance
+        mocked_stream_reflectance.return_value = mocked_reflectance
         mocked_wavelength = MagicMock()
         mocked_get_wavelengths.return_value = mocked_wavelength
 
@@ -78,21 +195,113 @@ class TestReadSpecim:
 
         mocked_read_raw.assert_has_calls(
             [
-                mock.call("filename"),
-                mock.call("WHITEREF_filename"),
-                mock.call("DARKREF_filename"),
+                mock.call("filename", lazy=True, samples=None, lines=None, bands=None),
+                mock.call("WHITEREF_filename", lazy=True, samples=None, bands=None),
+                mock.call("DARKREF_filename", lazy=True, samples=None, bands=None),
             ]
         )
 
-        mocked_expand_average.assert_has_calls(
-            [mock.call(mocked_white_ref, 10), mock.call(mocked_black_ref, 10)]
+        mocked_reference_average.assert_has_calls(
+            [mock.call(mocked_white_ref), mock.call(mocked_black_ref)]
         )
 
-        mocked_get_reflectance.assert_called_once()
+        mocked_stream_reflectance.assert_called_once_with(
+            mocked_raw,
+            mocked_white_average,
+            mocked_black_average,
+            out=None,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            dtype=DEFAULT_DTYPE,
+        )
         mocked_get_wavelengths.assert_called_once_with("filename")
 
         assert reflectance == mocked_reflectance
-        assert wavelengths == mocked_wavelength
+        assert wavelengths == mocked_wavelength[:]
+
+    @mock.patch("hyperpy.loading.utils.get_wavelength")
+    def test_read_specim_files(self, mocked_get_wavelengths, tmp_path):
+        raw = np.arange(4 * 5 * 3).reshape((4, 5, 3)) + 10
+        white = np.full((4, 2, 3), 100)
+        white[0, :, 0] = 0
+        dark = np.full((4, 2, 3), 4)
+        dark[0, :, 0] = 0
+        write_raw_file(tmp_path / "data.raw", raw)
+        write_raw_file(tmp_path / "WHITEREF_data.raw", white)
+        write_raw_file(tmp_path / "DARKREF_data.raw", dark)
+
+        reflectance, _ = read_specim(str(tmp_path / "data.raw"), chunk_size=2)
+
+        denominator = np.full((4, 1, 3), 96.0)
+        denominator[0, :, 0] = 1e-9
+        dark_average = np.full((4, 1, 3), 4.0)
+        dark_average[0, :, 0] = 0
+        assert reflectance.dtype == np.float32
+        np.testing.assert_allclose(
+            reflectance, (raw - dark_average) / denominator, rtol=1e-6
+        )
+
+    @mock.patch("hyperpy.loading.utils.get_wavelength")
+    def test_read_specim_window(self, mocked_get_wavelengths, tmp_path):
+        raw = np.arange(4 * 5 * 3).reshape((4, 5, 3)) + 10
+        white = np.arange(4 * 2 * 3).reshape((4, 2, 3)) + 100
+        dark = np.ones((4, 2, 3))
+        write_raw_file(tmp_path / "data.raw", raw)
+        write_raw_file(tmp_path / "WHITEREF_data.raw", white)
+        write_raw_file(tmp_path / "DARKREF_data.raw", dark)
+        mocked_get_wavelengths.return_value = np.array([400.0, 500.0, 600.0])
+
+        reflectance, _ = read_specim(str(tmp_path / "data.raw"))
+        window_reflectance, wavelengths = read_specim(
+            str(tmp_path / "data.raw"), samples=(1, 3), lines=(2, 5), bands=[0, 2]
+        )
+
+        np.testing.assert_array_equal(
+            window_reflectance, reflectance[1:3, 2:5, :][:, :, [0, 2]]
+        )
+        np.testing.assert_array_equal(wavelengths, np.array([400.0, 600.0]))
+
+    @mock.patch("hyperpy.loading.utils.get_wavelength")
+    def test_read_specim_peak_memory(self, mocked_get_wavelengths, tmp_path):
+        raw = np.random.default_rng(0).integers(10, 1000, (32, 256, 16)).astype(np.uint16)
+        write_raw_file(tmp_path / "data.raw", raw)
+        write_raw_file(tmp_path / "WHITEREF_data.raw", np.full((32, 4, 16), 2000, dtype=np.uint16))
+        write_raw_file(tmp_path / "DARKREF_data.raw", np.ones((32, 4, 16), dtype=np.uint16))
+        mocked_get_wavelengths.return_value = np.arange(16)
+
+        tracemalloc.start()
+        try:
+            reflectance, _ = read_specim(str(tmp_path / "data.raw"), chunk_size=8)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # The raw measurement is streamed from the file instead of loaded before calibration
+        assert peak < 1.2 * reflectance.nbytes
+        np.testing.assert_allclose(reflectance, (raw - 1.0) / 1999.0, rtol=1e-6)
+
+
+class TestStreamReflectance:
+    def test_stream_reflectance(self):
+        raw = np.arange(2 * 5 * 3, dtype=np.uint16).reshape((2, 5, 3))
+        white = np.full((2, 3), 10.0)
+        dark = np.ones((2, 3))
+        out = np.zeros(raw.shape, dtype=np.float64)
+
+        reflectance = stream_reflectance(raw, white, dark, out=out, chunk_size=2)
+
+        assert reflectance is out
+        np.testing.assert_allclose(out, (raw - 1.0) / 9.0)
+
+    def test_stream_reflectance_memmap(self, tmp_path):
+        raw = np.arange(2 * 5 * 3, dtype=np.uint16).reshape((2, 5, 3))
+        white = np.full((2, 3), 10.0)
+        out = np.memmap(
+            str(tmp_path / "out.dat"), dtype=np.float32, mode="w+", shape=raw.shape
+        )
+
+        stream_reflectance(raw, white, out=out, chunk_size=3)
+
+        np.testing.assert_allclose(out, raw / 10.0, rtol=1e-6)
 
 
 class TestGetReflectance:
@@ -105,6 +314,24 @@ class TestGetReflectance:
         tested_reflectance = get_reflectance(raw, white)
 
         np.allclose(reflectance, tested_reflectance)
+        assert tested_reflectance.dtype == DEFAULT_DTYPE
+        assert get_reflectance(raw, white, dtype=np.float64).dtype == np.float64
+
+    def test_get_reflectance_averaged_references(self):
+        raw = np.arange(2 * 4 * 3).reshape((2, 4, 3))
+        white = np.full((2, 3), 10.0)
+        white[1, 2] = 2.0
+        dark = np.full((2, 3), 2.0)
+        out = np.empty(raw.shape, dtype=np.float32)
+
+        tested_reflectance = get_reflectance(raw, white, dark, out=out)
+
+        denominator = np.full((2, 1, 3), 8.0)
+        denominator[1, 0, 2] = 1e-9
+        assert tested_reflectance is out
+        np.testing.assert_allclose(out, (raw - 2.0) / denominator, rtol=1e-6)
+        # References are left untouched
+        assert white[1, 2] == 2.0
 
 
 class TestAddPrefixFilename:
@@ -138,45 +365,70 @@ class TestExpandAverage:
 
         test_average_expanded = expand_average(raw_results, 2)
         np.allclose(average_expanded, test_average_expanded)
+        np.testing.assert_allclose(average_expanded, test_average_expanded)
+        # Broadcast view, no memory used for the expanded lines
+        assert test_average_expanded.strides[1] == 0
 
     class TestReadHyspex:
-        @mock.patch("hyperpy.loading.utils.expand_average")
+        @mock.patch("hyperpy.loading.utils.reference_average")
         @mock.patch("hyperpy.loading.utils.get_wavelength")
-        @mock.patch("hyperpy.loading.utils.get_reflectance")
+        @mock.patch("hyperpy.loading.utils.stream_reflectance")
         @mock.patch("hyperpy.loading.utils.read_raw")
         def test_read_hyspex(
             self,
             mock_read_raw,
-            mock_get_reflectance,
+            mock_stream_reflectance,
             mock_get_wavelength,
-            mock_expand_average,
+            mock_reference_average,
         ):
             mocked_raw = MagicMock(shape=[15, 10])
             mock_read_raw.return_value = mocked_raw
 
-            white_average_expand = MagicMock()
+            white_average = MagicMock()
 
-            mock_expand_average.return_value = white_average_expand
+            mock_reference_average.return_value = white_average
 
             read_hyspex("filename", 2, 5)
 
-            mock_expand_average.assert_has_calls(
+            mock_reference_average.assert_has_calls(
                 [
-                    mock.call(mocked_raw[:, 2:5, :], 10),
+                    mock.call(mocked_raw[:, 2:5][:, :, :]),
                 ]
             )
-            mock_get_reflectance.assert_has_calls(
-                [mock.call(mocked_raw, white_average_expand)]
+            mock_stream_reflectance.assert_has_calls(
+                [
+                    mock.call(
+                        mocked_raw[:, :][:, :, :],
+                        white_average,
+                        out=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE,
+                        dtype=DEFAULT_DTYPE,
+                    )
+                ]
             )
 
             mock_get_wavelength.assert_has_calls([mock.call("filename")])
 
+        @mock.patch("hyperpy.loading.utils.get_wavelength")
+        def test_read_hyspex_window_bands(self, mocked_get_wavelengths, tmp_path):
+            raw = np.arange(4 * 6 * 3).reshape((4, 6, 3)) + 10
+            write_raw_file(tmp_path / "data.raw", raw)
+            mocked_get_wavelengths.return_value = np.array([400.0, 500.0, 600.0])
+
+            reflectance, _ = read_hyspex(str(tmp_path / "data.raw"), 2)
+            window_reflectance, _ = read_hyspex(
+                str(tmp_path / "data.raw"), 2, samples=(1, 3), lines=(3, 5), bands=[2, 0]
+            )
+
+            assert not isinstance(window_reflectance, np.memmap)
+            np.testing.assert_allclose(window_reflectance, reflectance[1:3, 3:5][:, :, [2, 0]])
+
     class TestGetWavelength:
-        @mock.patch("hyperpy.loading.utils.read_hdr_file")
+        @mock.patch("hyperpy.loading.utils.read_envi_header")
         @mock.patch("hyperpy.loading.utils.find_hdr_file")
-        def test_get_wavelength(self, mocked_find_hdr, mocked_read_hdr_file):
-            hdr_file = {"wavelength": "42"}
+        def test_get_wavelength(self, mocked_find_hdr, mocked_read_envi_header):
             mocked_find_hdr.return_value = "hdr_file"
-            mocked_read_hdr_file.return_value = hdr_file
+            mocked_read_envi_header.return_value = MagicMock(wavelength=np.array([42.0]))
             test_wavelength = get_wavelength("filename")
+            mocked_read_envi_header.assert_called_once_with("hdr_file")
             assert test_wavelength == np.array([42])
@@ -0,0 +1,95 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from sklearn.pipeline import make_pipeline
+
+from hyperpy.preprocessing import (
+    Log,
+    MeanCentering,
+    StandardNormalVariate,
+    Normalization,
+    FusedRowWise,
+    compile_transformers,
+    allocation_report,
+)
+
+
+class TestFusedRowWise:
+    X = np.random.default_rng(0).random((50, 20)) + 1.0
+
+    @pytest.mark.parametrize("norm", ["l1", "l2", "inf"])
+    def test_fused_row_wise(self, norm):
+        transformers = (MeanCentering(), StandardNormalVariate(), Normalization(norm=norm))
+        expected = make_pipeline(*transformers).transform(self.X)
+        tested = FusedRowWise(transformers).transform(self.X)
+        np.testing.assert_allclose(tested, expected, rtol=1e-10, atol=1e-12)
+
+    @pytest.mark.parametrize("offset, spread", [(1e4, 0.01), (1e6, 0.1)])
+    def test_fused_row_wise_large_offset(self, offset, spread):
+        X = offset + spread * np.random.default_rng(0).random((50, 20))
+        transformers = (StandardNormalVariate(), Normalization(norm="l2"))
+        expected = make_pipeline(*transformers).transform(X)
+        tested = FusedRowWise(transformers).transform(X)
+        np.testing.assert_allclose(tested, expected, rtol=1e-7, atol=1e-9)
+
+    def test_fused_row_wise_norm_first(self):
+        transformers = (Normalization(norm="l1"), MeanCentering())
+        expected = make_pipeline(*transformers).transform(self.X)
+        tested = FusedRowWise(transformers).transform(self.X)
+        np.testing.assert_allclose(tested, expected, rtol=1e-10, atol=1e-12)
+
+    def test_fused_row_wise_float32(self):
+        transformers = (StandardNormalVariate(), Normalization(norm="l2"))
+        tested = FusedRowWise(transformers).transform(self.X.astype(np.float32))
+        assert tested.dtype == np.float32
+
+    def test_fused_row_wise_fail(self):
+        with pytest.raises(ValueError):
+            FusedRowWise((Log(),))
+
+    def test_fused_row_wise_upper_case_norm(self):
+        normalization = Normalization(norm="l2")
+        normalization.norm = "L2"
+        expected = Normalization(norm="l2").transform(self.X)
+        tested = FusedRowWise((normalization,)).transform(self.X)
+        np.testing.assert_allclose(tested, expected, rtol=1e-10)
+
+    def test_fused_row_wise_fail_norm(self):
+        normalization = Normalization()
+        normalization.norm = "l3"
+        with pytest.raises(ValueError):
+            FusedRowWise((normalization,))
+
+
+class TestCompileTransformers:
+    def test_compile_transformers(self):
+        log = Log()
+        compiled = compile_transformers(
+            (MeanCentering(), StandardNormalVariate(), log, Normalization())
+        )
+        assert len(compiled) == 3
+        assert isinstance(compiled[0], FusedRowWise)
+        assert len(compiled[0].transformers) == 2
+        assert compiled[1] is log
+        assert isinstance(compiled[2], FusedRowWise)
+
+
+class TestAllocationReport:
+    def test_allocation_report(self):
+        X = np.random.default_rng(0).random((1000, 100))
+        report = allocation_report(
+            (MeanCentering(), StandardNormalVariate(), Normalization()), X
+        )
+        assert report["fused"] < report["naive"]
+
+    def test_allocation_report_keep_tracing(self):
+        X = np.random.default_rng(0).random((100, 10))
+        tracemalloc.start()
+        try:
+            allocation_report((StandardNormalVariate(),), X)
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+        allocation_report((StandardNormalVariate(),), X)
+        assert not tracemalloc.is_tracing()
@@ -7,12 +7,88 @@ import pytest
 from hyperpy.preprocessing import (
     Log,
     Positive,
-    StandardNormalDeviate,
+    StandardNormalVariate,
     MeanCentering,
     SavitzkyGolay,
     MultiplicativeScatterCorrection,
     Normalization,
+    DomainSelection,
+    Resampling,
 )
+from hyperpy.preprocessing.utils import savitzky_golay
+from hyperpy.spectral import SpectralCube
+
+
+class TestDomainSelection:
+    def test_domain_selection_window(self):
+        selection = DomainSelection(np.array([0, 2]), np.array([400, 500, 600]))
+        np.testing.assert_array_equal(selection.window()["bands"], np.array([0, 2]))
+
+    def test_domain_selection_apply_spectral(self):
+        cube = SpectralCube(np.arange(12).reshape((2, 2, 3)), np.array([400, 500, 600]))
+        selection = DomainSelection(np.array([0, 2]), cube.domain)
+        selected = selection.apply_spectral(cube)
+        np.testing.assert_array_equal(selected.data, cube.data[:, :, [0, 2]])
+        np.testing.assert_array_equal(selected.domain, np.array([400, 600]))
+
+
+class TestResampling:
+    def setup_method(self):
+        self.source = np.linspace(400, 1000, 61)
+        self.target = np.array([395.0, 400.0, 433.3, 612.5, 1000.0, 1005.0])
+
+    def test_resampling_linear_exact_on_lines(self):
+        X = np.stack([2 * self.source + 1, -self.source])
+        X_resampled = Resampling(self.source, self.target, "linear").transform(X)
+        np.testing.assert_allclose(X_resampled[:, 1:-1], np.stack([2 * self.target + 1, -self.target])[:, 1:-1])
+        assert np.all(np.isnan(X_resampled[:, [0, -1]]))
+
+    def test_resampling_cubic_exact_on_cubics(self):
+        X = np.expand_dims((self.source / 100) ** 3 - self.source / 10, 0)
+        X_resampled = Resampling(self.source, self.target, "cubic", fill_value=0).transform(X)
+        np.testing.assert_allclose(X_resampled[0, 1:-1], ((self.target / 100) ** 3 - self.target / 10)[1:-1])
+        np.testing.assert_array_equal(X_resampled[0, [0, -1]], 0)
+
+    def test_resampling_gaussian(self):
+        X = np.ones((2, self.source.shape[0]))
+        X[1] = np.where(self.source == 700, 1.0, 0.0)
+        resampling = Resampling(self.source, np.array([600.0, 700.0]), "gaussian", fwhm=30)
+        X_resampled = resampling.transform(X)
+        # Normalized responses, symmetric around the target band
+        np.testing.assert_allclose(X_resampled[0], 1)
+        assert X_resampled[1, 0] < 1e-6
+        # Responses truncated at 3 standard deviations
+        sigma = 30 / (2 * np.sqrt(2 * np.log(2)))
+        window = self.source[np.abs(self.source - 700) <= 3 * sigma]
+        expected = 1 / np.sum(np.exp(-0.5 * ((window - 700) / sigma) ** 2))
+        np.testing.assert_allclose(X_resampled[1, 1], expected, rtol=1e-3)
+
+    def test_resampling_transformed_domain(self):
+        resampling = Resampling(self.source, self.target)
+        np.testing.assert_array_equal(resampling.transformed_domain, self.target)
+        assert resampling.weights.shape == (61, 6)
+
+    def test_resampling_preserve_float32(self):
+        X = np.ones((3, 61), dtype=np.float32)
+        assert Resampling(self.source, self.target).transform(X).dtype == np.float32
+        assert Resampling(self.source, self.target, dtype=np.float64).transform(X).dtype == np.float64
+
+    def test_resampling_typed_weights_cached(self):
+        resampling = Resampling(self.source, self.target)
+        X = np.ones((3, 61), dtype=np.float32)
+        resampling.transform(X)
+        weights = resampling._typed_weights[np.dtype(np.float32)]
+        resampling.transform(X)
+        assert resampling._typed_weights[np.dtype(np.float32)] is weights
+        assert weights.dtype == np.float32
+
+    def test_resampling_fail_bands(self):
+        with pytest.raises(ValueError):
+            Resampling(self.source, self.target).transform(np.ones((2, 10)))
+
+    def test_resampling_fail_method(self):
+        with pytest.raises(ValueError):
+            Resampling(self.source, self.target, method="toto")
 
 
 class TestLog:
@@ -37,16 +113,16 @@ class TestPositive:
         np.allclose(pos_array, np.array([0, 15, 20, 25]))
 
 
-class TestStandardNormalDeviate:
+class TestStandardNormalVariate:
     def test_standard_normal_deviate_row(self):
         array = np.array([1.0, 2.0, 3.0, 4.0])
-        snv_transformer = StandardNormalDeviate()
+        snv_transformer = StandardNormalVariate()
         snv_array = snv_transformer.transform(array)
         np.allclose(snv_array, np.array([-1.34, -0.45, 0.45, 1.34]))
 
     def test_standard_normal_deviate_mat(self):
         array = np.array([[1.0, 2.0], [3.0, 4.0]])
-        snv_transformer = StandardNormalDeviate()
+        snv_transformer = StandardNormalVariate()
         snv_array = snv_transformer.transform(array)
         np.allclose(snv_array, np.array([[-1, 1], [-1, 1]]))
 
@@ -60,31 +136,39 @@ class TestMeanCentering:
 
     def test_mean_centering_mat(self):
         array = np.array([[1.0, 2.0], [3.0, 4.0]])
-        snv_transformer = StandardNormalDeviate()
+        snv_transformer = StandardNormalVariate()
         snv_array = snv_transformer.transform(array)
         np.allclose(snv_array, np.array([[-0.5, 0.5], [-0.5, 0.5]]))
 
 
 class TestSavistkyGolay:
-    @mock.patch("hyperpy.preprocessing.utils.np.apply_along_axis")
     @mock.patch("hyperpy.preprocessing.transformers.savitzky_golay")
-    def test_savistky_golay(self, mocked_savitzky_golay, mocked_apply_along):
+    def test_savistky_golay(self, mocked_savitzky_golay):
         sg = SavitzkyGolay(window_size=7, polynomial_order=2, derivation_order=1)
         array = np.array([[1.0, 2.0], [3.0, 4.0]])
-        mocked_filter = MagicMock()
-        mocked_extended = MagicMock()
+        filter_ = np.array([1.0, 2.0, 3.0])
+        extended = np.array([[0.0, 1.0, 2.0, 3.0], [3.0, 5.0, 4.0, 8.0]])
 
-        mocked_savitzky_golay.return_value = (mocked_filter, mocked_extended)
-        sg.transform(array)
+        mocked_savitzky_golay.return_value = (filter_, extended)
+        sg_array = sg.transform(array)
         mocked_savitzky_golay.assert_called_with(array, 7, 2, 1)
-        mocked_apply_along.assert_called_with(
-            np.convolve, 1, mocked_extended, mocked_filter, mode="valid"
+        np.testing.assert_allclose(
+            sg_array,
+            np.apply_along_axis(np.convolve, 1, extended, filter_, mode="valid"),
+        )
+
+    def test_savistky_golay_edges(self):
+        sg = SavitzkyGolay(window_size=5, polynomial_order=2, derivation_order=0)
+        array = np.random.default_rng(0).random((4, 12))
+        filter_, extended = savitzky_golay(array, 5, 2, 0)
+        np.testing.assert_allclose(
+            sg.transform(array),
+            np.apply_along_axis(np.convolve, 1, extended, filter_, mode="valid"),
         )
 
 
 class TestMultiplicativeScatterCorrection:
-    @mock.patch("hyperpy.preprocessing.utils.np.polyfit")
-    def test_multiplicative_scatter_correction_no_ref(self, mock_polyfit):
+    def test_multiplicative_scatter_correction_no_ref(self):
         array = np.array([1, 2, 3, 4])
         msc = MultiplicativeScatterCorrection()
         with pytest.raises(ValueError):
@@ -95,9 +179,17 @@ class TestMultiplicativeScatterCorrection:
         msc.fit(array)
 
         np.allclose(msc.reference, np.array([1.5, 3.5]))
-        mock_polyfit.return_value = (np.array([1, 1]),)
-        msc.transform(array)
-        mock_polyfit.assert_called()
+        np.testing.assert_allclose(msc.transform(array), np.array([[2.0, 3.0], [2.0, 3.0]]))
+
+    @pytest.mark.parametrize("chunk_size", [None, 7])
+    def test_multiplicative_scatter_correction_polyfit(self, chunk_size):
+        array = np.random.default_rng(0).random((20, 15))
+        msc = MultiplicativeScatterCorrection(chunk_size=chunk_size).fit(array)
+        expected = np.zeros_like(array)
+        for i in range(array.shape[0]):
+            fit = np.polyfit(msc.reference, array[i, :], 1)
+            expected[i, :] = (array[i, :] - fit[1]) / fit[0]
+        np.testing.assert_allclose(msc.transform(array), expected)
 
     def test_multiplicative_scatter_correction_with_ref(self):
         array = np.array([[1.0, 2.0], [3.0, 4.0]])
@@ -146,3 +238,36 @@ class TestNormalization:
     def test_unknown_normalization(self):
         with pytest.raises(ValueError):
             Normalization(norm="toto")
+
+    def test_normalization_upper_case(self):
+        X = np.array([[1.0, 2.0], [3.0, 4.0]])
+        normalizer = Normalization(norm="L2")
+        assert normalizer.norm == "l2"
+        np.testing.assert_allclose(normalizer.transform(X), Normalization(norm="l2").transform(X))
+
+
+class TestDtypePolicy:
+    @pytest.mark.parametrize(
+        "transformer",
+        [
+            Log(),
+            Positive(),
+            StandardNormalVariate(),
+            MeanCentering(),
+            SavitzkyGolay(window_size=3, polynomial_order=1, derivation_order=0),
+            Normalization(norm="l2"),
+        ],
+    )
+    def test_preserve_float32(self, transformer):
+        array = np.array([[1.0, 2.0, 4.0, 3.0], [3.0, 5.0, 4.0, 8.0]], dtype=np.float32)
+        assert transformer.fit(array).transform(array).dtype == np.float32
+
+    def test_msc_preserve_float32(self):
+        array = np.array([[1.0, 2.0, 4.0], [3.0, 5.0, 4.0]], dtype=np.float32)
+        msc = MultiplicativeScatterCorrection().fit(array)
+        assert msc.transform(array).dtype == np.float32
+
+    def test_float64_opt_in(self):
+        array = np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32)
+        snv_array = StandardNormalVariate(dtype=np.float64).transform(array)
+        assert snv_array.dtype == np.float64
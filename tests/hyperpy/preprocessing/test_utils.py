@@ -2,7 +2,23 @@ import numpy as np
 import pytest
 
 from hyperpy.exceptions import ArrayDimensionError
-from hyperpy.preprocessing.utils import savitzky_golay, resize_x
+from hyperpy.preprocessing import (
+    Positive,
+    StandardNormalVariate,
+    Normalization,
+    DomainSelection,
+)
+from hyperpy.preprocessing.utils import (
+    savitzky_golay,
+    savitzky_golay_coefficients,
+    resize_x,
+    get_float_dtype,
+    spectral_process,
+    iter_tiles,
+    resample,
+    get_resampling_matrix,
+)
+from hyperpy.spectral import SpectralCube, MaskedSpectralCube
 
 
 class TestSavitzkyGolay:
@@ -15,6 +31,12 @@ class TestSavitzkyGolay:
             data_extended, np.array([[0, 1, 2, 3, 4, 5, 6], [0, 1, 2, 3, 4, 5, 6]])
         )
 
+    def test_savitzky_golay_coefficients_cache(self):
+        filters = savitzky_golay_coefficients(7, 2, 1)
+        assert savitzky_golay_coefficients(7, 2, 1) is filters
+        assert not filters.flags.writeable
+        np.testing.assert_almost_equal(filters, np.array([-3, -2, -1, 0, 1, 2, 3]) / 28)
+
 
 class TestResizeX:
     def test_resize_x_fail(self):
@@ -30,3 +52,147 @@ class TestResizeX:
         x = np.array([0, 1, 2, 3])
         resized = resize_x(x)
         np.testing.assert_almost_equal(resized, np.array([[0, 1, 2, 3]]))
+
+
+class TestGetFloatDtype:
+    def test_get_float_dtype(self):
+        assert get_float_dtype(np.zeros(2, dtype=np.float32)) == np.float32
+        assert get_float_dtype(np.zeros(2, dtype=np.uint16)) == np.float64
+        assert get_float_dtype(np.zeros(2, dtype=np.float32), np.float64) == np.float64
+
+
+class TestSpectralProcess:
+    cube = SpectralCube(
+        np.random.default_rng(0).random((5, 7, 4)), domain=np.arange(4)
+    )
+
+    def test_spectral_process_tiles(self):
+        transformers = (StandardNormalVariate(), Normalization(norm="l2"))
+        expected = spectral_process(self.cube, transformers)
+        tested = spectral_process(self.cube, transformers, tile_shape=(2, 3))
+        np.testing.assert_allclose(tested.data, expected.data)
+
+    def test_spectral_process_tiles_not_row_wise(self):
+        transformers = (StandardNormalVariate(), Positive())
+        with pytest.raises(ValueError):
+            spectral_process(self.cube, transformers, tile_shape=(2, 2))
+        with pytest.raises(ValueError):
+            spectral_process(self.cube.compress(self.cube.data[:, :, 0] > 0.5), transformers, tile_shape=(2, 2))
+
+    @pytest.mark.parametrize("n_jobs, tile_shape", [(3, None), (-1, (2, 2))])
+    def test_spectral_process_n_jobs(self, n_jobs, tile_shape):
+        transformers = (StandardNormalVariate(), Normalization(norm="l1"))
+        expected = spectral_process(self.cube, transformers)
+        tested = spectral_process(
+            self.cube, transformers, tile_shape=tile_shape, n_jobs=n_jobs
+        )
+        np.testing.assert_array_equal(tested.data, expected.data)
+
+    @pytest.mark.parametrize("n_jobs", [0, -2])
+    def test_spectral_process_wrong_n_jobs(self, n_jobs):
+        transformers = (StandardNormalVariate(),)
+        with pytest.raises(ValueError):
+            spectral_process(self.cube, transformers, n_jobs=n_jobs)
+        with pytest.raises(ValueError):
+            spectral_process(self.cube.compress(self.cube.data[:, :, 0] > 0.5), transformers, n_jobs=n_jobs)
+
+    def test_spectral_process_n_jobs_parity(self):
+        # Positive takes the minimum of the whole cube, only the serial path can apply it
+        transformers = (StandardNormalVariate(), Positive(), Normalization(norm="l2"))
+        expected = spectral_process(self.cube, transformers)
+        assert np.min(expected.data) >= 0
+        with pytest.raises(ValueError):
+            spectral_process(self.cube, transformers, n_jobs=4)
+        with pytest.raises(ValueError):
+            spectral_process(self.cube.compress(self.cube.data[:, :, 0] > 0.5), transformers, n_jobs=4)
+        row_wise = (StandardNormalVariate(), Normalization(norm="l2"))
+        np.testing.assert_array_equal(
+            spectral_process(self.cube, row_wise, n_jobs=4).data, spectral_process(self.cube, row_wise).data
+        )
+
+    @pytest.mark.parametrize("n_jobs, tile_shape", [(1, (2, 2)), (3, None)])
+    def test_spectral_process_empty(self, n_jobs, tile_shape):
+        selection = DomainSelection(np.array([0, 2]), self.cube.domain)
+        empty = SpectralCube(self.cube.data[:0], domain=self.cube.domain)
+        tested = spectral_process(empty, (StandardNormalVariate(), selection), tile_shape=tile_shape, n_jobs=n_jobs)
+        assert tested.shape == (0, 7, 2)
+        np.testing.assert_array_equal(tested.domain, np.array([0, 2]))
+
+    def test_spectral_process_fuse(self):
+        transformers = (StandardNormalVariate(), Normalization(norm="l2"))
+        expected = spectral_process(self.cube, transformers)
+        tested = spectral_process(self.cube, transformers, tile_shape=(2, 3), fuse=True)
+        np.testing.assert_allclose(tested.data, expected.data)
+
+    def test_spectral_process_out(self, tmp_path):
+        selection = DomainSelection(np.array([0, 2]), self.cube.domain)
+        out = np.memmap(
+            str(tmp_path / "out.dat"), dtype=np.float64, mode="w+", shape=(5, 7, 2)
+        )
+        tested = spectral_process(self.cube, (selection,), tile_shape=(4, 4), out=out)
+        assert tested.data is out
+        np.testing.assert_allclose(out, self.cube.data[:, :, [0, 2]])
+        np.testing.assert_array_equal(tested.domain, np.array([0, 2]))
+
+    @pytest.mark.parametrize("n_jobs, tile_shape", [(1, None), (1, (2, 2)), (3, None)])
+    def test_spectral_process_masked(self, n_jobs, tile_shape):
+        mask = self.cube.data[:, :, 0] > 0.5
+        transformers = (StandardNormalVariate(), DomainSelection(np.array([1, 3]), self.cube.domain))
+        expected = spectral_process(self.cube, transformers)
+        tested = spectral_process(
+            self.cube.compress(mask), transformers, tile_shape=tile_shape, n_jobs=n_jobs
+        )
+
+        assert isinstance(tested, MaskedSpectralCube)
+        assert tested.get_matrix().shape == (np.count_nonzero(mask), 2)
+        np.testing.assert_allclose(tested.to_cube().data[mask], expected.data[mask])
+        np.testing.assert_array_equal(tested.domain, np.array([1, 3]))
+
+
+class TestIterTiles:
+    def test_iter_tiles(self):
+        tiles = list(iter_tiles((3, 5), (2, 3)))
+        assert tiles == [
+            (slice(0, 2), slice(0, 3)),
+            (slice(0, 2), slice(3, 5)),
+            (slice(2, 3), slice(0, 3)),
+            (slice(2, 3), slice(3, 5)),
+        ]
+
+
+class TestResample:
+    def test_get_resampling_matrix_cached(self):
+        source = np.array([400.0, 500.0, 600.0])
+        matrix, outside = get_resampling_matrix(source, np.array([450.0, 700.0]))
+        np.testing.assert_allclose(matrix.toarray(), [[0.5, 0], [0.5, 0], [0, 0]])
+        np.testing.assert_array_equal(outside, [False, True])
+        assert get_resampling_matrix(source.astype(int), np.array([450, 700]))[0] is matrix
+        assert not matrix.data.flags.writeable
+
+    def test_get_resampling_matrix_fail(self):
+        with pytest.raises(ValueError):
+            get_resampling_matrix(np.array([500.0, 400.0, 600.0]), np.array([450.0]))
+        with pytest.raises(ValueError):
+            get_resampling_matrix(np.array([400.0, 500.0, 600.0]), np.array([450.0]), method="cubic")
+        with pytest.raises(ValueError):
+            get_resampling_matrix(np.array(["a", "b"]), np.array([450.0]))
+
+    @pytest.mark.parametrize("method", ["linear", "cubic", "gaussian"])
+    def test_resample_tiles(self, method):
+        source = np.linspace(400, 1000, 31)
+        cube = SpectralCube(np.random.default_rng(0).random((5, 4, 31)).astype(np.float32), source)
+        target = np.linspace(420, 980, 12)
+        resampled = resample(cube, target, method=method)
+        tiled = resample(cube, target, method=method, tile_shape=(2, 3), n_jobs=2)
+        assert resampled.shape == (5, 4, 12)
+        assert resampled.data.dtype == np.float32
+        np.testing.assert_array_equal(resampled.domain, target)
+        np.testing.assert_allclose(tiled.data, resampled.data)
+
+    def test_resample_masked(self):
+        source = np.linspace(400, 1000, 31)
+        mask = np.array([[True, False], [True, True]])
+        cube = MaskedSpectralCube(np.random.default_rng(0).random((3, 31)), source, mask)
+        resampled = resample(cube, np.array([500.0, 600.0]))
+        assert isinstance(resampled, MaskedSpectralCube)
+        np.testing.assert_allclose(resampled.data, cube.data[:, [5, 10]])